@@ -2,15 +2,15 @@ import React from 'react';
 import { Line } from 'react-chartjs-2';
 
 const DataGraph = ({ data }) => {
-  // Assuming 'data' is an array of { timestamp: Date, distance: number }
+  // 'data' is the downsampled series from the server: an array of [epoch ms, distance] pairs
 
   // Convert data for Chart.js
   const chartData = {
-    labels: data.map(item => item.timestamp.toLocaleTimeString()), // Convert timestamps to readable time strings
+    labels: data.map(item => new Date(item[0]).toLocaleTimeString()), // Convert timestamps to readable time strings
     datasets: [
       {
         label: 'Surface Distance',
-        data: data.map(item => item.distance),
+        data: data.map(item => item[1]),
         fill: false,
         backgroundColor: 'rgb(255, 99, 132)',
         borderColor: 'rgba(255, 99, 132, 0.2)',
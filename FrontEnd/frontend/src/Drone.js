@@ -14,6 +14,13 @@
   );
 
   const socket = io('http://localhost:5000');
+  // Size of the binary video frame header: magic(2) version(1) camera(1) seq(4) timestamp(8)
+  const FRAME_HEADER_SIZE = 16;
+  // Sequence number of the frame currently on screen, so snapshots save exactly what the operator saw
+  let displayedFrameSeq = null;
+  // Sequence number of the last 'control_state' update. It lives as long as the socket (and so the server's
+  // per-sid state); resetting it on reconnect would make the server drop every update as stale.
+  let controlSeq = 0;
 
 
   function Drone() {
@@ -45,15 +52,41 @@
 
 
       useEffect(() => {
-          // Listen for video frame updates from the server
+          // Listen for video frame updates from the server (base64 fallback)
           socket.on('video_frame', (data) => {
           const src = `data:image/jpeg;base64,${data.image}`;
           setFrameSrc(src); // Update the image source with the received frame
           });
 
+          // Binary frames: 16 byte header (see Server/video_transport.py) followed by the JPEG bytes
+          let lastUrl = null;
+          socket.on('video_frame_bin', (payload, ack) => {
+          // Ack right away so the server can measure latency and back off when we fall behind
+          if (typeof ack === 'function') ack();
+          displayedFrameSeq = new DataView(payload).getUint32(4, true);
+          const jpeg = new Blob([new Uint8Array(payload, FRAME_HEADER_SIZE)], { type: 'image/jpeg' });
+          const url = URL.createObjectURL(jpeg);
+          setFrameSrc(url);
+          if (lastUrl) URL.revokeObjectURL(lastUrl);
+          lastUrl = url;
+          });
+
           // Clean up on component unmount
           return () => {
           socket.off('video_frame');
+          socket.off('video_frame_bin');
+          if (lastUrl) URL.revokeObjectURL(lastUrl);
+          };
+      }, []);
+
+      useEffect(() => {
+          // Live surface samples while collecting, sent in small batches of [ms, distance] pairs
+          socket.on('surface_sample', (batch) => {
+            setCollectedData((prev) => prev.concat(batch.samples));
+          });
+
+          return () => {
+            socket.off('surface_sample');
           };
       }, []);
 
@@ -75,7 +108,7 @@
         const data = await response.json();
         console.log('Success:', data);
         alert(`Connection Successful: ${data.message}`);
-        socket.emit('start_stream');
+        socket.emit('start_stream', { mode: 'binary', ack: true });
       } catch (error) {
         console.error('Error connecting to drone:', error);
         alert(`Connection Failed: ${error.message}`);
@@ -85,7 +118,8 @@
     const takeSnapshot = async () => {
       console.log('Taking snapshot...');
       try {
-        const response = await fetch('http://localhost:5000/take_snapshot', {
+        const query = displayedFrameSeq !== null ? `?seq=${displayedFrameSeq}` : '';
+        const response = await fetch(`http://localhost:5000/take_snapshot${query}`, {
           method: 'GET', // Assuming this endpoint is accessed via GET
         });
     
@@ -155,8 +189,8 @@
           setCollectedData(data.data); // Assuming the server sends back the collected data under the key 'data'
           alert(`Data collection stopped. Data: ${JSON.stringify(data.data)}`);
         } else {
-          // If starting data collection, potentially clear the previous collected data
-          // setCollectedData([]); // Uncomment this line if you want to clear the data upon starting a new collection
+          // Start from an empty graph, live samples are appended as they arrive
+          setCollectedData([]);
           alert(`Data collection started.`);
         }
         setIsCollecting(!isCollecting); // Toggle the state to reflect the change
@@ -253,77 +287,53 @@
 
 
       useEffect(() => {
-          const handleKeyDown = (event) => {
-            if (!isDroneConnected) return;
-
-            let command = '';
-            switch (event.key) {
-                case 'w':
-                command = 'w';
-                break;
-                case 'a':
-                command = 'a';
-                break;
-                case 's':
-                command = 's';
-                break;
-                case 'd':
-                command = 'd';
-                break;
-                case 'ArrowUp':
-                command = 'Up';
-                break;
-                case 'ArrowDown':
-                command = 'Down';
-                break;
-                case 'ArrowLeft':
-                command = 'Left';
-                break;
-                case 'ArrowRight':
-                command = 'Right';
-                break;
-                default:
-                return; // Ignore other keys
-            }
-
-            socket.emit('drone_command', { command });
-            console.log(`Command sent: ${command}`);
+          // Send the whole key state with a sequence number ('control_state', see Server/control_state.py)
+          // instead of one drone_command per keydown/keyup. Bit order matches KEY_BITS on the server.
+          const KEY_BITS = { w: 0, s: 1, a: 2, d: 3, ArrowUp: 4, ArrowDown: 5, ArrowLeft: 6, ArrowRight: 7 };
+          // Repeat the state while keys are held so the server's dead-man timeout does not stop the drone
+          const KEEPALIVE_INTERVAL = 200;
+          let keys = 0;
+
+          const sendState = () => {
+            controlSeq += 1;
+            // t: send time, for the server's latency stats (GET /command_latency)
+            socket.emit('control_state', { seq: controlSeq, keys, t: Date.now() });
           };
 
-          const handleKeyUp = (event) => {
-            if (!isDroneConnected) return; // Only proceed if the drone is connected
-
-            let command = '';
-            switch (event.key) {
-                case 'w':
-                case 'a':
-                case 's':
-                case 'd':
-                case 'ArrowUp':
-                case 'ArrowDown':
-                case 'ArrowLeft':
-                case 'ArrowRight':
-                command = `release-${event.key === 'ArrowUp' ? 'Up' : 
-                                        event.key === 'ArrowDown' ? 'Down' :
-                                        event.key === 'ArrowLeft' ? 'Left' : 
-                                        event.key === 'ArrowRight' ? 'Right' : event.key}`;
-                break;
-                default:
-                return; // Ignore other keys
-            }
-
-            socket.emit('drone_command', { command });
-            console.log(`Command sent: ${command}`);
+          const setKey = (event, held) => {
+            if (!isDroneConnected || !(event.key in KEY_BITS)) return;
+            const bit = 1 << KEY_BITS[event.key];
+            const next = held ? keys | bit : keys & ~bit;
+            // OS auto-repeat keydowns do not change the state, so nothing is sent for them
+            if (next === keys) return;
+            keys = next;
+            sendState();
           };
 
+          const handleKeyDown = (event) => setKey(event, true);
+          const handleKeyUp = (event) => setKey(event, false);
+          // Losing focus means we never see the keyup events, so release everything
+          const handleBlur = () => {
+            if (keys === 0) return;
+            keys = 0;
+            sendState();
+          };
+
+          const keepalive = setInterval(() => {
+            if (keys !== 0) sendState();
+          }, KEEPALIVE_INTERVAL);
+
           // Add event listeners
           window.addEventListener('keydown', handleKeyDown);
           window.addEventListener('keyup', handleKeyUp);
+          window.addEventListener('blur', handleBlur);
 
           // Clean up
           return () => {
+          clearInterval(keepalive);
           window.removeEventListener('keydown', handleKeyDown);
           window.removeEventListener('keyup', handleKeyUp);
+          window.removeEventListener('blur', handleBlur);
           };
       }, [isDroneConnected]);
 
@@ -0,0 +1,178 @@
+"""
+Backpressure-aware adaptive bitrate for the socket.io video stream.
+
+Every frame sent to a client that acknowledges frames is tracked until the ack comes back. That gives us,
+per client, the number of frames still in flight (queue depth) and a smoothed emit->ack latency.
+Frames for a client that already has too many frames in flight are dropped instead of being queued behind
+the others, and the controller steps the stream settings (JPEG quality, output scale, frame rate) down when
+clients fall behind and back up once they have been keeping up for a while.
+
+Clients that do not ack (older frontends) are always sent the newest frame and do not affect the settings.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+StreamSettings = namedtuple('StreamSettings', ['quality', 'scale', 'fps'])
+
+# Ordered from best to most conservative
+STREAM_LEVELS = [
+    StreamSettings(quality=90, scale=1.0, fps=30),
+    StreamSettings(quality=80, scale=1.0, fps=30),
+    StreamSettings(quality=70, scale=1.0, fps=24),
+    StreamSettings(quality=60, scale=0.75, fps=20),
+    StreamSettings(quality=50, scale=0.5, fps=15),
+    StreamSettings(quality=40, scale=0.5, fps=10),
+]
+
+
+class ClientStats:
+    def __init__(self, sid, acks):
+        self.sid = sid
+        self.acks = acks
+        self.in_flight = 0
+        self.latency = None  # smoothed emit->ack latency in seconds
+        self.sent = 0
+        self.dropped = 0
+        self.recent_drops = 0
+
+    def as_dict(self):
+        return {
+            'acks': self.acks,
+            'in_flight': self.in_flight,
+            'latency_ms': None if self.latency is None else round(self.latency * 1000, 1),
+            'sent': self.sent,
+            'dropped': self.dropped,
+        }
+
+
+class AdaptiveStreamController:
+    def __init__(self, max_in_flight=2, target_latency=0.15, max_latency=0.4,
+                 adjust_interval=1.0, upgrade_after=5.0, start_level=1, smoothing=0.2):
+        """
+        Args:
+            max_in_flight: frames a client may have un-acked before new frames for it are dropped
+            target_latency: step up a level when every client stays below this (seconds)
+            max_latency: step down a level when any client goes above this (seconds)
+            adjust_interval: how often the settings are re-evaluated (seconds)
+            upgrade_after: how long clients must keep up before stepping back up (seconds)
+            start_level: index into STREAM_LEVELS to start at
+            smoothing: weight of the newest sample in the latency moving average
+        """
+        self.max_in_flight = max_in_flight
+        self.target_latency = target_latency
+        self.max_latency = max_latency
+        self.adjust_interval = adjust_interval
+        self.upgrade_after = upgrade_after
+        self.smoothing = smoothing
+
+        self.level = start_level
+        self.clients = {}
+        self.total_dropped = 0
+        self._lock = threading.Lock()
+        self._last_adjust = time.monotonic()
+        self._healthy_since = self._last_adjust
+
+    @property
+    def settings(self):
+        return STREAM_LEVELS[self.level]
+
+    #####################################################################################################################################
+    def add_client(self, sid, acks=False):
+        with self._lock:
+            self.clients[sid] = ClientStats(sid, acks)
+
+    def remove_client(self, sid):
+        with self._lock:
+            self.clients.pop(sid, None)
+
+    def should_send(self, sid):
+        """False if this client is still busy with earlier frames; the frame is counted as dropped for it."""
+        with self._lock:
+            client = self.clients.get(sid)
+            if client is None:
+                return False
+            if client.acks and client.in_flight >= self.max_in_flight:
+                client.dropped += 1
+                client.recent_drops += 1
+                self.total_dropped += 1
+                return False
+            return True
+
+    def on_sent(self, sid):
+        """
+        Record that a frame was emitted to `sid`.
+
+        Returns:
+            callable or None: socket.io ack callback for clients that ack, None otherwise.
+        """
+        with self._lock:
+            client = self.clients.get(sid)
+            if client is None:
+                return None
+            client.sent += 1
+            if not client.acks:
+                return None
+            client.in_flight += 1
+        sent_at = time.monotonic()
+
+        def ack(*args):
+            latency = time.monotonic() - sent_at
+            with self._lock:
+                client.in_flight = max(0, client.in_flight - 1)
+                if client.latency is None:
+                    client.latency = latency
+                else:
+                    client.latency += self.smoothing * (latency - client.latency)
+        return ack
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    def adjust(self):
+        """Re-evaluate the stream settings. Cheap to call every frame; only acts every adjust_interval."""
+        now = time.monotonic()
+        if now - self._last_adjust < self.adjust_interval:
+            return self.settings
+        self._last_adjust = now
+
+        with self._lock:
+            acking = [c for c in self.clients.values() if c.acks]
+            congested = any(
+                c.recent_drops > 0
+                or c.in_flight >= self.max_in_flight
+                or (c.latency is not None and c.latency > self.max_latency)
+                for c in acking
+            )
+            healthy = all(
+                c.recent_drops == 0 and (c.latency is None or c.latency < self.target_latency)
+                for c in acking
+            )
+            for c in acking:
+                c.recent_drops = 0
+
+        if not acking:
+            return self.settings
+        if congested:
+            if self.level < len(STREAM_LEVELS) - 1:
+                self.level += 1
+                print(f"Stream congested, stepping down to {self.settings}")
+            self._healthy_since = now
+        elif not healthy:
+            self._healthy_since = now
+        elif now - self._healthy_since >= self.upgrade_after and self.level > 0:
+            self.level -= 1
+            self._healthy_since = now
+            print(f"Stream healthy, stepping up to {self.settings}")
+        return self.settings
+
+    def stats(self):
+        with self._lock:
+            clients = {sid: c.as_dict() for sid, c in self.clients.items()}
+        return {
+            'level': self.level,
+            'settings': self.settings._asdict(),
+            'total_dropped': self.total_dropped,
+            'clients': clients,
+        }
+    #####################################################################################################################################
@@ -0,0 +1,109 @@
+"""
+Throughput of the JPEG encoder pool for 1..N worker processes.
+
+The in-process baseline encodes on the calling thread like start_video_stream does without a pool.
+For the pool runs, frames are submitted as fast as slots free up and results are drained in order,
+so the numbers show how far encoding scales across cores. Use --variants 2 to also encode a half-size
+preview of every frame (multi-resolution streaming).
+
+Usage:
+    python benchmarks/bench_encoder_pool.py --max-workers 4 --frames 300
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from encoder_pool import EncoderPool
+from bench_video_transport import synthetic_frames
+
+
+def variant_list(width, height, count, quality):
+    variants = [(None, quality)]
+    if count > 1:
+        variants.append(((width // 2, height // 2), quality - 20))
+    return variants
+
+
+def run_inline(frames, variants):
+    start = time.perf_counter()
+    for frame in frames:
+        for size, quality in variants:
+            image = frame if size is None else cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    elapsed = time.perf_counter() - start
+    return {'workers': 0, 'fps': len(frames) / elapsed, 'ms_per_frame': elapsed / len(frames) * 1000}
+
+
+def run_pool(frames, variants, workers):
+    with EncoderPool(workers=workers) as pool:
+        # Warm up so process start-up is not part of the measurement
+        pool.submit(frames[0], variants)
+        pool.get(timeout=10)
+
+        received = []
+        order_ok = [True]
+
+        def drain():
+            expected = None
+            while len(received) < len(frames):
+                result = pool.get(timeout=10)
+                if result is None:
+                    break
+                if expected is not None and result[0] != expected:
+                    order_ok[0] = False
+                expected = result[0] + 1
+                received.append(result)
+
+        consumer = threading.Thread(target=drain)
+        start = time.perf_counter()
+        consumer.start()
+        for frame in frames:
+            pool.submit(frame, variants)
+        consumer.join()
+        elapsed = time.perf_counter() - start
+    return {
+        'workers': workers,
+        'fps': len(received) / elapsed,
+        'ms_per_frame': elapsed / max(1, len(received)) * 1000,
+        'in_order': order_ok[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--width', type=int, default=960)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--quality', type=int, default=80)
+    parser.add_argument('--variants', type=int, default=1, choices=(1, 2))
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    frames = list(synthetic_frames(args.frames, args.width, args.height))
+    variants = variant_list(args.width, args.height, args.variants, args.quality)
+    results = [run_inline(frames, variants)]
+    for workers in range(1, args.max_workers + 1):
+        results.append(run_pool(frames, variants, workers))
+
+    if args.json:
+        print(json.dumps({'cpus': os.cpu_count(), 'results': results}, indent=2))
+        return
+    print(f"{os.cpu_count()} CPU(s); worker counts above that can not run in parallel")
+    baseline = results[0]['fps']
+    print(f"{'workers':>7} {'fps':>8} {'ms/frame':>9} {'speedup':>8}")
+    for r in results:
+        label = 'inline' if r['workers'] == 0 else r['workers']
+        print(f"{label:>7} {r['fps']:>8.1f} {r['ms_per_frame']:>9.2f} {r['fps'] / baseline:>7.2f}x"
+              + ('' if r.get('in_order', True) else '  OUT OF ORDER'))
+
+
+if __name__ == '__main__':
+    main()
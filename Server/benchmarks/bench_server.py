@@ -0,0 +1,253 @@
+"""
+End-to-end benchmarks for the server's hot paths, run in-process against a stand-in drone.
+
+    preprocess_encode   crop/resize with each camera profile plus JPEG encode, frames per second
+    fanout              video frames from DroneController.start_video_stream to 1/10/50 socket.io clients
+    drone_command       socket.io drone_command -> command_response round trip, percentiles
+    http                /get_mission_pad_data and /take_snapshot request latency, percentiles
+    telemetry           cost of ingesting a state packet (with the telemetry log and flight recorder
+                        attached) and of publishing a telemetry_delta
+
+By default the drone is stand_in_drone.FakeTello. With --drone sim a TelloSimulator is started on loopback and
+the real djitellopy client talks to it over UDP, which adds djitellopy's own command handling to the numbers.
+Socket.io clients are Flask-SocketIO test clients, so packets are fully encoded but not sent over a network.
+
+Results are written as JSON (to stdout or --out) so runs can be compared between releases.
+
+Usage:
+    python benchmarks/bench_server.py --out results.json
+    python benchmarks/bench_server.py --quick --only fanout drone_command
+"""
+
+import argparse
+import atexit
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+from bench_video_transport import synthetic_frames
+
+SECTIONS = ('preprocess_encode', 'fanout', 'drone_command', 'http', 'telemetry')
+FANOUT_CLIENTS = (1, 10, 50)
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds."""
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    if not len(values):
+        return {'count': 0}
+    return {
+        'count': int(len(values)),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p90_ms': float(np.percentile(values, 90)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+    }
+
+
+def load_server(drone):
+    """Import server.py with a stand-in drone and a throwaway media folder."""
+    os.environ['ARCADE_MEDIA_ROOT'] = tempfile.mkdtemp(prefix='arcade-bench-')
+    simulator = None
+    if drone == 'sim':
+        from tello_sim import TelloSimulator
+        simulator = TelloSimulator(port=9889)
+        simulator.start()
+        os.environ['ARCADE_TELLO_HOST'] = '127.0.0.1'
+        os.environ['ARCADE_TELLO_PORT'] = '9889'
+    else:
+        os.environ['ARCADE_STAND_IN_DRONE'] = '1'
+    import server
+    server.drone_controller.connect_drone()
+    # Let the frame bus and telemetry hub pick up their first frame and packet
+    server.drone_controller.start_frame_bus().wait_for(0, timeout=5.0)
+    server.drone_controller.telemetry.wait_for(0, timeout=5.0)
+    return server, simulator
+
+
+#####################################################################################################################################
+def bench_preprocess_encode(args, server):
+    from frame_profile import make_profile
+    frames = list(synthetic_frames(args.frames, 960, 720))
+    results = {}
+    for camera_down in (False, True):
+        profile = make_profile(camera_down)
+        start, cpu = time.perf_counter(), time.process_time()
+        sizes = []
+        for frame in frames:
+            image = profile.apply(frame, 'bench')
+            ok, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            sizes.append(len(jpeg))
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+        results['down' if camera_down else 'forward'] = {
+            'frames': len(frames),
+            'output_size': list(profile.output_size),
+            'fps': len(frames) / elapsed,
+            'cpu_ms_per_frame': cpu / len(frames) * 1000,
+            'mean_jpeg_bytes': float(np.mean(sizes)),
+        }
+    return results
+
+
+def bench_fanout(args, server):
+    from video_transport import BINARY_MODE, BINARY_EVENT
+    controller = server.drone_controller
+    results = {}
+    for count in FANOUT_CLIENTS:
+        clients = [server.socketio.test_client(server.app) for _ in range(count)]
+        for client in clients:
+            sid = server.socketio.server.manager.sid_from_eio_sid(client.eio_sid, '/')
+            controller.add_video_client(sid, BINARY_MODE)
+        thread = threading.Thread(target=controller.start_video_stream, daemon=True)
+        start, cpu = time.perf_counter(), time.process_time()
+        thread.start()
+        time.sleep(args.duration)
+        controller.stream_on = False
+        thread.join(timeout=5.0)
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+
+        received = [sum(1 for packet in client.get_received() if packet['name'] == BINARY_EVENT) for client in clients]
+        for client in clients:
+            controller.remove_video_client(server.socketio.server.manager.sid_from_eio_sid(client.eio_sid, '/'))
+            client.disconnect()
+        frames = max(received) if received else 0
+        results[str(count)] = {
+            'clients': count,
+            'seconds': elapsed,
+            'frames_per_client_fps': frames / elapsed,
+            'min_client_frames': min(received) if received else 0,
+            'emits_per_second': sum(received) / elapsed,
+            'cpu_ms_per_frame': cpu / frames * 1000 if frames else None,
+        }
+    return results
+
+
+def bench_drone_command(args, server):
+    client = server.socketio.test_client(server.app)
+    commands = ['Up', 'release-Up', 'a', 'release-a']
+    samples = []
+    errors = 0
+    for i in range(args.iterations):
+        start = time.perf_counter()
+        client.emit('drone_command', {'command': commands[i % len(commands)]})
+        responses = [packet for packet in client.get_received() if packet['name'] == 'command_response']
+        samples.append(time.perf_counter() - start)
+        errors += sum(1 for packet in responses if packet['args'][0].get('status') != 'success')
+    client.disconnect()
+    return {'round_trip': percentiles(samples), 'errors': errors}
+
+
+def bench_http(args, server):
+    client = server.app.test_client()
+    results = {}
+    for path in ('/get_mission_pad_data', '/take_snapshot'):
+        samples = []
+        statuses = {}
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            response = client.get(path)
+            samples.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if path == '/take_snapshot':
+                # Keep the snapshot writer's queue from filling up, which would only measure rejections
+                time.sleep(0.002)
+        results[path] = {'latency': percentiles(samples), 'status_codes': {str(k): v for k, v in statuses.items()}}
+    return results
+
+
+def bench_telemetry(args, server):
+    from telemetry import TelemetryHub
+    controller = server.drone_controller
+    base = dict(controller.telemetry.snapshot.state) or dict(controller.drone.get_current_state())
+
+    # Ingest with the same listeners as the server (telemetry log and flight recorder), on a separate hub
+    hub = TelemetryHub(lambda: None, socketio=server.socketio)
+    for callback in controller.telemetry._listeners:
+        hub.add_listener(callback)
+    packets = [{**base, 'tof': 10 + i % 200, 'bat': 100 - i % 100, 'yaw': i % 360} for i in range(args.iterations * 10)]
+    start = time.perf_counter()
+    for state in packets:
+        hub.ingest(state)
+    ingest = (time.perf_counter() - start) / len(packets)
+
+    # Publishing: delta computation plus the socket.io emit to one connected client
+    client = server.socketio.test_client(server.app)
+    published = {}
+    samples = []
+    for state in packets[:args.iterations]:
+        snapshot = hub.ingest(state)
+        start = time.perf_counter()
+        hub.publish(snapshot, published)
+        samples.append(time.perf_counter() - start)
+    client.disconnect()
+    return {'ingest_us_per_packet': ingest * 1e6, 'publish': percentiles(samples)}
+#####################################################################################################################################
+
+
+def metadata(args):
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVER_DIR, capture_output=True,
+                                  text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        revision = ''
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'drone': args.drone,
+        'quick': args.quick,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drone', choices=('fake', 'sim'), default='fake')
+    parser.add_argument('--only', nargs='+', choices=SECTIONS, help="Run only these sections")
+    parser.add_argument('--quick', action='store_true', help="Fewer iterations, for a smoke run")
+    parser.add_argument('--out', help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+    args.frames = 60 if args.quick else 300
+    args.iterations = 100 if args.quick else 1000
+    args.duration = 1.0 if args.quick else 5.0
+
+    results = {'meta': metadata(args), 'results': {}}
+    # The server prints as it goes; keep stdout for the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        server, simulator = load_server(args.drone)
+        try:
+            for section in args.only or SECTIONS:
+                print(f"Running {section}...")
+                results['results'][section] = globals()[f"bench_{section}"](args, server)
+        finally:
+            server.drone_controller.shutdown()
+            atexit.unregister(server.drone_controller.shutdown)
+            if simulator is not None:
+                simulator.stop()
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}", file=sys.stderr)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Compare the binary and base64 video transports.
+
+Encodes a run of synthetic frames the same way DroneController.start_video_stream does and reports,
+for each transport mode, the bytes on the wire per second and the CPU time spent per frame.
+The wire size includes the socket.io packet framing when python-socketio is installed.
+
+Usage:
+    python benchmarks/bench_video_transport.py --frames 300 --fps 30
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from video_transport import (BINARY_MODE, BASE64_MODE, BINARY_EVENT, BASE64_EVENT,
+                             pack_binary_frame, make_base64_frame)
+
+try:
+    from socketio import packet as sio_packet
+except ImportError:
+    sio_packet = None
+
+
+def synthetic_frames(count, width, height):
+    """Moving gradient plus noise, so the JPEGs are roughly the size of real camera frames."""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        base = (x + y + i * 4) % 256
+        frame = np.dstack([base, np.roll(base, i, axis=1), 255 - base]).astype(np.uint8)
+        frame = cv2.add(frame, rng.integers(0, 24, frame.shape, dtype=np.uint8))
+        yield frame
+
+
+def wire_size(event, payload):
+    """Number of bytes socket.io would put on the wire for one emit."""
+    if sio_packet is None:
+        if isinstance(payload, dict):
+            return len(json.dumps(payload))
+        return len(payload)
+    pkt = sio_packet.Packet(sio_packet.EVENT, data=[event, payload], namespace='/')
+    encoded = pkt.encode()
+    if isinstance(encoded, list):
+        return sum(len(part) for part in encoded)
+    return len(encoded)
+
+
+def run(mode, frames, fps):
+    total_bytes = 0
+    encode_cpu = 0.0
+    transport_cpu = 0.0
+    for seq, frame in enumerate(frames, start=1):
+        start = time.process_time()
+        _, buffer = cv2.imencode('.jpg', frame)
+        encoded = time.process_time()
+        if mode == BINARY_MODE:
+            payload = pack_binary_frame(buffer, seq, time.time(), False)
+            event = BINARY_EVENT
+        else:
+            payload = make_base64_frame(buffer, seq, time.time(), False)
+            event = BASE64_EVENT
+        size = wire_size(event, payload)
+        done = time.process_time()
+
+        total_bytes += size
+        encode_cpu += encoded - start
+        transport_cpu += done - encoded
+
+    count = len(frames)
+    return {
+        'mode': mode,
+        'frames': count,
+        'bytes_per_frame': total_bytes / count,
+        'bytes_per_sec': total_bytes / count * fps,
+        'encode_cpu_ms_per_frame': encode_cpu / count * 1000,
+        'transport_cpu_ms_per_frame': transport_cpu / count * 1000,
+        'total_cpu_ms_per_frame': (encode_cpu + transport_cpu) / count * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--width', type=int, default=720)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    frames = list(synthetic_frames(args.frames, args.width, args.height))
+    results = [run(mode, frames, args.fps) for mode in (BASE64_MODE, BINARY_MODE)]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<8} {'bytes/frame':>12} {'KB/s':>10} {'encode ms':>10} {'transport ms':>13} {'total ms':>9}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['bytes_per_frame']:>12.0f} {r['bytes_per_sec'] / 1024:>10.1f} "
+              f"{r['encode_cpu_ms_per_frame']:>10.3f} {r['transport_cpu_ms_per_frame']:>13.3f} "
+              f"{r['total_cpu_ms_per_frame']:>9.3f}")
+    saved = 1 - results[1]['bytes_per_sec'] / results[0]['bytes_per_sec']
+    print(f"binary saves {saved:.1%} of the wire bandwidth")
+
+
+if __name__ == '__main__':
+    main()
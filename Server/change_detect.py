@@ -0,0 +1,64 @@
+"""
+Cheap scene change detection for the video stream.
+
+While the drone hovers over a static scene (pad inspection, waiting for a command) consecutive frames are
+nearly identical, so re-encoding and sending them wastes CPU and bandwidth. The detector keeps a tiny
+grayscale thumbnail of the last frame that was actually sent and compares new frames against it; if the
+mean absolute difference stays under the threshold the stream sends a small heartbeat instead of a JPEG.
+A full frame is still sent every `max_interval` seconds so late joiners and lossy links recover.
+"""
+
+import time
+
+import cv2
+
+# Thumbnail used for the comparison; small enough that resize + diff costs well under a millisecond
+THUMB_SIZE = (32, 24)
+
+
+class ChangeDetector:
+    def __init__(self, threshold=3.0, max_interval=2.0):
+        """
+        Args:
+            threshold: mean absolute gray-level difference (0-255) below which a frame counts as unchanged
+            max_interval: send a full frame at least this often (seconds), even if nothing changed
+        """
+        self.threshold = threshold
+        self.max_interval = max_interval
+        self.reference = None
+        self.reference_shape = None
+        self.last_sent = 0.0
+        self.skipped = 0
+
+    def reset(self):
+        """Force the next frame to be sent in full."""
+        self.reference = None
+
+    def thumbnail(self, frame):
+        small = cv2.resize(frame, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def has_changed(self, frame):
+        """
+        Decide whether `frame` needs to be sent. Updates the reference when it returns True.
+
+        Returns:
+            bool: True to send the full frame, False to send a heartbeat.
+        """
+        now = time.monotonic()
+        thumb = self.thumbnail(frame)
+        changed = (
+            self.reference is None
+            or frame.shape != self.reference_shape
+            or now - self.last_sent >= self.max_interval
+            or cv2.absdiff(thumb, self.reference).mean() >= self.threshold
+        )
+        if changed:
+            self.reference = thumb
+            self.reference_shape = frame.shape
+            self.last_sent = now
+        else:
+            self.skipped += 1
+        return changed
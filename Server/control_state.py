@@ -0,0 +1,98 @@
+"""
+Key-state control protocol.
+
+Instead of one 'drone_command' per keydown/keyup (including OS auto-repeat), a client can send its whole
+control state in a 'control_state' event:
+
+    {'seq': 42, 'keys': 0b00010001}            bitmask of held keys, bit order KEY_BITS
+    {'seq': 43, 'axes': [0, 0.5, 0, -1]}       or an axis vector (lr, fb, ud, yv), each -1..1, e.g. a gamepad
+
+`seq` increases with every update from that client. Updates with a seq that is not newer than the last one
+accepted are stale (duplicated or reordered) and dropped, and every accepted update replaces the whole setpoint,
+so applying the same state twice changes nothing and a burst of updates ends at the latest state.
+
+The client repeats its state every KEEPALIVE_INTERVAL seconds while anything is held; if updates stop for
+`timeout` seconds the RC loop zeroes the setpoint (dead-man timeout).
+"""
+
+import threading
+
+# Bit n of 'keys' is KEY_BITS[n]; same key names as drone_command
+KEY_BITS = ('w', 's', 'a', 'd', 'Up', 'Down', 'Left', 'Right')
+# Axis (lr, fb, ud, yv index) and sign for each key
+KEY_AXES = {
+    'w': (2, 1),
+    's': (2, -1),
+    'a': (3, -1),
+    'd': (3, 1),
+    'Up': (1, 1),
+    'Down': (1, -1),
+    'Left': (0, -1),
+    'Right': (0, 1),
+}
+
+# How often clients repeat their state while keys are held, and the default dead-man timeout
+KEEPALIVE_INTERVAL = 0.2
+DEFAULT_TIMEOUT = 0.6
+
+
+def keys_to_axes(keys):
+    """Bitmask of held keys -> (lr, fb, ud, yv) in -1..1; opposite keys cancel out."""
+    axes = [0, 0, 0, 0]
+    for bit, key in enumerate(KEY_BITS):
+        if keys & (1 << bit):
+            index, sign = KEY_AXES[key]
+            axes[index] += sign
+    return axes
+
+
+class ControlState:
+    def __init__(self, rc, timeout=DEFAULT_TIMEOUT):
+        """
+        Args:
+            rc: RcLoop whose setpoint is replaced by each accepted update
+            timeout: dead-man timeout in seconds
+        """
+        self.rc = rc
+        self.timeout = timeout
+        self.accepted = 0
+        self.stale = 0
+        self.owner = None  # sid of the client that sent the last accepted update
+        self._last_seq = {}
+        self._lock = threading.Lock()
+
+    def update(self, sid, seq, keys=None, axes=None, speed=50):
+        """
+        Apply one control state from client `sid`.
+
+        Returns:
+            bool: False if the update was stale and dropped.
+        """
+        if axes is None:
+            axes = keys_to_axes(int(keys or 0))
+        if len(axes) != 4:
+            raise ValueError("axes must be [lr, fb, ud, yv]")
+        setpoint = [round(max(-1.0, min(1.0, float(value))) * speed) for value in axes]
+        seq = int(seq)
+        with self._lock:
+            if seq <= self._last_seq.get(sid, -1):
+                self.stale += 1
+                return False
+            self._last_seq[sid] = seq
+            self.accepted += 1
+            self.owner = sid
+            # Replacing the whole setpoint under the lock keeps concurrent updates in seq order
+            self.rc.set(*setpoint, hold=self.timeout if any(setpoint) else None)
+        return True
+
+    def remove_client(self, sid):
+        """Forget a client's sequence numbers; stop the drone if it was the one flying it."""
+        with self._lock:
+            self._last_seq.pop(sid, None)
+            if self.owner == sid:
+                self.owner = None
+                self.rc.zero()
+
+    def stats(self):
+        return {'accepted': self.accepted, 'stale': self.stale, 'expired': self.rc.expired,
+                'timeout': self.timeout, 'setpoint': self.rc.setpoint}
@@ -1,16 +1,51 @@
 # import openCV for receiving the video frames
 import cv2
+import numpy as np
 # Import the tello module
 from djitellopy import tello
-# Import threading for our takeoff/land method
-import threading
 # import our flight commands
 from flight_commands import start_flying, stop_flying
+from rc_loop import RcLoop
+from latency import CommandLatency
+from mission_executor import MissionExecutor
+from pad_tracker import PadTracker
+from pad_map import PadMap
+from mission_program import ProgramRunner, validate_program
+from task_runtime import TaskRuntime
+from control_state import ControlState, DEFAULT_TIMEOUT as CONTROL_TIMEOUT
+import threading
 import time
-# For video saving functionality
-from datetime import datetime
-import os
-import base64
+from functools import partial
+from frame_bus import FrameBus, frame_ready_event
+from frame_profile import make_profile
+from video_transport import (BINARY_MODE, BASE64_MODE, STREAM_MODES, BINARY_EVENT, BASE64_EVENT, HEARTBEAT_EVENT,
+                             pack_binary_frame, make_base64_frame)
+from adaptive_stream import AdaptiveStreamController
+from change_detect import ChangeDetector
+from mjpeg import MjpegBroadcaster
+from snapshot_service import SnapshotService
+from recorder import SegmentedRecorder
+from telemetry import TelemetryHub
+from telemetry_log import TelemetryLog
+from flight_log import FlightRecorder
+from surface_store import SurfaceStore
+
+# Number of frames kept in the frame bus ring
+FRAME_BUS_SLOTS = 30
+# Encoded frames kept for reuse between the socket.io and MJPEG streams
+JPEG_CACHE_SIZE = 4
+
+# Keys sent by the frontend and the direction they fly; 'release-<key>' stops that direction
+KEY_DIRECTIONS = {
+    'w': 'upward',
+    's': 'downward',
+    'a': 'yaw_left',
+    'd': 'yaw_right',
+    'Up': 'forward',
+    'Down': 'backward',
+    'Left': 'left',
+    'Right': 'right',
+}
 
 
 
@@ -18,35 +53,81 @@ import base64
 class DroneController:
 
     #####################################################################################################################################
-    def __init__(self, socketio=None):
-        self.drone = tello.Tello()
-        self.surface_data = []
-        self.recording = False
+    def __init__(self, socketio=None, encoder_pool=None, media_root=None, pre_roll=0.0, telemetry_rate=5.0,
+                 surface_sample_rate=10.0, surface_batch_interval=0.5, drone=None, tello_host=None, tello_port=None,
+                 rc_rate=20.0, control_timeout=CONTROL_TIMEOUT):
+        # Any object with the Tello API can be passed in, e.g. stand_in_drone.FakeTello for replays and benchmarks
+        if drone is not None:
+            self.drone = drone
+        elif tello_host:
+            # Another drone address or the local simulator (tello_sim.py), which can not use port 8889 itself
+            self.drone = tello.Tello(host=tello_host)
+            if tello_port:
+                self.drone.address = (tello_host, tello_port)
+        else:
+            self.drone = tello.Tello()
+        # Background loops, the components that own threads and one-shot actions are all registered with the task
+        # runtime (see task_runtime.py); components are stopped in reverse order of registration on shutdown
+        self.tasks = TaskRuntime()
+        # Fixed-size columnar ring of (timestamp, ToF distance) samples, see surface_store.py
+        self.surface_data = SurfaceStore()
+        self.surface_sample_rate = surface_sample_rate
+        self.surface_session_start = None
+        self.surface_session_cursor = 0
+        self.surface_batch_interval = surface_batch_interval
+        self.collecting_data = False
+        # RC setpoints are sent by one fixed-rate loop; commands only change them (see handle_command)
+        self.speed = 50
+        self.rc = self.tasks.register('rc', RcLoop(self.drone, rate=rc_rate))
+        self.commands = {}
+        for key, direction in KEY_DIRECTIONS.items():
+            self.commands[key] = partial(self.fly, direction)
+            self.commands['release-' + key] = partial(stop_flying, self.rc, direction)
+        # Per-stage command latency, browser -> send_rc_control (see latency.py)
+        self.command_latency = CommandLatency()
+        # Sequenced full-state updates ('control_state' events) with a dead-man timeout
+        self.control_state = ControlState(self.rc, timeout=control_timeout)
         self.camera_down = False
+        # Crop/resize geometry and buffers for the current camera direction, rebuilt in set_camera_direction
+        self.frame_profile = make_profile(self.camera_down)
         self.frame = None
-        self.video_writer = None
+        # About one second of video, which is also the window for pre-trigger snapshots; started by start_frame_bus
+        self.frame_bus = self.tasks.register('frame_bus', FrameBus(lambda: self.frame.frame, slots=FRAME_BUS_SLOTS))
         self.socketio = socketio
+        # Every state packet is also appended to an on-disk log under ARCADE_MEDIA_ROOT/Telemetry
+        self.telemetry_log = self.tasks.register('telemetry_log', TelemetryLog(root=media_root), stop='close')
+        # Control events and telemetry with monotonic timestamps, for replay (see flight_log.py)
+        self.flight_recorder = self.tasks.register('flight_recorder', FlightRecorder(root=media_root), stop='close')
+        # One state-stream reader per drone; everything else reads its snapshot instead of polling the drone
+        self.telemetry = self.tasks.register('telemetry', TelemetryHub(self.drone.get_current_state, socketio=socketio,
+                                                                        publish_rate=telemetry_rate))
+        self.telemetry.add_listener(self.telemetry_log.append)
+        self.telemetry.add_listener(self.flight_recorder.record_telemetry)
+        # Mission pads seen so far and their relative positions, for multi-pad routes (see pad_map.py)
+        self.pad_map = PadMap()
+        self.telemetry.add_listener(self.pad_map.observe)
         self.is_connected = False  # Add this line
-    #####################################################################################################################################
-
-    #####################################################################################################################################
-    def toggle_recording(self):
-        if self.recording:
-            # Stop recording
-            self.recording = False
-            if self.video_writer is not None:
-                self.video_writer.release()
-                self.video_writer = None
-            print("Recording stopped.")
-        else:
-            # Start recording
-            self.recording = True
-            filename = datetime.now().strftime("%d-%m-%Y_%H-%M-%S") + ".avi"
-            filepath = os.path.join("C:\\Users\\evanl\\OneDrive\\Desktop\\ARCADE Lab\\Video", filename)
-            resolution = self.get_video_resolution()
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            self.video_writer = cv2.VideoWriter(filepath, fourcc, 30.0, resolution)
-            print("Recording started, saving to {filepath}.")
+        self.stream_on = False
+        # Socket.io sids subscribed to the video stream, mapped to their transport mode
+        self.video_clients = {}
+        self.stream_control = AdaptiveStreamController()
+        # Optional EncoderPool (encoder_pool.py) for JPEG encoding in worker processes
+        self.encoder_pool = encoder_pool
+        # Last few JPEGs by (seq, camera, shape, quality), shared by the socket.io stream and MJPEG (encode_frame)
+        self._jpeg_cache = {}
+        self._jpeg_lock = threading.Lock()
+        self.change_detection = False
+        self.change_detector = ChangeDetector()
+        # HTTP (multipart/x-mixed-replace) viewers, fed from the frame bus independently of socket.io
+        self.mjpeg = self.tasks.register('mjpeg', MjpegBroadcaster(self))
+        self.snapshots = self.tasks.register('snapshots', SnapshotService(self, root=media_root))
+        # Segmented recorder; with pre_roll > 0 it is armed on connect and keeps that many seconds in memory
+        self.recorder = self.tasks.register('recorder', SegmentedRecorder(self, root=media_root, pre_roll=pre_roll),
+                                            stop='shutdown')
+        # Long manoeuvres run one at a time on the mission worker, never in a request thread; registered last so a
+        # running mission is aborted before anything it uses is stopped
+        self.missions = self.tasks.register('missions', MissionExecutor(socketio=socketio,
+                                                                         on_abort=lambda job: self.rc.zero()))
     #####################################################################################################################################
 
     #####################################################################################################################################
@@ -57,214 +138,385 @@ class DroneController:
         print(f"Connected to drone. Battery level: {self.drone.get_battery()}%")
         self.drone.streamon()
         self.frame = self.drone.get_frame_read()
-        self.drone.speed = 50
-        self.drone.ud = 0
-        self.drone.fb = 0
-        self.drone.yv = 0
-        self.drone.lr = 0
+        self.tasks.start('telemetry_log')
+        self.tasks.start('flight_recorder')
+        self.tasks.start('telemetry')
+        self.start_frame_bus()
+        if self.recorder.pre_roll > 0:
+            self.recorder.arm()
+        self.tasks.start('rc')
+        self.tasks.start('missions')
+    #####################################################################################################################################
+
+
+    #####################################################################################################################################
+    # The frame bus is the only place that reads from the drone's video decoder.
+    # Streaming, recording and snapshots all subscribe to it instead of calling get_frame_read() themselves.
+    def start_frame_bus(self):
+        if self.frame is None:
+            self.frame = self.drone.get_frame_read()
+        if self.frame_bus.frame_event is None:
+            # The decoder wakes the bus on every frame instead of being polled
+            self.frame_bus.frame_event = frame_ready_event(self.frame)
+        self.tasks.start('frame_bus')
+        return self.frame_bus
+
+    def prepare_frame(self, frame, consumer=None):
+        # Crop and resize with the current camera direction's profile. With a consumer name the result lives
+        # in that consumer's reusable buffer and is overwritten on its next call.
+        return self.frame_profile.apply(frame, consumer)
     #####################################################################################################################################
 
 
     #####################################################################################################################################
-    def take_snapshot(self):
-        filename = datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ".jpg"
-        filepath = os.path.join("C:\\Users\\evanl\\OneDrive\\Desktop\\ARCADE Lab\\Image", filename)  # Adjust the path as necessary
-        frame = self.drone.get_frame_read().frame
-        cv2.imwrite(filepath, frame)
-        print(f"Snapshot saved to {filepath}")
-        return filepath
+    def take_snapshot(self, count=1, interval=0.0, pre_trigger=0, seq=None):
+        # Returns a snapshot id right away; the files are written by the snapshot service's writer thread
+        self.tasks.start('snapshots')
+        snapshot_id = self.snapshots.request(count=count, interval=interval, pre_trigger=pre_trigger, seq=seq)
+        print(f"Snapshot {snapshot_id} queued")
+        return snapshot_id
+
+    def get_snapshot_status(self, snapshot_id):
+        return self.snapshots.status(snapshot_id)
     #####################################################################################################################################
 
 
     #####################################################################################################################################
     def collect_surface_level_data(self):
+        # Take the ToF distance from every new state packet, up to surface_sample_rate samples per second,
+        # and push new samples to clients in 'surface_sample' batches every surface_batch_interval seconds
+        min_interval = 1.0 / self.surface_sample_rate
+        last_seq = self.telemetry.snapshot.seq
+        last_time = 0.0
+        cursor = self.surface_data.total
+        last_emit = time.monotonic()
         while self.collecting_data:
-            distance = self.drone.get_distance_tof()
-            timestamp = datetime.now()
-            self.surface_data.append((timestamp, distance))
-            time.sleep(1)  # Sleep for 1 second before the next collection
+            snapshot = self.telemetry.wait_for(last_seq, timeout=self.surface_batch_interval)
+            if snapshot.seq != last_seq:
+                last_seq = snapshot.seq
+                distance = snapshot.state.get('tof')
+                if distance is not None and snapshot.timestamp - last_time >= min_interval:
+                    last_time = snapshot.timestamp
+                    self.surface_data.append(snapshot.timestamp, distance)
+            if time.monotonic() - last_emit >= self.surface_batch_interval:
+                cursor = self.emit_surface_samples(cursor)
+                last_emit = time.monotonic()
+        self.emit_surface_samples(cursor)
+
+    def emit_surface_samples(self, cursor):
+        # Send everything after `cursor` as one batch; returns the cursor to continue from
+        if self.socketio is None or cursor >= self.surface_data.total:
+            return cursor
+        samples, next_cursor = self.get_surface_samples_since(cursor)
+        self.socketio.emit('surface_sample', {'cursor': next_cursor, 'samples': samples})
+        return next_cursor
+
+    def get_surface_samples_since(self, cursor=None, limit=None):
+        # Raw [epoch ms, distance] samples after a cursor (default: start of the current session)
+        if cursor is None:
+            cursor = self.surface_session_cursor
+        timestamps, distances, _, next_cursor = self.surface_data.since(cursor, limit)
+        return [[round(t * 1000), int(d)] for t, d in zip(timestamps, distances)], next_cursor
 
     def start_collecting_surface_data(self):
-        def wrapper():
-            self.collect_surface_level_data()
+        # Singleton collector; starting it again while it runs keeps the current session
+        if self.tasks.is_running('collector'):
+            return
+        # A collector that was just stopped may still be sending its last batch
+        self.tasks.stop('collector', wait=True)
         self.collecting_data = True
-        data_collection_thread = threading.Thread(target=wrapper)
-        data_collection_thread.start()
+        self.surface_session_start = time.time()
+        self.surface_session_cursor = self.surface_data.total
+        self.tasks.spawn('collector', self.collect_surface_level_data, stop=self.end_surface_collection)
 
     
     def stop_collecting_surface_data(self):
         # This method stops the data collection
+        self.tasks.stop('collector')
+
+    def end_surface_collection(self):
+        # Makes collect_surface_level_data return after its last batch
         self.collecting_data = False
 
-    def get_collected_surface_data(self):
-        # Check if surface data has been collected
-        if hasattr(self, 'surface_data') and self.surface_data:
-            return self.surface_data
-        else:
+    def get_collected_surface_data(self, start=None, end=None, points=800, method='minmax'):
+        # Downsampled [epoch ms, distance] pairs; defaults to the current (or last) collection session
+        if start is None:
+            start = self.surface_session_start
+        timestamps, distances = self.surface_data.query(start, end, points=points, method=method)
+        if not len(timestamps):
             print("No surface data has been collected yet.")
             return []
+        return [[round(t * 1000), int(d)] for t, d in zip(timestamps, distances)]
     #####################################################################################################################################
 
     
     #####################################################################################################################################
     def get_video_resolution(self):
-        # Assuming the full resolution for the front camera and a cropped resolution for the bottom camera
-        if self.camera_down:
-            return (320, 240)  # Adjust based on your cropping for the bottom camera
-        else:
-            return (720, 480)  # Full resolution for the front camera
+        # Output size of the current preprocessing profile (full view forward, cropped view for the bottom camera)
+        return self.frame_profile.output_size
     #####################################################################################################################################
 
     #####################################################################################################################################
     # This is for recording a video
+    @property
+    def recording(self):
+        return self.recorder.recording
+
     def toggle_recording(self):
-        if self.recording:
-            # Stop recording
-            self.recording = False
-            if self.video_writer is not None:
-                self.video_writer.release()
-                self.video_writer = None
-            print("Recording stopped.")
+        # The recorder runs in its own threads and writes rotating segments under ARCADE_MEDIA_ROOT/Video
+        if self.recorder.recording:
+            self.recorder.stop()
         else:
-            # Start recording
-            self.recording = True
-            filename = datetime.now().strftime("%d-%m-%Y_%H-%M-%S") + ".avi"
-            filepath = os.path.join("C:\\Users\\evanl\\OneDrive\\Desktop\\ARCADE Lab\\Video", filename)
-            resolution = self.get_video_resolution()
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            self.video_writer = cv2.VideoWriter(filepath, fourcc, 30.0, resolution)
-            print(f"Recording started, saving to {filepath}.")
+            self.recorder.start()
+
+    def get_recording_status(self):
+        return self.recorder.status()
     #####################################################################################################################################
 
 
     #####################################################################################################################################
     def get_battery_level(self):
-        return self.drone.get_battery()
+        return self.telemetry.get('bat')
+
+    def get_telemetry_snapshot(self):
+        # All fields of the latest state packet, read-only; empty until the first packet arrives
+        return self.telemetry.snapshot.state
     #####################################################################################################################################
 
 
     #####################################################################################################################################
     # Define a method for setting the camera direction
     def set_camera_direction(self):
-        wasRecording = False
-        if self.recording:
-            # Stop recording if it was active
-            self.toggle_recording()
-            wasRecording = True
         if self.camera_down:
             self.camera_down = False
             self.drone.set_video_direction(self.drone.CAMERA_FORWARD)
         else:
             self.camera_down = True
             self.drone.set_video_direction(self.drone.CAMERA_DOWNWARD)
-        if wasRecording:
-            # Restart recording with the new camera direction
-            self.toggle_recording()
+        self.frame_profile = make_profile(self.camera_down)
+        # The resolution changes with the direction, so an active recording continues in a new segment
+        self.recorder.restart_segment()
     #####################################################################################################################################          
 
 
     #####################################################################################################################################
     # Define a method for taking off and landing
     def takeoff_land(self):
+        # Runs on the task runtime's action pool; raises TaskRejected when too many actions are waiting
         if self.drone.is_flying:
         # If the drone is flying, we want to land it.
             def land_and_update_state():
-                self.drone.land()
+                self.rc.zero()
+                self.sdk_command('land')
                 self.drone.is_flying = False  # Set is_flying to False after landing.
             
-            threading.Thread(target=land_and_update_state).start()
+            return self.tasks.submit('land', land_and_update_state)
         
         else:
             # If the drone is not flying, we want to take off.
             def takeoff_and_update_state():
-                self.drone.takeoff()
+                self.sdk_command('takeoff')
                 self.drone.is_flying = True  # Set is_flying to True after takeoff.
             
-            threading.Thread(target=takeoff_and_update_state).start()
+            return self.tasks.submit('takeoff', takeoff_and_update_state)
+
+    def sdk_command(self, name, *args):
+        # Blocking SDK command (takeoff, land, move_*, go_*, ...); the RC loop stays quiet until it returns
+        with self.rc.suspended():
+            return getattr(self.drone, name)(*args)
     #####################################################################################################################################
 
 
     #####################################################################################################################################
     # Method to run the application
-    def handle_command(self, command):
-        print("THis is command" + command)
+    def handle_command(self, command, timing=None):
+        # Key presses and releases only update the RC setpoint; the RC loop sends it.
+        # With a latency.CommandTiming the dispatch and send times are recorded as well.
+        # Returns False for unknown commands.
+        if timing is not None:
+            timing.dispatched = time.time()
+        handler = self.commands.get(command)
+        if handler is None:
+            print(f"Unknown command: {command}")
+            if timing is not None:
+                timing.fail('unknown command')
+            return False
         try:
-            # Directly call the appropriate flight or stop commands based on the input command
-            if command == 'w':
-                start_flying('upward', self.drone, self.drone.speed)
-            elif command == 'release-w':
-                stop_flying(self.drone)
-
-            elif command == 'a':
-                start_flying('yaw_left', self.drone, self.drone.speed)
-            elif command == 'release-a':
-                stop_flying(self.drone)
-
-            elif command == 's':
-                start_flying('downward', self.drone, self.drone.speed)
-            elif command == 'release-s':
-                stop_flying(self.drone)
-
-            elif command == 'd':
-                start_flying('yaw_right', self.drone, self.drone.speed)
-            elif command == 'release-d':
-                stop_flying(self.drone)
-
-            elif command == 'Up':
-                start_flying('forward', self.drone, self.drone.speed)
-            elif command == 'release-Up':
-                stop_flying(self.drone)
-
-            elif command == 'Down':
-                start_flying('backward', self.drone, self.drone.speed)
-            elif command == 'release-Down':
-                stop_flying(self.drone)
-
-            elif command == 'Left':
-                start_flying('left', self.drone, self.drone.speed)
-            elif command == 'release-Left':
-                stop_flying(self.drone)
-
-            elif command == 'Right':
-                start_flying('right', self.drone, self.drone.speed)
-            elif command == 'release-Right':
-                stop_flying(self.drone)
-        
+            handler()
         except Exception as e:
             print(f"Error processing the command: {e}")
-        finally:
-            # Ensure to clean up any resources or reset states as needed
-            self.cleanup()
+        if timing is not None:
+            self.track_command(timing)
+        return True
+
+    def track_command(self, timing):
+        timing.handled = time.time()
+        if not self.rc.running:
+            self.command_latency.record(timing)
+            timing.done.set()
+            return
+
+        def on_sent(sent_time):
+            timing.on_sent(sent_time)
+            self.command_latency.record(timing)
+        self.rc.notify_sent(on_sent)
+
+    def fly(self, direction):
+        start_flying(direction, self.rc, self.speed)
+
+    def apply_control_state(self, sid, seq, keys=None, axes=None, timing=None):
+        # Returns False when the update is older than one already applied for this client
+        if timing is not None:
+            timing.dispatched = time.time()
+        accepted = self.control_state.update(sid, seq, keys=keys, axes=axes, speed=self.speed)
+        if timing is not None:
+            if accepted:
+                self.track_command(timing)
+            else:
+                timing.fail('stale')
+        return accepted
+
+    def remove_control_client(self, sid):
+        self.control_state.remove_client(sid)
     #####################################################################################################################################
 
 
     #####################################################################################################################################
     # Method to display video stream
+    def add_video_client(self, sid, mode=BASE64_MODE, acks=False):
+        """Subscribe a socket.io client to the video stream in the given transport mode."""
+        if mode not in STREAM_MODES:
+            raise ValueError(f"Unknown stream mode: {mode}")
+        self.video_clients[sid] = mode
+        self.stream_control.add_client(sid, acks)
+        # New viewers need a full frame before heartbeats mean anything to them
+        self.change_detector.reset()
+
+    def remove_video_client(self, sid):
+        self.video_clients.pop(sid, None)
+        self.stream_control.remove_client(sid)
+
+    def get_stream_stats(self):
+        stats = self.stream_control.stats()
+        stats['change_detection'] = {
+            'enabled': self.change_detection,
+            'threshold': self.change_detector.threshold,
+            'skipped_frames': self.change_detector.skipped,
+        }
+        stats['mjpeg'] = self.mjpeg.stats()
+        return stats
+
+    def set_change_detection(self, enabled, threshold=None):
+        """Turn the "no change" heartbeat mode on or off for hovering over a static scene."""
+        self.change_detection = enabled
+        if threshold is not None:
+            self.change_detector.threshold = float(threshold)
+        self.change_detector.reset()
+
+    def encode_jpeg(self, frame, quality):
+        # Hand the encode to the worker processes when a pool is configured, keeping the GIL free for commands
+        if self.encoder_pool is not None:
+            return self.encoder_pool.encode(frame, quality)
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer if ok else None
+
+    def encode_frame(self, seq, frame, quality):
+        # Encode each prepared frame once for every consumer that asks for the same seq, size and quality.
+        # The lock also keeps the pool's encode() to one caller at a time, which it requires.
+        key = (seq, self.camera_down, frame.shape, quality)
+        with self._jpeg_lock:
+            buffer = self._jpeg_cache.get(key)
+            if buffer is None:
+                buffer = self.encode_jpeg(frame, quality)
+                self._jpeg_cache[key] = buffer
+                while len(self._jpeg_cache) > JPEG_CACHE_SIZE:
+                    self._jpeg_cache.pop(next(iter(self._jpeg_cache)))
+            return buffer
+
+    def start_streaming(self):
+        # One streaming loop serves every client; returns False if it was already running
+        return self.tasks.spawn('stream', self.start_video_stream, stop=self.end_video_stream)
+
+    def stop_streaming(self):
+        self.tasks.stop('stream')
+
+    def end_video_stream(self):
+        # Makes start_video_stream return
+        self.stream_on = False
+
     def start_video_stream(self):
         """Starts sending video frames to clients."""
         self.stream_on = True
         self.drone.streamon()  # Ensure the drone's video stream is on
+        reader = self.start_frame_bus().subscribe('stream')
+        next_due = time.monotonic()
         while self.stream_on:
-            frame = self.drone.get_frame_read().frame
-            frame = cv2.resize(frame, (720, 480))  # Example resize, adjust as needed
-            
-            # Optionally adjust the frame based on camera direction
-            if self.camera_down:
-                frame = frame[:240, :320]
-
-            # Encode frame for web transmission
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame_encoded = base64.b64encode(buffer).decode('utf-8')
-
-            # Emit the frame to all connected clients
-            self.socketio.emit('video_frame', {'image': frame_encoded})
-
-            # Sleep briefly to control framerate
-            time.sleep(1 / 30)  # Adjust framerate as needed
+            settings = self.stream_control.adjust()
+
+            # Cap the send rate at the adaptive frame rate
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            # Wait on the frame bus for a frame we have not sent yet instead of re-encoding the same one
+            frame = reader.read(timeout=0.5)
+            if frame is None:
+                continue
+            next_due = max(next_due + 1 / settings.fps, time.monotonic())
+
+            # Only send to clients that are keeping up; the others skip this frame rather than queue it
+            targets = [sid for sid in list(self.video_clients) if self.stream_control.should_send(sid)]
+            if not targets:
+                continue
+            seq, timestamp = frame.seq, frame.timestamp
+
+            # Resize and optionally crop based on camera direction. The bus image is only read here; if the
+            # producer reused its slot meanwhile the result may be torn, so that frame is skipped.
+            source = frame
+            frame = self.prepare_frame(source.image, 'stream')
+            if not reader.bus.is_valid(source):
+                continue
+            if np.may_share_memory(frame, source.image):
+                # Crop without resize is a view into the ring; keep our own copy for the steps below
+                frame = frame.copy()
+
+            # Static scene: send a tiny heartbeat instead of a full JPEG
+            if self.change_detection and not self.change_detector.has_changed(frame):
+                heartbeat = {'seq': seq, 'timestamp': timestamp, 'camera': 'down' if self.camera_down else 'forward'}
+                for sid in targets:
+                    self.socketio.emit(HEARTBEAT_EVENT, heartbeat, to=sid)
+                continue
+
+            if settings.scale < 1.0:
+                frame = cv2.resize(frame, None, fx=settings.scale, fy=settings.scale, interpolation=cv2.INTER_AREA)
+
+            # Encode once, then package the same JPEG for each transport mode in use
+            buffer = self.encode_frame(seq, frame, settings.quality)
+            if buffer is None:
+                continue
+            payloads = {}
+            for sid in targets:
+                mode = self.video_clients.get(sid)
+                if mode is None:
+                    continue
+                if mode not in payloads:
+                    if mode == BINARY_MODE:
+                        payloads[mode] = (BINARY_EVENT, pack_binary_frame(buffer, seq, timestamp, self.camera_down))
+                    else:
+                        payloads[mode] = (BASE64_EVENT, make_base64_frame(buffer, seq, timestamp, self.camera_down))
+                event, payload = payloads[mode]
+                self.socketio.emit(event, payload, to=sid, callback=self.stream_control.on_sent(sid))
     #####################################################################################################################################
         
 
     #####################################################################################################################################
+    # Called once when the server exits
+    def shutdown(self) -> None:
+        # Stops the stream and collector, then every component (missions, recorder, snapshots, MJPEG, frame bus,
+        # telemetry, logs, RC loop), and waits for running actions
+        self.tasks.shutdown()
+        self.cleanup()
+
     # Method for cleaning up resources
     def cleanup(self) -> None:
         # Release any resources
@@ -273,8 +525,7 @@ class DroneController:
          # If recording, stop and release the video writer
         if self.recording:
             print("Stopping recording and releasing resources...")
-            self.video_writer.release()
-            self.recording = False  # Ensure recording flag is reset
+            self.recorder.shutdown()  # Closes the current segment and stops the recorder threads
 
             #################### STEP 5 #######################
             # Ensure to set the camera direction back to forward if not.
@@ -296,39 +547,145 @@ class DroneController:
         print("Mission Pad detection Started!!!!!!!!!!!")
 
 
-    def navigate_to_mission_pad(self):
+    def read_mission_pad(self):
+        # Pad id and x/y/z all come from the same state packet, so they always belong together
+        state = self.telemetry.snapshot.state
+        return state.get('mid', -1), state.get('x'), state.get('y'), state.get('z')
+
+    def start_mission_pad_navigation(self):
+        # Returns a mission id at once; raises MissionBusy while another mission is in progress
+        return self.missions.submit('navigate_to_mission_pad', self.navigate_to_mission_pad)
+
+    def plan_pad_route(self, to=None, through=None, source=None):
+        # Pad ids from `source` (default: the pad in sight) to `to`, or through each pad in `through` in order
+        if source is None:
+            source = self.read_mission_pad()[0]
+            if source is None or source < 0:
+                raise ValueError("No mission pad in sight to start the route from.")
+        waypoints = list(through or []) + ([to] if to is not None else [])
+        if not waypoints:
+            raise ValueError("Give a target pad or a list of pads to fly through.")
+        return self.pad_map.route_through(source, [int(pad) for pad in waypoints])
+
+    def start_pad_route(self, to=None, through=None, height=None, speed=None):
+        # The route is planned before the mission is queued, so unknown or unreachable pads are rejected at once
+        route = self.plan_pad_route(to=to, through=through)
+        return self.missions.submit('fly_pad_route', partial(self.fly_pad_route, route, height=height, speed=speed),
+                                    {'route': route, 'height': height, 'speed': speed})
+
+    def fly_pad_route(self, route, job=None, height=None, speed=None, acquire_timeout=2.0):
+        """
+        Flies from pad to pad with one go_xyz_speed_mid per hop, each relative to the pad in sight,
+        sent back to back with only a check that the expected pad is in sight between them.
+
+        Args:
+            route: pad ids, starting with the pad the drone is over
+            job: MissionJob for progress, pause and abort
+            height: height above the pads in cm (default: the current height)
+            speed: cm/s (default: 50)
+            acquire_timeout: seconds to wait for each pad to come into sight
+        """
+        speed = speed or 50
+        if height is None:
+            height = self.read_mission_pad()[3] or 100
+        hops = list(zip(route, route[1:]))
+        # The hops come from the map, so flying them must not feed back into it
+        with self.pad_map.paused():
+            for index, (a, b) in enumerate(hops):
+                if job is not None:
+                    job.checkpoint()
+                self.wait_for_pad(a, acquire_timeout)
+                dx, dy = self.pad_map.hop(a, b)
+                if job is not None:
+                    job.update(index / len(hops), f"pad {a} -> pad {b}")
+                self.sdk_command('go_xyz_speed_mid', dx, dy, int(height), int(speed), a)
+            self.wait_for_pad(route[-1], acquire_timeout)
+        return {'route': route, 'hops': len(hops)}
+
+    def wait_for_pad(self, pad_id, timeout):
+        # Block until pad_id is reported in a state packet
+        deadline = time.monotonic() + timeout
+        snapshot = self.telemetry.snapshot
+        while snapshot.state.get('mid') != pad_id:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"Mission pad {pad_id} is not in sight.")
+            snapshot = self.telemetry.wait_for(snapshot.seq, timeout=remaining)
+
+    def start_mission_program(self, steps):
+        # Validates the whole program (raises ValueError) before it is queued as one mission
+        program = validate_program(steps, known_pads=set(self.pad_map.positions))
+        return self.missions.submit('program', ProgramRunner(self, program).run, {'steps': program})
+
+    def start_pad_tracking(self, land=False, **options):
+        # Closed-loop alignment as a mission; options are PadTracker arguments (gains, tolerance, timeout, ...)
+        # The tracker is built here so bad options are rejected before anything is queued
+        tracker = PadTracker(self.telemetry, self.rc, **options)
+        return self.missions.submit('track_mission_pad', partial(self.track_mission_pad, land=land, tracker=tracker),
+                                    dict(options, land=land))
+
+    def track_mission_pad(self, job=None, land=False, tracker=None, **options):
+        """
+        Holds the drone over the mission pad with PID control on the state stream until it converges,
+        loses the pad or times out (see pad_tracker.py).
+
+        Args:
+            job: MissionJob for progress, pause and abort
+            land: land once converged
+            tracker: PadTracker to run, otherwise one is built from `options`
+
+        Returns:
+            dict: outcome, metrics and the per-packet error trace of the run
+        """
+        if tracker is None:
+            tracker = PadTracker(self.telemetry, self.rc, **options)
+        result = tracker.run(job)
+        print(f"Pad tracking {result['outcome']}: {result['metrics']}")
+        if land and result['converged']:
+            self.sdk_command('land')
+        return result
+
+    def navigate_to_mission_pad(self, job=None):
         """
         Navigates the drone towards the detected mission pad by adjusting its position
         based on the X, Y, and Z distances to the mission pad.
+
+        Runs on the mission executor when started through start_mission_pad_navigation, reporting
+        progress to `job` after every move.
         """
-        pad_id = self.drone.get_mission_pad_id()
+        def step(progress, message):
+            if job is not None:
+                job.checkpoint()
+                job.update(progress, message)
+
+        pad_id, dist_x, dist_y, dist_z = self.read_mission_pad()
         if pad_id == -1:
             print("No mission pad detected.")
-            return
-
-        # Get distances from the mission pad
-        dist_x = self.drone.get_mission_pad_distance_x()
-        dist_y = self.drone.get_mission_pad_distance_y()
-        dist_z = self.drone.get_mission_pad_distance_z()
+            return {'pad_id': None}
 
         # Log the distances for debugging
         print(f"Mission Pad {pad_id}: Distance X: {dist_x} cm, Y: {dist_y} cm, Z: {dist_z} cm")
+        step(0.1, f"aligning with mission pad {pad_id}")
 
         # Adjust position to align with the mission pad
         if dist_x > 20:  # Arbitrary threshold for movement
-            self.drone.move_left(dist_x)
+            self.sdk_command('move_left', dist_x)
         elif dist_x < -20:
-            self.drone.move_right(abs(dist_x))
+            self.sdk_command('move_right', abs(dist_x))
+        step(0.4, "x aligned")
         if dist_y > 20:
-            self.drone.move_back(dist_y)
+            self.sdk_command('move_back', dist_y)
         elif dist_y < -20:
-            self.drone.move_forward(abs(dist_y))
+            self.sdk_command('move_forward', abs(dist_y))
+        step(0.7, "y aligned, landing")
         # if dist_z > 20:
         #     self.drone.move_down(dist_z)
 
-        self.drone.land()
+        self.rc.zero()
+        self.sdk_command('land')
         
         print(f"Drone is moving to align with Mission Pad {pad_id}.")
+        return {'pad_id': pad_id, 'x': dist_x, 'y': dist_y, 'z': dist_z}
 
 
     def get_mission_pad_data(self):
@@ -339,17 +696,12 @@ class DroneController:
         Returns:
             tuple: A tuple containing the mission pad ID, and distances X, Y, and Z.
         """
-        pad_id = self.drone.get_mission_pad_id()
+        pad_id, dist_x, dist_y, dist_z = self.read_mission_pad()
         if pad_id == -1:
             # No mission pad detected
             print("No mission pad detected.")
             return pad_id, None, None, None
 
-        # Get distances from the mission pad
-        dist_x = self.drone.get_mission_pad_distance_x()
-        dist_y = self.drone.get_mission_pad_distance_y()
-        dist_z = self.drone.get_mission_pad_distance_z()
-
         # Log the distances for debugging
         print(f"Mission Pad {pad_id}: Distance X: {dist_x} cm, Y: {dist_y} cm, Z: {dist_z} cm")
 
@@ -0,0 +1,175 @@
+"""
+Multi-process JPEG encoder pool.
+
+Raw frames are copied into fixed-size slots of one multiprocessing.shared_memory block, and only a small
+(job, slot, shape, size, quality) tuple goes through the task queue, so frame arrays are never pickled.
+Worker processes encode straight out of shared memory and send back the JPEG bytes. A collector thread
+puts results back into submission order before handing them out.
+
+A job can ask for several variants of the same frame (e.g. full size at high quality plus a small preview);
+the variants are encoded in parallel and the job's slot is reused once all of them are done.
+"""
+
+import multiprocessing
+import queue
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from encoder_worker import encode_worker
+
+# Big enough for a full 960x720 BGR frame from the Tello
+DEFAULT_SLOT_BYTES = 960 * 720 * 3
+
+
+class EncoderPool:
+    def __init__(self, workers=2, slots=None, slot_bytes=DEFAULT_SLOT_BYTES, quality=80):
+        """
+        Args:
+            workers: number of encoder processes
+            slots: number of frames that can be in flight at once (defaults to 2 per worker)
+            slot_bytes: size of one shared memory slot; frames larger than this are rejected
+            quality: default JPEG quality
+        """
+        self.workers = workers
+        self.slots = slots or workers * 2
+        self.slot_bytes = slot_bytes
+        self.quality = quality
+
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * slot_bytes)
+        ctx = multiprocessing.get_context('spawn')
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._free_slots = queue.Queue()
+        for slot in range(self.slots):
+            self._free_slots.put(slot)
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._next_job = 0
+        self._next_out = 0
+        self._pending = {}   # job id -> [slot, variants remaining, list of encoded buffers]
+        self._done = {}      # job id -> list of encoded buffers, waiting for earlier jobs
+        self._closed = False
+
+        # Spawned workers import the main script again as '__mp_main__'; it must not start anything on import
+        # (see server.py)
+        self._processes = [
+            ctx.Process(target=encode_worker, args=(self._shm.name, slot_bytes, self._tasks, self._results),
+                        name=f'jpeg-encoder-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+        self._collector = threading.Thread(target=self._collect, name='encoder-pool-results', daemon=True)
+        self._collector.start()
+
+    #####################################################################################################################################
+    def submit(self, image, variants=None, block=True, timeout=None):
+        """
+        Queue a frame for encoding.
+
+        Args:
+            image: uint8 array (H, W) or (H, W, C)
+            variants: list of (size, quality) pairs; size is (width, height) or None for the input size.
+                Defaults to one full-size variant at the pool's quality.
+            block: wait for a free slot; with block=False the frame is dropped (returns None) if none is free
+
+        Returns:
+            int or None: job id, results come back from get() in job id order.
+        """
+        if image.dtype != np.uint8 or image.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame must be uint8 and at most {self.slot_bytes} bytes")
+        if variants is None:
+            variants = [(None, self.quality)]
+        try:
+            slot = self._free_slots.get(block=block, timeout=timeout)
+        except queue.Empty:
+            return None
+
+        view = np.ndarray(image.shape, dtype=np.uint8, buffer=self._shm.buf, offset=slot * self.slot_bytes)
+        np.copyto(view, image)
+        del view
+
+        with self._lock:
+            job_id = self._next_job
+            self._next_job += 1
+            self._pending[job_id] = [slot, len(variants), [None] * len(variants)]
+        for index, (size, quality) in enumerate(variants):
+            self._tasks.put((job_id, index, slot, image.shape, size, quality))
+        return job_id
+
+    def get(self, timeout=None):
+        """
+        Next finished job in submission order.
+
+        Returns:
+            tuple or None: (job_id, [jpeg bytes per variant]) or None on timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._next_out in self._done or self._closed, timeout=timeout):
+                return None
+            if self._next_out not in self._done:
+                return None
+            job_id = self._next_out
+            self._next_out += 1
+            return job_id, self._done.pop(job_id)
+
+    def encode(self, image, quality=None, size=None, timeout=5.0):
+        """Encode one frame and wait for it. Only safe when a single thread uses the pool this way."""
+        job_id = self.submit(image, [(size, quality or self.quality)], timeout=timeout)
+        if job_id is None:
+            return None
+        while True:
+            result = self.get(timeout=timeout)
+            if result is None:
+                return None
+            if result[0] == job_id:
+                return result[1][0]
+
+    def _collect(self):
+        while not self._closed:
+            try:
+                job_id, variant, slot, data = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            with self._cond:
+                job = self._pending.get(job_id)
+                if job is None:
+                    continue
+                job[2][variant] = data
+                job[1] -= 1
+                if job[1] == 0:
+                    del self._pending[job_id]
+                    self._done[job_id] = job[2]
+                    self._free_slots.put(slot)
+                    self._cond.notify_all()
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    def close(self):
+        if self._closed:
+            return
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._collector.join(timeout=1.0)
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+    #####################################################################################################################################
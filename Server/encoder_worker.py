@@ -0,0 +1,40 @@
+"""
+Worker process for the JPEG encoder pool (encoder_pool.py).
+
+Kept in its own module so a spawned worker only needs to import this file, numpy and cv2 to find its entry
+point. The server script is still re-imported by spawned children as '__mp_main__' (that is how the spawn start
+method works), so server.py only creates the drone and the pool in the server process itself.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def encode_worker(shm_name, slot_bytes, tasks, results):
+    """
+    Encode frames from shared memory until a None task arrives.
+
+    Args:
+        shm_name: name of the pool's shared memory block
+        slot_bytes: size of one frame slot in that block
+        tasks: queue of (job id, variant, slot, shape, size, quality)
+        results: queue the (job id, variant, slot, jpeg bytes or None) results go to
+    """
+    import cv2
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            job_id, variant, slot, shape, size, quality = task
+            image = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            if size is not None and (image.shape[1], image.shape[0]) != tuple(size):
+                image = cv2.resize(image, tuple(size), interpolation=cv2.INTER_AREA)
+            ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            results.put((job_id, variant, slot, buffer.tobytes() if ok else None))
+            del image
+    finally:
+        shm.close()
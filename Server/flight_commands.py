@@ -12,67 +12,36 @@ This Code was obtained from Jacob Pitsenberger on Github:
 # https://github.com/Jacob-Pitsenberger/Search-and-Rescue-Drone/blob/master/button_control_camera_direction.py
 '''
 
-import threading
-import time
-
-
-def fly(direction, drone):
+# Setpoint axis (see rc_loop.py) and sign for each flight direction
+DIRECTIONS = {
+    'upward': ('ud', 1),
+    'downward': ('ud', -1),
+    'forward': ('fb', 1),
+    'backward': ('fb', -1),
+    'yaw_left': ('yv', -1),
+    'yaw_right': ('yv', 1),
+    'left': ('lr', -1),
+    'right': ('lr', 1),
+}
+
+
+def start_flying(direction, rc, speed):
     """
+    Have the drone fly in a certain direction at a certain speed.
 
-    Send RC control via four channels:
-
-           left_right_velocity (left/right),
-           forward_backward_velocity (forward/backward)
-           up_down_velocity (up/down)
-           yaw_velocity (yaw)
+    Only the RC loop's setpoint for that axis changes; the loop sends
 
            drone.send_rc_control(left/right, forward/backward, up/down, yaw left/right)
 
+    at a fixed rate, so other axes that are already moving keep moving.
     """
+    axis, sign = DIRECTIONS[direction]
+    rc.set_axis(axis, sign * speed)
 
-    drone.send_rc_control(direction[0], direction[1], direction[2], direction[3])
-    time.sleep(0.05)
-
-
-def start_flying(direction, drone, speed):
-    """Have the drone fly in a certain direction at a certain speed"""
-    # todo: change to support multiple flight commands
-    
-    if direction == "upward":
-        print("Moving up")
-        drone.ud = speed
-    elif direction == "downward":
-        drone.ud = -speed
-        print("Moving down")
-
-    if direction == "forward":
-        drone.fb = speed
-        print("Moving forward")
-    elif direction == "backward":
-        drone.fb = -speed
-        print("Moving backward")
-    
-    if direction == "yaw_left":
-        drone.yv = -speed
-        print("turning left")
-    elif direction == "yaw_right":
-        drone.yv = speed
-        print("turning right")
-    
-    if direction == "left":
-        drone.lr = -speed
-        print("Moving left")
-    elif direction == "right":
-        drone.lr = speed
-        print("Moving right")
-
-    if [drone.lr, drone.fb, drone.ud, drone.yv] != [0, 0, 0, 0]:
-        threading.Thread(target=lambda: fly([drone.lr, drone.fb, drone.ud, drone.yv], drone)).start()
-
-
-def stop_flying(drone):
-    """When user releases a movement key the drone stops performing that movement"""
-    drone.lr, drone.fb, drone.ud, drone.yv = 0, 0, 0, 0
-    drone.send_rc_control(drone.lr, drone.fb, drone.ud, drone.yv)
-    # todo: change to support multiple flight commands
 
+def stop_flying(rc, direction=None):
+    """When user releases a movement key the drone stops performing that movement (all movements without a direction)"""
+    if direction is None:
+        rc.zero()
+    else:
+        rc.set_axis(DIRECTIONS[direction][0], 0)
@@ -0,0 +1,241 @@
+"""
+Flight data recorder and replay.
+
+While a drone is connected, every inbound control event is written to <root>/Flights/<session>.jsonl, one JSON
+object per line with a time.monotonic() timestamp `t`:
+    {"t": ..., "kind": "command", "command": "w"}              socket.io drone_command
+    {"t": ..., "kind": "control", "sid": ..., "seq": 7, "keys": 1, "axes": null}   socket.io control_state
+    {"t": ..., "kind": "http", "action": "takeoff_land", "args": {}}   HTTP control calls and their arguments
+    {"t": ..., "kind": "telemetry", "seq": 12, "state": {...}} telemetry hub snapshots
+
+FlightReplayer feeds such a log back through a DroneController (normally one built around stand_in_drone.FakeTello)
+with the original spacing between events, or `speed` times faster, and reports how late each event was
+dispatched and how long the controller took to handle it. That reproduces field incidents and gives a
+repeatable load for the command path without flying.
+
+Usage:
+    python flight_log.py <log.jsonl> --speed 10
+
+The replay writes snapshots and recordings to a temporary media root (or --media-root), never the real one, and
+waits for the missions and actions it started before printing the summary.
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from storage import media_dir
+
+# Control calls that are recorded and can be replayed, mapped to the DroneController method that handles them
+HTTP_ACTIONS = {
+    'takeoff_land': 'takeoff_land',
+    'navigate_to_mission_pad': 'start_mission_pad_navigation',
+    'track_mission_pad': 'start_pad_tracking',
+    'fly_pad_route': 'start_pad_route',
+    'mission_program': 'start_mission_program',
+    'change_camera_direction': 'set_camera_direction',
+}
+
+
+def flight_path(name, root=None):
+    """Full path of a flight log in the Flights folder (only the file name is used)."""
+    name = os.path.basename(name)
+    if not name.endswith('.jsonl'):
+        name += '.jsonl'
+    return os.path.join(media_dir('Flights', root), name)
+
+
+def read_events(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+#####################################################################################################################################
+# Recording
+class FlightRecorder:
+    def __init__(self, root=None, queue_size=10000):
+        """
+        Args:
+            root: storage root; logs go to <root>/Flights (defaults to ARCADE_MEDIA_ROOT)
+            queue_size: events buffered for the writer thread before new ones are dropped
+        """
+        self.root = root
+        self.path = None
+        self.events = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._running = False
+
+    def start(self, session=None):
+        if self._running:
+            return self.path
+        session = session or datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+        self.path = flight_path(session, self.root)
+        self._running = True
+        self._thread = threading.Thread(target=self._write_loop, args=(self.path,), name='flight-recorder', daemon=True)
+        self._thread.start()
+        print(f"Recording flight events to {self.path}")
+        return self.path
+
+    def close(self):
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        self._thread.join(timeout=2.0)
+
+    @property
+    def running(self):
+        return self._running
+
+    def record(self, kind, **data):
+        """Queue one event; never blocks the caller."""
+        if not self._running:
+            return
+        data['t'] = time.monotonic()
+        data['kind'] = kind
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            self.dropped += 1
+
+    def record_telemetry(self, snapshot):
+        # TelemetryHub listener
+        self.record('telemetry', seq=snapshot.seq, state=dict(snapshot.state))
+
+    def _write_loop(self, path):
+        with open(path, 'a') as f:
+            while True:
+                event = self._queue.get()
+                if event is None:
+                    break
+                f.write(json.dumps(event) + '\n')
+                self.events += 1
+                if self._queue.empty():
+                    f.flush()
+#####################################################################################################################################
+
+
+#####################################################################################################################################
+# Replay
+class FlightReplayer:
+    def __init__(self, controller, events, speed=1.0):
+        """
+        Args:
+            controller: DroneController to drive, e.g. DroneController(drone=FakeTello())
+            events: iterable of recorded events (see read_events)
+            speed: playback speed; 10 replays ten times faster, 0 dispatches as fast as possible
+        """
+        self.controller = controller
+        self.events = list(events)
+        self.speed = speed
+        # kind -> list of (lag, handling time) in seconds
+        self.timings = {}
+        self.errors = []
+
+    def run(self):
+        if not self.events:
+            return self.summary()
+        first = self.events[0]['t']
+        start = time.monotonic()
+        for event in self.events:
+            if self.speed > 0:
+                due = start + (event['t'] - first) / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                lag = max(0.0, time.monotonic() - due)
+            else:
+                lag = 0.0
+            began = time.monotonic()
+            try:
+                self.dispatch(event)
+            except Exception as e:
+                self.errors.append(f"{event['kind']} at {event['t'] - first:.3f}s: {e}")
+            self.timings.setdefault(event['kind'], []).append((lag, time.monotonic() - began))
+        return self.summary(time.monotonic() - start)
+
+    def dispatch(self, event):
+        kind = event['kind']
+        if kind == 'command':
+            self.controller.handle_command(event['command'])
+        elif kind == 'control':
+            self.controller.apply_control_state(event['sid'], event['seq'], keys=event.get('keys'),
+                                                axes=event.get('axes'))
+        elif kind == 'http':
+            getattr(self.controller, HTTP_ACTIONS[event['action']])(**event.get('args', {}))
+        elif kind == 'telemetry':
+            self.controller.telemetry.ingest(event['state'])
+        else:
+            raise ValueError(f"Unknown event kind: {kind}")
+
+    def summary(self, elapsed=0.0):
+        def percentile(values, p):
+            values = sorted(values)
+            return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000 if values else 0.0
+
+        recorded = self.events[-1]['t'] - self.events[0]['t'] if self.events else 0.0
+        kinds = {}
+        for kind, timings in self.timings.items():
+            lags = [lag for lag, _ in timings]
+            handling = [duration for _, duration in timings]
+            kinds[kind] = {
+                'events': len(timings),
+                'lag_ms_p50': percentile(lags, 50),
+                'lag_ms_p99': percentile(lags, 99),
+                'handle_ms_p50': percentile(handling, 50),
+                'handle_ms_p99': percentile(handling, 99),
+                'handle_ms_max': max(handling) * 1000,
+            }
+        return {'speed': self.speed, 'recorded_seconds': recorded, 'replay_seconds': elapsed,
+                'events': len(self.events), 'errors': list(self.errors), 'kinds': kinds}
+#####################################################################################################################################
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', help="Flight log (.jsonl) to replay")
+    parser.add_argument('--speed', type=float, default=1.0, help="Playback speed, 0 for as fast as possible")
+    parser.add_argument('--command-delay', type=float, default=0.0,
+                        help="Seconds each stand-in drone command takes")
+    parser.add_argument('--media-root', help="Where replayed snapshots and recordings go (default: a temp dir)")
+    parser.add_argument('--wait', type=float, default=60.0,
+                        help="Seconds to wait for replayed missions and actions to finish")
+    args = parser.parse_args()
+
+    from drone_control import DroneController
+    from stand_in_drone import FakeTello
+
+    drone = FakeTello(command_delay=args.command_delay)
+    controller = DroneController(drone=drone, media_root=args.media_root or tempfile.mkdtemp(prefix='replay-'))
+    controller.rc.start()
+    # Replayed snapshots and recordings need video; the stand-in drone's frames are enough
+    controller.start_frame_bus()
+    replayer = FlightReplayer(controller, read_events(args.log), speed=args.speed)
+    summary = replayer.run()
+    # Missions can queue actions and the other way round, so wait until both are idle at the same time
+    deadline = time.monotonic() + args.wait
+    settled = False
+    while not settled and time.monotonic() < deadline:
+        settled = (controller.missions.wait_idle(max(0.0, deadline - time.monotonic())) and
+                   controller.tasks.wait_idle(max(0.0, deadline - time.monotonic())) and
+                   controller.missions.wait_idle(0))
+    summary['settled'] = settled
+    summary['missions'] = controller.missions.list()
+    json.dump(summary, sys.stdout, indent=2)
+    controller.tasks.shutdown()
+    print(f"\n{len(drone.calls)} calls reached the stand-in drone")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Single-producer frame bus.
+
+One capture thread per drone pulls decoded frames from the Tello video reader and publishes each new
+frame exactly once into a fixed-size ring of preallocated arrays. Consumers (streaming, recording,
+snapshots, analyzers) subscribe with their own FrameReader and never block the producer: a reader that
+falls behind simply skips ahead and counts the frames it missed.
+
+With a frame event from frame_ready_event() the capture thread sleeps until the decoder stores a new frame
+instead of polling it, and readers wake on the bus condition as soon as that frame is published.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# seq: increasing frame number (starts at 1), timestamp: capture time (unix seconds), image: BGR array
+Frame = namedtuple('Frame', ['seq', 'timestamp', 'image'])
+
+
+def frame_ready_event(frame_read):
+    """
+    Return an Event that is set every time `frame_read.frame` is assigned, e.g. by djitellopy's decoder thread.
+
+    The instance is switched to a subclass whose `frame` property sets the event after storing the frame;
+    reading the frame works exactly as before.
+    """
+    event = threading.Event()
+    base = type(frame_read)
+    prop = getattr(base, 'frame', None)
+    prop = prop if isinstance(prop, property) and prop.fset is not None else None
+
+    class NotifyingFrameRead(base):
+        @property
+        def frame(self):
+            return prop.fget(self) if prop else self.__dict__.get('frame')
+
+        @frame.setter
+        def frame(self, value):
+            if prop:
+                prop.fset(self, value)
+            else:
+                self.__dict__['frame'] = value
+            event.set()
+
+    frame_read.__class__ = NotifyingFrameRead
+    return event
+
+
+class FrameBus:
+    def __init__(self, frame_source, slots=8, poll_interval=0.005, frame_event=None):
+        """
+        Args:
+            frame_source: callable returning the most recently decoded frame (or None),
+                e.g. lambda: drone.get_frame_read().frame
+            slots: number of frames kept in the ring
+            poll_interval: how often the capture thread checks the decoder for a new frame without a frame_event
+            frame_event: threading.Event set by the decoder on every new frame (see frame_ready_event)
+        """
+        self.frame_source = frame_source
+        self.slots = slots
+        self.poll_interval = poll_interval
+        self.frame_event = frame_event
+
+        self.seq = 0
+        self._buffers = None
+        self._seqs = [0] * slots
+        self._stamps = [0.0] * slots
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    #####################################################################################################################################
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name='frame-bus', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self.frame_event is not None:
+            self.frame_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def _capture_loop(self):
+        last = None
+        while self._running:
+            if self.frame_event is not None:
+                # Woken by the decoder; the timeout only matters if it stops producing frames
+                self.frame_event.wait(timeout=0.5)
+                self.frame_event.clear()
+            frame = self.frame_source()
+            # The decoder hands out a new array for every decoded frame, so identity tells us if it is new
+            if frame is None or frame is last:
+                if self.frame_event is None:
+                    time.sleep(self.poll_interval)
+                continue
+            last = frame
+            self.publish(frame)
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    def publish(self, image, timestamp=None):
+        """Copy a frame into the next ring slot and wake up any waiting readers."""
+        if timestamp is None:
+            timestamp = time.time()
+        if self._buffers is None or self._buffers[0].shape != image.shape or self._buffers[0].dtype != image.dtype:
+            # (Re)allocate the ring on the first frame or when the decoder changes resolution
+            self._buffers = [np.empty_like(image) for _ in range(self.slots)]
+
+        seq = self.seq + 1
+        index = seq % self.slots
+        # Invalidate the slot before overwriting it so readers never see a half-written frame as valid
+        self._seqs[index] = 0
+        np.copyto(self._buffers[index], image)
+        with self._cond:
+            self._seqs[index] = seq
+            self._stamps[index] = timestamp
+            self.seq = seq
+            self._cond.notify_all()
+        return seq
+
+    def get(self, seq, copy=False):
+        """Return the frame with the given sequence number, or None if it has already been overwritten."""
+        if seq <= 0 or self._buffers is None:
+            return None
+        index = seq % self.slots
+        if self._seqs[index] != seq:
+            return None
+        image = self._buffers[index]
+        if copy:
+            image = image.copy()
+            # The producer may have lapped us while copying
+            if self._seqs[index] != seq:
+                return None
+        return Frame(seq, self._stamps[index], image)
+
+    def latest(self, copy=False):
+        """Most recent frame, or None if nothing has been captured yet."""
+        return self.get(self.seq, copy=copy)
+
+    def recent(self, count):
+        """Copies of up to `count` most recent frames, oldest first."""
+        frames = []
+        newest = self.seq
+        for seq in range(max(1, newest - min(count, self.slots - 1) + 1), newest + 1):
+            frame = self.get(seq, copy=True)
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    def is_valid(self, frame):
+        """True while the ring slot behind `frame` has not been reused by the producer."""
+        return self._seqs[frame.seq % self.slots] == frame.seq
+
+    def wait_for(self, after_seq, timeout=None):
+        """Block until a frame newer than `after_seq` is published. Returns the newest sequence number."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > after_seq or not self._running, timeout=timeout)
+            return self.seq
+
+    def subscribe(self, name='reader'):
+        return FrameReader(self, name)
+    #####################################################################################################################################
+
+
+class FrameReader:
+    """Independent read cursor on a FrameBus. Readers never block the producer."""
+
+    def __init__(self, bus, name):
+        self.bus = bus
+        self.name = name
+        self.last_seq = bus.seq
+        self.dropped = 0
+
+    def latest(self, copy=False):
+        """Return the newest frame without waiting (may be the same frame as last time)."""
+        frame = self.bus.latest(copy=copy)
+        if frame is not None:
+            self._advance(frame.seq)
+        return frame
+
+    def read(self, timeout=1.0, copy=False):
+        """Wait for a frame newer than the last one read and return the newest one, skipping any backlog."""
+        newest = self.bus.wait_for(self.last_seq, timeout=timeout)
+        if newest <= self.last_seq:
+            return None
+        frame = self.bus.get(newest, copy=copy)
+        if frame is not None:
+            self._advance(frame.seq)
+        return frame
+
+    def read_next(self, timeout=1.0, copy=False):
+        """Return every frame in order; if the reader fell more than a ring behind, jump to the oldest kept frame."""
+        newest = self.bus.wait_for(self.last_seq, timeout=timeout)
+        if newest <= self.last_seq:
+            return None
+        seq = max(self.last_seq + 1, newest - self.bus.slots + 2)
+        frame = self.bus.get(seq, copy=copy)
+        if frame is None:
+            frame = self.bus.get(newest, copy=copy)
+        if frame is not None:
+            self._advance(frame.seq)
+        return frame
+
+    def _advance(self, seq):
+        if seq > self.last_seq + 1:
+            self.dropped += seq - self.last_seq - 1
+        self.last_seq = max(self.last_seq, seq)
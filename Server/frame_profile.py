@@ -0,0 +1,87 @@
+"""
+Per-camera-direction preprocessing profiles.
+
+A profile describes which part of the decoded Tello frame is used (crop region, as fractions of the source)
+and the size it is scaled to. The pixel region is worked out once per source resolution, and each consumer
+(stream, recorder, MJPEG, ...) gets its own reusable output buffer so no array is allocated per frame.
+
+The bottom camera only fills the top-left part of the decoded frame. Cropping that region first and then
+scaling it means we no longer resize the whole frame just to throw most of it away.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+
+class FrameProfile:
+    def __init__(self, name, output_size, crop=(0.0, 0.0, 1.0, 1.0)):
+        """
+        Args:
+            name: profile name, e.g. 'forward' or 'down'
+            output_size: (width, height) of the processed frame
+            crop: (left, top, right, bottom) as fractions of the source frame
+        """
+        self.name = name
+        self.output_size = output_size
+        self.crop = crop
+        self._source_shape = None
+        self._roi = None
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def region(self, shape):
+        """Pixel crop (y0, y1, x0, x1) for a source frame of the given shape, cached per resolution."""
+        if shape[:2] != self._source_shape:
+            height, width = shape[:2]
+            left, top, right, bottom = self.crop
+            self._roi = (round(top * height), round(bottom * height), round(left * width), round(right * width))
+            self._source_shape = shape[:2]
+        return self._roi
+
+    def buffer(self, consumer, channels):
+        """Reusable output array for one consumer; None means allocate a fresh array (caller keeps it)."""
+        if consumer is None:
+            return None
+        with self._lock:
+            buffer = self._buffers.get(consumer)
+            width, height = self.output_size
+            if buffer is None or buffer.shape[:2] != (height, width) or buffer.ndim != (3 if channels else 2):
+                shape = (height, width, channels) if channels else (height, width)
+                buffer = np.empty(shape, dtype='uint8')
+                self._buffers[consumer] = buffer
+            return buffer
+
+    def apply(self, frame, consumer=None):
+        """
+        Crop and scale `frame`.
+
+        Args:
+            frame: source BGR frame (not modified)
+            consumer: name of the caller; its buffer is overwritten on the next call with the same name.
+                Pass None to get a freshly allocated result.
+        """
+        y0, y1, x0, x1 = self.region(frame.shape)
+        roi = frame[y0:y1, x0:x1]
+        if (roi.shape[1], roi.shape[0]) == self.output_size:
+            return roi if consumer is not None else roi.copy()
+        dst = self.buffer(consumer, frame.shape[2] if frame.ndim == 3 else 0)
+        if dst is None:
+            return cv2.resize(roi, self.output_size)
+        cv2.resize(roi, self.output_size, dst=dst)
+        return dst
+
+
+# Same geometry the stream has always used: the whole frame at 720x480 for the front camera, and for the
+# bottom camera the region that ended up in frame[:240, :320] after scaling to 720x480.
+PROFILE_SPECS = {
+    'forward': {'output_size': (720, 480)},
+    'down': {'output_size': (320, 240), 'crop': (0.0, 0.0, 320 / 720, 240 / 480)},
+}
+
+
+def make_profile(camera_down):
+    """New profile (with its own buffers) for the given camera direction."""
+    name = 'down' if camera_down else 'forward'
+    return FrameProfile(name, **PROFILE_SPECS[name])
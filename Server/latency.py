@@ -0,0 +1,181 @@
+"""
+Command latency instrumentation.
+
+Each drone command can carry the browser's send time. The server marks when the socket.io handler received
+it, when handle_command started and finished, and when the RC loop's send_rc_control call carrying the new
+setpoint returned. The gaps between those marks are recorded per stage:
+
+    network    client send -> server receive (includes any clock offset between browser and server)
+    queue      server receive -> handle_command start (socket.io and Flask handling)
+    dispatch   handle_command start -> end (Python command dispatch)
+    rc_send    handle_command end -> send_rc_control returned (up to one RC tick plus the UDP send); missing
+               when the command did not change what the RC loop sends
+    server     server receive -> send_rc_control returned
+
+Stages are kept in rolling HDR-style histograms: log-linear buckets with a fixed relative precision, so
+recording is O(1), memory is fixed and percentiles are accurate to about 3% from microseconds to minutes.
+"""
+
+import math
+import threading
+import time
+
+import numpy as np
+
+STAGES = ('network', 'queue', 'dispatch', 'rc_send', 'server')
+
+
+class LatencyHistogram:
+    def __init__(self, lowest=1e-6, highest=60.0, sub_buckets=32):
+        """
+        Args:
+            lowest: smallest distinguishable value in seconds
+            highest: values above this are clamped into the last bucket
+            sub_buckets: linear buckets per power of two (32 gives ~3% precision)
+        """
+        self.lowest = lowest
+        self.sub_buckets = sub_buckets
+        self.magnitudes = max(1, math.ceil(math.log2(highest / lowest)))
+        self.counts = np.zeros((self.magnitudes + 1) * sub_buckets, dtype=np.int64)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def _index(self, value):
+        units = max(value / self.lowest, 1.0)
+        exponent = min(int(math.log2(units)), self.magnitudes)
+        sub = int((units / (1 << exponent) - 1.0) * self.sub_buckets)
+        return exponent * self.sub_buckets + min(sub, self.sub_buckets - 1)
+
+    def _value(self, index):
+        # Upper edge of the bucket, so percentiles never understate latency
+        exponent, sub = divmod(index, self.sub_buckets)
+        return (1 << exponent) * (1.0 + (sub + 1) / self.sub_buckets) * self.lowest
+
+    def record(self, value):
+        if value < 0:
+            value = 0.0
+        self.counts[self._index(value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def reset(self):
+        self.counts[:] = 0
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def percentile(self, p):
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.total))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self._value(index), self.max)
+
+    def summary(self):
+        """Count plus mean/percentiles/max in milliseconds."""
+        result = {'count': int(self.total)}
+        if self.total:
+            result['mean_ms'] = self.sum / self.total * 1000
+            for p in (50, 90, 99, 99.9):
+                result[f"p{p:g}_ms"] = self.percentile(p) * 1000
+            result['max_ms'] = self.max * 1000
+        return result
+
+
+class RollingHistogram:
+    """Two histograms swapped every `window` seconds; reports cover the last one to two windows."""
+
+    def __init__(self, window=60.0, **kwargs):
+        self.window = window
+        self.current = LatencyHistogram(**kwargs)
+        self.previous = LatencyHistogram(**kwargs)
+        self._kwargs = kwargs
+        self._started = time.monotonic()
+
+    def _rotate(self):
+        now = time.monotonic()
+        if now - self._started >= self.window:
+            self.previous, self.current = self.current, self.previous
+            self.current.reset()
+            if now - self._started >= 2 * self.window:
+                self.previous.reset()
+            self._started = now
+
+    def record(self, value):
+        self._rotate()
+        self.current.record(value)
+
+    def summary(self):
+        self._rotate()
+        merged = LatencyHistogram(**self._kwargs)
+        merged.merge(self.previous)
+        merged.merge(self.current)
+        return merged.summary()
+
+
+class CommandTiming:
+    """Marks for one command, in time.time() seconds."""
+
+    def __init__(self, command, client_time=None):
+        """
+        Args:
+            command: command name (for the echo)
+            client_time: browser send time in epoch milliseconds (Date.now()), or None
+        """
+        self.command = command
+        self.client = client_time / 1000.0 if client_time is not None else None
+        self.received = time.time()
+        self.dispatched = None
+        self.handled = None
+        self.sent = None
+        self.error = None
+        self.done = threading.Event()
+
+    def on_sent(self, sent_time):
+        # RC loop callback; a send that finished before this command was dispatched did not carry it
+        if sent_time is not None and (self.dispatched is None or sent_time >= self.dispatched):
+            self.sent = max(sent_time, self.handled or sent_time)
+        self.done.set()
+
+    def fail(self, error):
+        # The command was never handed to the RC loop; nothing will be sent, so release the echo now
+        self.error = error
+        self.done.set()
+
+    def stages(self):
+        marks = {'network': (self.client, self.received), 'queue': (self.received, self.dispatched),
+                 'dispatch': (self.dispatched, self.handled), 'rc_send': (self.handled, self.sent),
+                 'server': (self.received, self.sent)}
+        return {stage: end - start for stage, (start, end) in marks.items() if start is not None and end is not None}
+
+    def as_dict(self):
+        """Per-stage milliseconds for the command_response echo."""
+        timing = {f"{stage}_ms": value * 1000 for stage, value in self.stages().items()}
+        if self.error is not None:
+            timing['error'] = self.error
+        return timing
+
+
+class CommandLatency:
+    def __init__(self, window=60.0):
+        self.window = window
+        self._histograms = {stage: RollingHistogram(window) for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def record(self, timing):
+        with self._lock:
+            for stage, value in timing.stages().items():
+                self._histograms[stage].record(value)
+
+    def summary(self):
+        with self._lock:
+            return {'window_seconds': self.window,
+                    'stages': {stage: histogram.summary() for stage, histogram in self._histograms.items()}}
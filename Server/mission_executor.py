@@ -0,0 +1,290 @@
+"""
+Asynchronous mission executor.
+
+Long drone manoeuvres (pad navigation, routes, uploaded mission programs) run as jobs on one dedicated worker
+thread instead of inside an HTTP request. Submitting returns a job id right away; progress and completion are
+published over socket.io:
+
+    'mission_progress'  {'id', 'state', 'progress' (0..1), 'message'}
+    'mission_complete'  the job's as_dict() once it is done, failed or aborted
+
+Only one job flies at a time. With max_queued=0 (the default) a job submitted while another is queued or
+running is rejected with MissionBusy; otherwise up to max_queued jobs wait their turn.
+
+Job functions get the MissionJob and call job.checkpoint() between drone commands, which is where pause and
+abort take effect.
+"""
+
+import itertools
+import queue
+import threading
+import time
+from datetime import datetime
+
+JOB_STATES = ('queued', 'running', 'paused', 'done', 'failed', 'aborted')
+FINISHED_STATES = ('done', 'failed', 'aborted')
+
+
+class MissionBusy(RuntimeError):
+    """Another mission is already running or queued."""
+
+
+class MissionAborted(Exception):
+    """Raised inside a job at a checkpoint after abort()."""
+
+
+class MissionJob:
+    def __init__(self, job_id, kind, target, description=None):
+        self.id = job_id
+        self.kind = kind
+        self.target = target
+        self.description = description or {}
+        self.state = 'queued'
+        self.progress = 0.0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.executor = None
+        self._resume = threading.Event()
+        self._resume.set()
+        self._abort = threading.Event()
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished (done, failed or aborted); False on timeout."""
+        return self._done.wait(timeout)
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'description': self.description,
+            'state': self.state,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+    #####################################################################################################################################
+    # Called from the job function
+    def update(self, progress=None, message=None):
+        """Report progress (0..1) and/or a status message to clients."""
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, progress))
+        if message is not None:
+            self.message = message
+            print(f"Mission {self.id}: {message}")
+        if self.executor is not None:
+            self.executor.publish(self)
+
+    def checkpoint(self):
+        """Block while paused; raise MissionAborted once aborted."""
+        if self._abort.is_set():
+            raise MissionAborted()
+        if not self._resume.is_set():
+            self.state = 'paused'
+            self.update(message='paused')
+            while not self._resume.wait(timeout=0.1):
+                if self._abort.is_set():
+                    raise MissionAborted()
+            if self._abort.is_set():
+                raise MissionAborted()
+            self.state = 'running'
+            self.update(message='resumed')
+
+    @property
+    def aborted(self):
+        return self._abort.is_set()
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    # Called by clients
+    def pause(self):
+        if self.state in FINISHED_STATES:
+            return False
+        self._resume.clear()
+        return True
+
+    def resume(self):
+        if self.state in FINISHED_STATES:
+            return False
+        self._resume.set()
+        return True
+
+    def abort(self):
+        if self.state in FINISHED_STATES:
+            return False
+        self._abort.set()
+        self._resume.set()
+        return True
+    #####################################################################################################################################
+
+
+class MissionExecutor:
+    def __init__(self, socketio=None, max_queued=0, keep_jobs=100, on_abort=None):
+        """
+        Args:
+            socketio: SocketIO for progress events (None disables them)
+            max_queued: jobs allowed to wait behind the running one before submit() raises MissionBusy
+            keep_jobs: how many finished jobs to remember for status lookups
+            on_abort: called after a job is aborted or fails, e.g. to stop the drone moving
+        """
+        self.socketio = socketio
+        self.max_queued = max_queued
+        self.keep_jobs = keep_jobs
+        self.on_abort = on_abort
+        self.jobs = {}
+        self.current = None
+        self._ids = itertools.count(1)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+    #####################################################################################################################################
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, name='mission-executor', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Abort whatever is running, drop queued jobs and stop the worker."""
+        self._running = False
+        with self._lock:
+            jobs = [job for job in self.jobs.values() if job.state not in FINISHED_STATES]
+        for job in jobs:
+            job.abort()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def submit(self, kind, target, description=None):
+        """
+        Queue `target(job)` as a mission and return its id straight away.
+
+        Raises:
+            MissionBusy: when max_queued jobs are already waiting behind a running one
+        """
+        self.start()
+        with self._lock:
+            pending = sum(1 for job in self.jobs.values() if job.state in ('queued', 'running', 'paused'))
+            if pending > self.max_queued:
+                busy = self.current.id if self.current else 'queue'
+                raise MissionBusy(f"Another mission is still in progress ({busy}).")
+            job_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{next(self._ids)}"
+            job = MissionJob(job_id, kind, target, description)
+            job.executor = self
+            self.jobs[job_id] = job
+            finished = [key for key, old in self.jobs.items() if old.state in FINISHED_STATES]
+            for key in finished[:max(0, len(self.jobs) - self.keep_jobs)]:
+                del self.jobs[key]
+        self._queue.put(job)
+        self.publish(job)
+        return job_id
+
+    def control(self, job_id, action):
+        """
+        Pause, resume or abort a job.
+
+        Returns:
+            bool: False if the job has already finished
+
+        Raises:
+            KeyError: unknown job id
+            ValueError: unknown action
+        """
+        if action not in ('pause', 'resume', 'abort'):
+            raise ValueError(f"Unknown mission action: {action}")
+        return getattr(self.jobs[job_id], action)()
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def wait_idle(self, timeout=None):
+        """Block until every submitted job has finished; False on timeout."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._lock:
+                pending = [job for job in self.jobs.values() if job.state not in FINISHED_STATES]
+            if not pending:
+                return True
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                return False
+            pending[0].wait(remaining)
+
+    def status(self, job_id):
+        job = self.jobs.get(job_id)
+        return job.as_dict() if job else None
+
+    def list(self):
+        with self._lock:
+            return [job.as_dict() for job in self.jobs.values()]
+
+    def publish(self, job):
+        if self.socketio is None:
+            return
+        self.socketio.emit('mission_progress', {'id': job.id, 'kind': job.kind, 'state': job.state,
+                                                'progress': job.progress, 'message': job.message})
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    def _worker(self):
+        while self._running:
+            job = self._queue.get()
+            if job is None:
+                break
+            if job.aborted:
+                self._finish(job, 'aborted')
+                continue
+            self.current = job
+            job.state = 'running'
+            job.started = time.time()
+            job.update(message='started')
+            try:
+                job.result = job.target(job)
+                job.progress = 1.0
+                self._finish(job, 'done')
+            except MissionAborted:
+                self._finish(job, 'aborted')
+            except Exception as e:
+                job.error = str(e)
+                self._finish(job, 'failed')
+            finally:
+                self.current = None
+        # Anything still queued when the executor stops is aborted
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._finish(job, 'aborted')
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished = time.time()
+        if state != 'done' and self.on_abort is not None:
+            try:
+                self.on_abort(job)
+            except Exception as e:
+                print(f"Error stopping after mission {job.id}: {e}")
+        job.update(message=state if not job.error else f"{state}: {job.error}")
+        if self.socketio is not None:
+            self.socketio.emit('mission_complete', job.as_dict())
+        job._done.set()
+    #####################################################################################################################################
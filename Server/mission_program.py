@@ -0,0 +1,161 @@
+"""
+Mission programs: a whole flight sent as one list of steps.
+
+    [{"type": "takeoff"},
+     {"type": "move", "direction": "forward", "distance": 100},
+     {"type": "rotate", "degrees": -90},
+     {"type": "hover", "seconds": 2},
+     {"type": "snapshot", "count": 3, "interval": 0.5},
+     {"type": "start_collecting"}, {"type": "stop_collecting"},
+     {"type": "goto_pad", "pad": 3, "height": 100, "speed": 60},
+     {"type": "land"}]
+
+The whole program is validated before anything flies. It then runs as one mission on the mission executor,
+which sends each drone command as soon as the previous one has been acknowledged. Pause and abort take effect
+between steps, and during hovers.
+"""
+
+import time
+
+# Step type -> {field: (type, minimum, maximum, default)}; a default of None means the field is required
+STEP_FIELDS = {
+    'takeoff': {},
+    'land': {},
+    'move': {'direction': (str, None, None, None), 'distance': (int, 20, 500, None)},
+    'rotate': {'degrees': (int, -360, 360, None)},
+    'hover': {'seconds': (float, 0, 60, None)},
+    'snapshot': {'count': (int, 1, 20, 1), 'interval': (float, 0, 10, 0.0)},
+    'start_collecting': {},
+    'stop_collecting': {},
+    'goto_pad': {'pad': (int, 1, 8, None), 'height': (int, 30, 250, 0), 'speed': (int, 10, 100, 50)},
+}
+
+KIND_NAMES = {int: 'whole number', float: 'number', str: 'string'}
+
+MOVE_DIRECTIONS = ('up', 'down', 'left', 'right', 'forward', 'back')
+
+# Longest program accepted in one request
+MAX_STEPS = 200
+
+
+def validate_program(steps, known_pads=None):
+    """
+    Check every step and fill in defaults.
+
+    Args:
+        steps: list of step dicts
+        known_pads: pad ids on the pad map; goto_pad steps to other pads are rejected
+
+    Returns:
+        list: normalised steps
+
+    Raises:
+        ValueError: naming the first invalid step
+    """
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("A mission needs a non-empty list of steps.")
+    if len(steps) > MAX_STEPS:
+        raise ValueError(f"A mission can have at most {MAX_STEPS} steps.")
+    program = []
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict) or step.get('type') not in STEP_FIELDS:
+            raise ValueError(f"Step {index}: type must be one of {', '.join(STEP_FIELDS)}.")
+        normalised = {'type': step['type']}
+        for field, (kind, low, high, default) in STEP_FIELDS[step['type']].items():
+            value = step.get(field, default)
+            if value is None:
+                raise ValueError(f"Step {index} ({step['type']}): missing '{field}'.")
+            try:
+                converted = kind(value)
+                # int() would quietly truncate 1.5 or True; only whole numbers are accepted
+                if kind is int and (isinstance(value, bool) or converted != float(value)):
+                    raise ValueError
+            except (TypeError, ValueError):
+                raise ValueError(f"Step {index} ({step['type']}): '{field}' must be a {KIND_NAMES[kind]}.")
+            value = converted
+            if low is not None and value != default and not low <= value <= high:
+                raise ValueError(f"Step {index} ({step['type']}): '{field}' must be between {low} and {high}.")
+            normalised[field] = value
+        if step['type'] == 'move' and normalised['direction'] not in MOVE_DIRECTIONS:
+            raise ValueError(f"Step {index} (move): direction must be one of {', '.join(MOVE_DIRECTIONS)}.")
+        if step['type'] == 'rotate' and normalised['degrees'] == 0:
+            raise ValueError(f"Step {index} (rotate): degrees must not be 0.")
+        if step['type'] == 'goto_pad' and known_pads is not None and normalised['pad'] not in known_pads:
+            raise ValueError(f"Step {index} (goto_pad): pad {normalised['pad']} is not on the pad map.")
+        program.append(normalised)
+    return program
+
+
+def describe_step(step):
+    details = ' '.join(f"{key}={value}" for key, value in step.items() if key != 'type')
+    return f"{step['type']} {details}".strip()
+
+
+class ProgramRunner:
+    def __init__(self, controller, program):
+        """
+        Args:
+            controller: DroneController the steps act on
+            program: steps returned by validate_program
+        """
+        self.controller = controller
+        self.program = program
+        self.completed = 0
+        self.snapshots = []
+
+    def run(self, job=None):
+        for index, step in enumerate(self.program):
+            if job is not None:
+                job.checkpoint()
+                job.update(index / len(self.program), f"step {index + 1}/{len(self.program)}: {describe_step(step)}")
+            getattr(self, '_' + step['type'])(job, **{key: value for key, value in step.items() if key != 'type'})
+            self.completed += 1
+        return {'steps': len(self.program), 'completed': self.completed, 'snapshots': self.snapshots}
+
+    #####################################################################################################################################
+    # Steps; each drone call returns once the drone has acknowledged the command
+    def _takeoff(self, job):
+        self.controller.sdk_command('takeoff')
+        self.controller.drone.is_flying = True
+
+    def _land(self, job):
+        self.controller.rc.zero()
+        self.controller.sdk_command('land')
+        self.controller.drone.is_flying = False
+
+    def _move(self, job, direction, distance):
+        self.controller.sdk_command('move_' + direction, distance)
+
+    def _rotate(self, job, degrees):
+        if degrees > 0:
+            self.controller.sdk_command('rotate_clockwise', degrees)
+        else:
+            self.controller.sdk_command('rotate_counter_clockwise', -degrees)
+
+    def _hover(self, job, seconds):
+        self.controller.rc.zero()
+        # Sleep in short slices so pause and abort do not wait for the whole hover
+        remaining = seconds
+        while remaining > 0:
+            if job is not None:
+                job.checkpoint()
+            delay = min(0.1, remaining)
+            time.sleep(delay)
+            remaining -= delay
+
+    def _snapshot(self, job, count, interval):
+        self.snapshots.append(self.controller.take_snapshot(count=count, interval=interval))
+
+    def _start_collecting(self, job):
+        if not self.controller.collecting_data:
+            self.controller.start_collecting_surface_data()
+
+    def _stop_collecting(self, job):
+        self.controller.stop_collecting_surface_data()
+
+    def _goto_pad(self, job, pad, height, speed):
+        # Planned from whichever pad is in sight when the step starts
+        route = self.controller.plan_pad_route(to=pad)
+        if len(route) > 1:
+            self.controller.fly_pad_route(route, job=job, height=height or None, speed=speed)
+    #####################################################################################################################################
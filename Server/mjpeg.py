@@ -0,0 +1,138 @@
+"""
+MJPEG-over-HTTP fan-out of the drone video.
+
+One thread reads from the frame bus and hands the same multipart chunk to every HTTP subscriber. Frames are
+encoded through DroneController.encode_frame, i.e. on the encoder pool when one is configured, and a frame the
+socket.io stream has already encoded at the same size and quality is reused instead of being encoded again.
+Each subscriber has a single-slot mailbox: if a client has not picked up the previous chunk by the time the
+next one is ready, the old one is replaced (dropped) for that client only. Slow viewers therefore never hold
+up fast ones or the socket.io control channel.
+"""
+
+import threading
+
+import numpy as np
+
+BOUNDARY = 'frame'
+MIMETYPE = f'multipart/x-mixed-replace; boundary={BOUNDARY}'
+
+
+def make_chunk(jpeg):
+    """Wrap one JPEG as a multipart/x-mixed-replace part."""
+    header = (f'--{BOUNDARY}\r\n'
+              f'Content-Type: image/jpeg\r\n'
+              f'Content-Length: {len(jpeg)}\r\n\r\n').encode('ascii')
+    return header + jpeg + b'\r\n'
+
+
+class MjpegSubscriber:
+    def __init__(self):
+        self.chunk = None
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def offer(self, chunk):
+        with self._cond:
+            if self.chunk is not None:
+                self.dropped += 1  # Client did not keep up, replace the stale frame
+            self.chunk = chunk
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def next_chunk(self, timeout=1.0):
+        with self._cond:
+            self._cond.wait_for(lambda: self.chunk is not None or self.closed, timeout=timeout)
+            chunk, self.chunk = self.chunk, None
+            return chunk
+
+    def frames(self):
+        """Generator for a Flask streaming response."""
+        while not self.closed:
+            chunk = self.next_chunk()
+            if chunk is not None:
+                self.sent += 1
+                yield chunk
+
+
+class MjpegBroadcaster:
+    def __init__(self, controller, quality=None):
+        """
+        Args:
+            controller: DroneController whose frame bus, preprocessing and encoder are used
+            quality: JPEG quality for the HTTP stream; None follows the socket.io stream's current quality,
+                so both streams can share one encode per frame
+        """
+        self.controller = controller
+        self.quality = quality
+        self.subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self):
+        subscriber = MjpegSubscriber()
+        with self._lock:
+            self.subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mjpeg', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.close()
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def stop(self):
+        # Ends every viewer's stream; the thread exits once it sees no subscribers
+        with self._lock:
+            subscribers, self.subscribers = list(self.subscribers), set()
+            thread = self._thread
+        for subscriber in subscribers:
+            subscriber.close()
+        if thread is not None:
+            thread.join(timeout=2.0)
+
+    @property
+    def running(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def _run(self):
+        reader = self.controller.start_frame_bus().subscribe('mjpeg')
+        while True:
+            with self._lock:
+                if not self.subscribers:
+                    self._thread = None
+                    return
+                subscribers = list(self.subscribers)
+            frame = reader.read(timeout=1.0)
+            if frame is None:
+                continue
+            image = self.controller.prepare_frame(frame.image, 'mjpeg')
+            if not reader.bus.is_valid(frame):
+                continue  # Slot reused while resizing
+            if np.may_share_memory(image, frame.image):
+                image = image.copy()
+            quality = self.quality or self.controller.stream_control.settings.quality
+            buffer = self.controller.encode_frame(frame.seq, image, quality)
+            if buffer is None:
+                continue
+            # Encode once, share the same bytes with every subscriber
+            # bytes from the encoder pool, a numpy buffer from cv2.imencode
+            chunk = make_chunk(bytes(buffer))
+            for subscriber in subscribers:
+                subscriber.offer(chunk)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self.subscribers),
+                'sent': [s.sent for s in self.subscribers],
+                'dropped': [s.dropped for s in self.subscribers],
+            }
@@ -0,0 +1,251 @@
+"""
+Mission pad map and routes.
+
+PadMap listens to the telemetry hub and builds a map of the mission pads the drone has seen. While a pad is in
+sight its x/y give the drone's offset from that pad. Between pads the offset is carried forward by dead
+reckoning on the vgx/vgy velocities. When the next pad comes into sight, the difference gives the offset between
+the two pads. Repeated observations of the same pair are averaged, and pad positions are laid out from the first
+pad seen, which sits at (0, 0). Pad coordinates and velocities are assumed to share the same floor axes, which
+holds when all pads are laid out facing the same way.
+
+Pads with no observed link to the first pad (seen after the drone lost track, e.g. after landing) are kept as
+separate components, each laid out from its own lowest pad id at (0, 0). Positions in different components are
+in different frames, so no route crosses from one component to another until a flight links them.
+
+Routes between pads are shortest paths over hops of at most `max_hop` cm (a go_xyz_speed_mid hop is relative to
+the pad currently in sight, so the next pad has to be close enough to fly to directly). All routes are computed
+together the first time one is asked for and cached until the map changes.
+"""
+
+import heapq
+import math
+import threading
+from contextlib import contextmanager
+
+# Extra cost (cm) per hop, so a route does not take many short hops when a few longer ones reach the same pad
+HOP_COST = 50.0
+# Moving an averaged pad offset by less than this (cm) does not count as a map change
+MOVE_THRESHOLD = 5.0
+
+
+class PadMap:
+    def __init__(self, max_hop=300.0, hop_cost=HOP_COST):
+        """
+        Args:
+            max_hop: longest single hop in cm between two pads on a route
+            hop_cost: extra cost per hop in cm when choosing routes
+        """
+        self.max_hop = max_hop
+        self.hop_cost = hop_cost
+        self.origin = None
+        self.positions = {}
+        # Pad -> component index; component 0 holds the origin
+        self.components = {}
+        # (a, b) with a < b -> [sum dx, sum dy, count]; the mean is b's position minus a's
+        self.edges = {}
+        self.version = 0
+        self._routes = None
+        self._routes_version = -1
+        self._lock = threading.Lock()
+        # Dead-reckoning state: last pad seen, the drone's offset from it and the time of the last packet
+        self._anchor = None
+        self._offset = None
+        self._last_time = None
+        self._paused = 0
+
+    #####################################################################################################################################
+    # Building the map
+    def observe(self, snapshot):
+        # TelemetryHub listener, runs on the ingest thread
+        state = snapshot.state
+        mid = state.get('mid', -1)
+        dt = snapshot.timestamp - self._last_time if self._last_time is not None else 0.0
+        self._last_time = snapshot.timestamp
+        if self._paused:
+            return
+        if mid is not None and mid >= 0:
+            here = (float(state.get('x', 0)), float(state.get('y', 0)))
+            if self._anchor is not None and self._anchor != mid:
+                # Drone offset from the old pad minus its offset from the new one = new pad relative to the old one
+                offset = self._advance(self._offset, state, dt)
+                self.add_observation(self._anchor, mid, offset[0] - here[0], offset[1] - here[1])
+            elif self._anchor is None:
+                self.add_pad(mid)
+            self._anchor = mid
+            self._offset = here
+        elif self._anchor is not None:
+            self._offset = self._advance(self._offset, state, dt)
+
+    @staticmethod
+    def _advance(offset, state, dt):
+        # vgx/vgy are in dm/s
+        return (offset[0] + float(state.get('vgx', 0) or 0) * 10 * dt,
+                offset[1] + float(state.get('vgy', 0) or 0) * 10 * dt)
+
+    def lose_track(self):
+        """Forget the dead-reckoning anchor, e.g. after landing or a manual reposition."""
+        self._anchor = None
+        self._offset = None
+
+    @contextmanager
+    def paused(self):
+        """Ignore state packets inside the block, e.g. while flying a route between pads that are already mapped."""
+        self._paused += 1
+        try:
+            yield
+        finally:
+            self.lose_track()
+            self._paused -= 1
+
+    def add_pad(self, pad_id):
+        with self._lock:
+            if pad_id in self.positions:
+                return
+            if self.origin is None:
+                self.origin = pad_id
+            self.positions[pad_id] = None
+            self._layout()
+            self.version += 1
+
+    def add_observation(self, a, b, dx, dy):
+        """Record that pad b was seen at (dx, dy) cm from pad a."""
+        if a == b:
+            return
+        if a > b:
+            a, b, dx, dy = b, a, -dx, -dy
+        with self._lock:
+            if self.origin is None:
+                self.origin = a
+            edge = self.edges.get((a, b))
+            before = (edge[0] / edge[2], edge[1] / edge[2]) if edge else None
+            if edge is None:
+                edge = self.edges[(a, b)] = [0.0, 0.0, 0]
+            edge[0] += dx
+            edge[1] += dy
+            edge[2] += 1
+            after = (edge[0] / edge[2], edge[1] / edge[2])
+            self._layout()
+            if before is None or math.dist(before, after) >= MOVE_THRESHOLD:
+                self.version += 1
+
+    def _layout(self):
+        # Breadth-first from the origin over the averaged offsets, preferring the most observed edges; then the
+        # same from the lowest pad id of every component not linked to the origin
+        neighbours = {}
+        for (a, b), (sx, sy, count) in self.edges.items():
+            neighbours.setdefault(a, []).append((count, b, sx / count, sy / count))
+            neighbours.setdefault(b, []).append((count, a, -sx / count, -sy / count))
+        pads = set(self.positions) | set(neighbours)
+        positions = {}
+        components = {}
+        component = -1
+        for anchor in [self.origin] + sorted(pads - {self.origin}):
+            if anchor in positions:
+                continue
+            component += 1
+            positions[anchor] = (0.0, 0.0)
+            components[anchor] = component
+            frontier = [anchor]
+            while frontier:
+                pad = frontier.pop(0)
+                px, py = positions[pad]
+                for _, other, dx, dy in sorted(neighbours.get(pad, []), reverse=True):
+                    if other not in positions:
+                        positions[other] = (px + dx, py + dy)
+                        components[other] = component
+                        frontier.append(other)
+        self.positions = positions
+        self.components = components
+
+    def reset(self):
+        with self._lock:
+            self.origin = None
+            self.positions = {}
+            self.components = {}
+            self.edges = {}
+            self.version += 1
+        self.lose_track()
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    # Routes
+    def routes(self):
+        """All-pairs next-hop table {source: {target: (cost, previous pad)}}, rebuilt only after the map changes."""
+        with self._lock:
+            if self._routes_version != self.version:
+                self._routes = {pad: self._shortest_from(pad) for pad in self.positions}
+                self._routes_version = self.version
+            return self._routes
+
+    def _shortest_from(self, source):
+        # Dijkstra over every pair of pads in the source's component within max_hop of each other
+        component = self.components[source]
+        best = {source: (0.0, None)}
+        heap = [(0.0, source)]
+        done = set()
+        while heap:
+            cost, pad = heapq.heappop(heap)
+            if pad in done:
+                continue
+            done.add(pad)
+            for other, position in self.positions.items():
+                if other in done or self.components[other] != component:
+                    continue
+                distance = math.dist(self.positions[pad], position)
+                if distance > self.max_hop:
+                    continue
+                total = cost + distance + self.hop_cost
+                if other not in best or total < best[other][0]:
+                    best[other] = (total, pad)
+                    heapq.heappush(heap, (total, other))
+        return best
+
+    def route(self, source, target):
+        """
+        Pad ids from source to target (both included).
+
+        Raises:
+            ValueError: when either pad is not on the map, the pads are in different components or the target
+                can not be reached
+        """
+        table = self.routes()
+        if source not in table or target not in table:
+            raise ValueError(f"Pad {source if source not in table else target} is not on the map.")
+        if self.components[source] != self.components[target]:
+            raise ValueError(f"No route from pad {source} to pad {target}: no flight between them has been "
+                             f"observed, so they are not connected on the map.")
+        best = table[source]
+        if target not in best:
+            raise ValueError(f"No route from pad {source} to pad {target} with hops of at most {self.max_hop} cm.")
+        path = [target]
+        while path[-1] != source:
+            path.append(best[path[-1]][1])
+        return path[::-1]
+
+    def route_through(self, source, waypoints):
+        """Route from source visiting each waypoint in order."""
+        path = [source]
+        for waypoint in waypoints:
+            path += self.route(path[-1], waypoint)[1:]
+        return path
+
+    def hop(self, a, b):
+        """(dx, dy) in cm from pad a to pad b."""
+        (ax, ay), (bx, by) = self.positions[a], self.positions[b]
+        return round(bx - ax), round(by - ay)
+    #####################################################################################################################################
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'origin': self.origin,
+                'pads': {pad: [round(x, 1), round(y, 1)] for pad, (x, y) in self.positions.items()},
+                # Pads linked to each other; positions are only comparable within one component
+                'components': [sorted(pad for pad, index in self.components.items() if index == component)
+                               for component in sorted(set(self.components.values()))],
+                'reachable': sorted(pad for pad, index in self.components.items() if index == 0),
+                'edges': [{'from': a, 'to': b, 'dx': round(sx / n, 1), 'dy': round(sy / n, 1), 'observations': n}
+                          for (a, b), (sx, sy, n) in self.edges.items()],
+                'max_hop': self.max_hop,
+            }
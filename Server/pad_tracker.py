@@ -0,0 +1,204 @@
+"""
+Closed-loop mission pad tracking.
+
+Instead of one open-loop move per axis, PadTracker runs a PID controller per axis on every state packet (the
+drone sends one about every 100 ms) and turns the pad x/y/z error into RC setpoints for the RC loop. Every
+setpoint is sent with a short hold, so if packets stop arriving the RC loop's dead-man timeout stops the drone.
+
+The run ends when the error has stayed within `tolerance` for `settle_time` seconds (converged), when the pad
+has been out of sight for `lost_timeout` seconds, or after `timeout` seconds. Each run keeps a trace of
+[t, ex, ey, ez, lr, fb, ud] rows, one per packet, plus summary metrics to compare gains with.
+
+Sign convention (as in navigate_to_mission_pad): positive x means the drone is right of the pad, positive y
+that it is in front of it. The error is rotated by the yaw in 'mpry' (yaw relative to the pad) into the
+drone's body frame before it becomes lr/fb setpoints.
+"""
+
+import math
+import time
+
+# Default gains: RC units (about cm/s) per cm of error, per cm*s and per cm/s
+DEFAULT_GAINS = {'kp': 0.6, 'ki': 0.05, 'kd': 0.15}
+
+
+class PID:
+    def __init__(self, kp, ki=0.0, kd=0.0, limit=100.0, integral_limit=None):
+        """
+        Args:
+            kp, ki, kd: gains
+            limit: output is clamped to -limit..limit
+            integral_limit: clamp on the integral term's contribution (anti-windup), defaults to limit
+        """
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.limit = limit
+        self.integral_limit = limit if integral_limit is None else integral_limit
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.last_error = None
+
+    def update(self, error, dt):
+        """Output for the current error; dt is the time since the previous update."""
+        derivative = 0.0
+        if self.last_error is not None and dt > 0:
+            derivative = (error - self.last_error) / dt
+        self.last_error = error
+        if self.ki:
+            self.integral += error * dt
+            bound = self.integral_limit / self.ki
+            self.integral = max(-bound, min(bound, self.integral))
+        output = self.kp * error + self.ki * self.integral + self.kd * derivative
+        return max(-self.limit, min(self.limit, output))
+
+
+class PadTracker:
+    def __init__(self, telemetry, rc, gains=None, z_gains=None, tolerance=8.0, settle_time=1.0, timeout=20.0,
+                 lost_timeout=1.5, max_speed=30, height=None, pad_id=None):
+        """
+        Args:
+            telemetry: TelemetryHub providing the state packets
+            rc: RcLoop the setpoints go to
+            gains: {'kp', 'ki', 'kd'} for x and y, defaults to DEFAULT_GAINS
+            z_gains: gains for height; defaults to `gains`
+            tolerance: converged when |x| and |y| (and the height error) stay within this many cm ...
+            settle_time: ... for this many seconds
+            timeout: give up after this many seconds
+            lost_timeout: give up when no pad has been seen for this many seconds
+            max_speed: largest RC setpoint used on any axis
+            height: height above the pad to hold in cm, or None to leave the height alone
+            pad_id: only track this pad id (None tracks whichever pad is seen)
+        """
+        gains = dict(DEFAULT_GAINS, **(gains or {}))
+        z_gains = dict(gains, **(z_gains or {}))
+        self.telemetry = telemetry
+        self.rc = rc
+        self.gains = gains
+        self.z_gains = z_gains
+        self.tolerance = tolerance
+        self.settle_time = settle_time
+        self.timeout = timeout
+        self.lost_timeout = lost_timeout
+        self.max_speed = max_speed
+        self.height = height
+        self.pad_id = pad_id
+        self.pids = [PID(limit=max_speed, **gains), PID(limit=max_speed, **gains), PID(limit=max_speed, **z_gains)]
+        self.trace = []
+        # Setpoints are held for two packet intervals; after that the RC loop zeroes them
+        self.hold = 0.25
+
+    def errors(self, state):
+        """(ex, ey, ez) in cm for a state packet, or None when the tracked pad is not in sight."""
+        mid = state.get('mid', -1)
+        if mid is None or mid < 0 or (self.pad_id is not None and mid != self.pad_id):
+            return None
+        ez = self.height - state.get('z', 0) if self.height is not None else 0.0
+        return float(state.get('x', 0)), float(state.get('y', 0)), float(ez)
+
+    def setpoint(self, errors, dt, yaw=0.0):
+        """RC (lr, fb, ud) for one set of errors."""
+        ex, ey, ez = errors
+        # Velocity wanted in the pad frame, towards the pad centre
+        vx = self.pids[0].update(-ex, dt)
+        vy = self.pids[1].update(-ey, dt)
+        ud = self.pids[2].update(ez, dt) if self.height is not None else 0.0
+        theta = math.radians(yaw)
+        lr = vx * math.cos(theta) - vy * math.sin(theta)
+        fb = vx * math.sin(theta) + vy * math.cos(theta)
+        return [round(max(-self.max_speed, min(self.max_speed, value))) for value in (lr, fb, ud)]
+
+    def run(self, job=None):
+        """
+        Track the pad until converged, lost or timed out. The setpoint is zeroed whatever the outcome.
+
+        Returns:
+            dict: outcome ('converged', 'lost' or 'timeout'), metrics and the trace
+        """
+        for pid in self.pids:
+            pid.reset()
+        self.trace = []
+        start = time.monotonic()
+        last_seq = self.telemetry.snapshot.seq
+        last_time = None
+        last_seen = start
+        within_since = None
+        converged_at = None
+        last_report = 0.0
+        outcome = 'timeout'
+        try:
+            while True:
+                now = time.monotonic()
+                if now - start >= self.timeout:
+                    break
+                if job is not None:
+                    job.checkpoint()
+                snapshot = self.telemetry.wait_for(last_seq, timeout=0.5)
+                now = time.monotonic()
+                if snapshot.seq == last_seq:
+                    # No packets: the RC loop's hold has already stopped the drone
+                    if now - last_seen >= self.lost_timeout:
+                        outcome = 'lost'
+                        break
+                    continue
+                last_seq = snapshot.seq
+                errors = self.errors(snapshot.state)
+                if errors is None:
+                    self.rc.zero()
+                    if now - last_seen >= self.lost_timeout:
+                        outcome = 'lost'
+                        break
+                    continue
+                last_seen = now
+                dt = snapshot.timestamp - last_time if last_time is not None else 0.0
+                last_time = snapshot.timestamp
+                yaw = self._pad_yaw(snapshot.state)
+                lr, fb, ud = self.setpoint(errors, dt, yaw)
+                self.rc.set(lr, fb, ud, 0, hold=self.hold)
+                self.trace.append([round(now - start, 3), *errors, lr, fb, ud])
+
+                if max(abs(value) for value in errors) <= self.tolerance:
+                    within_since = within_since if within_since is not None else now
+                    if now - within_since >= self.settle_time:
+                        converged_at = within_since - start
+                        outcome = 'converged'
+                        break
+                else:
+                    within_since = None
+                if job is not None and now - last_report >= 0.5:
+                    last_report = now
+                    error = math.hypot(errors[0], errors[1])
+                    job.update(progress=min(0.95, (now - start) / self.timeout), message=f"error {error:.0f} cm")
+        finally:
+            self.rc.zero()
+        return self.result(outcome, time.monotonic() - start, converged_at)
+
+    @staticmethod
+    def _pad_yaw(state):
+        # 'mpry' is the attitude relative to the pad as "pitch,roll,yaw"; djitellopy keeps it as a string
+        mpry = state.get('mpry')
+        if isinstance(mpry, str):
+            try:
+                return float(mpry.split(',')[2])
+            except (IndexError, ValueError):
+                return 0.0
+        if isinstance(mpry, (list, tuple)) and len(mpry) == 3:
+            return float(mpry[2])
+        return 0.0
+
+    def result(self, outcome, elapsed, converged_at=None):
+        distances = [math.hypot(row[1], row[2]) for row in self.trace]
+        metrics = {'packets': len(self.trace), 'elapsed': round(elapsed, 3)}
+        if distances:
+            metrics.update({
+                'initial_error_cm': round(distances[0], 1),
+                'final_error_cm': round(distances[-1], 1),
+                'rms_error_cm': round(math.sqrt(sum(d * d for d in distances) / len(distances)), 1),
+                'max_error_cm': round(max(distances), 1),
+            })
+        if converged_at is not None:
+            metrics['time_to_converge'] = round(converged_at, 3)
+        return {'outcome': outcome, 'converged': outcome == 'converged', 'metrics': metrics,
+                'gains': self.gains, 'tolerance': self.tolerance, 'height': self.height,
+                'trace_columns': ['t', 'ex', 'ey', 'ez', 'lr', 'fb', 'ud'], 'trace': self.trace}
@@ -0,0 +1,191 @@
+"""
+Fixed-rate RC control loop.
+
+One thread per drone sends the current RC setpoint (left/right, forward/back, up/down, yaw) with
+send_rc_control at a fixed rate while it is non-zero. Key presses and other controllers only change the
+setpoint, one axis at a time, so several axes mix correctly and no thread is started per command. A setpoint
+change wakes the loop so it goes out right away instead of waiting for the next tick. notify_sent() only
+reports the next send that happens anyway; it never causes one.
+
+A setpoint can be given a hold time (dead-man timeout): if it is not renewed within that time the loop zeroes
+it, so a client that stops sending updates can not leave the drone moving.
+
+Nothing is sent while the drone is idle: once a zero setpoint has gone out the loop sleeps until the setpoint
+changes, apart from a zero packet every `keepalive` seconds while the drone is flying (the Tello lands by itself
+after 15 s without any command). Blocking SDK commands (land, move_*, go ...) run inside suspended(), which
+keeps rc packets out of them.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+AXES = ('lr', 'fb', 'ud', 'yv')
+
+
+class RcLoop:
+    def __init__(self, drone, rate=20.0, keepalive=5.0):
+        """
+        Args:
+            drone: Tello (or stand-in) to send send_rc_control to
+            rate: setpoints sent per second while moving
+            keepalive: seconds between zero packets while the drone is flying and idle (None disables them)
+        """
+        self.drone = drone
+        self.rate = rate
+        self.keepalive = keepalive
+        self.sent = 0
+        self.errors = 0
+        self.expired = 0
+        self._expires = None
+        self._waiters = []
+        self._setpoint = dict.fromkeys(AXES, 0)
+        # Last setpoint that actually went out; the drone starts out still
+        self._sent_setpoint = (0, 0, 0, 0)
+        self._last_send = 0.0
+        # time.time() when the last send_rc_control returned, for notify_sent
+        self._last_sent_time = None
+        self._suspended = 0
+        self._lock = threading.Lock()
+        # Held for the duration of each send_rc_control call, so suspended() can wait for one in flight
+        self._send_lock = threading.Lock()
+        self._changed = threading.Event()
+        self._thread = None
+        self._running = False
+
+    #####################################################################################################################################
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='rc-loop', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._running:
+            return
+        self.zero()
+        self._running = False
+        self._changed.set()
+        self._thread.join(timeout=1.0)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def setpoint(self):
+        """Current (lr, fb, ud, yv)."""
+        with self._lock:
+            return tuple(self._setpoint[axis] for axis in AXES)
+
+    def set_axis(self, axis, value):
+        with self._lock:
+            if self._setpoint[axis] == value:
+                return
+            # Changing an axis takes the setpoint over from a held (dead-man) update
+            self._expires = None
+            self._setpoint[axis] = value
+        self._changed.set()
+
+    def set(self, lr=0, fb=0, ud=0, yv=0, hold=None):
+        """Replace the whole setpoint; with `hold` it is zeroed unless set again within that many seconds."""
+        with self._lock:
+            self._expires = time.monotonic() + hold if hold else None
+            values = dict(zip(AXES, (lr, fb, ud, yv)))
+            if values == self._setpoint:
+                return
+            self._setpoint = values
+        self._changed.set()
+
+    def zero(self):
+        self.set(0, 0, 0, 0)
+
+    def notify_sent(self, callback):
+        """
+        Call `callback(sent_time)` when the next scheduled send_rc_control returns; nothing extra is sent for it.
+        When no send is pending (idle or suspended) it is called at once with the time of the last send, or None.
+        """
+        with self._lock:
+            pending = not self._suspended and (any(self._setpoint.values()) or
+                                               tuple(self._setpoint[axis] for axis in AXES) != self._sent_setpoint)
+            if pending:
+                self._waiters.append(callback)
+                return
+            sent_time = self._last_sent_time
+        callback(sent_time)
+
+    @contextmanager
+    def suspended(self):
+        """Send nothing inside the block, e.g. around a blocking SDK command; a non-zero setpoint resumes afterwards."""
+        with self._lock:
+            self._suspended += 1
+        # Let a send that is already in progress finish before the caller talks to the drone
+        with self._send_lock:
+            pass
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._suspended -= 1
+            self._changed.set()
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    def _loop(self):
+        interval = 1.0 / self.rate
+        next_due = time.monotonic()
+        while self._running:
+            with self._lock:
+                idle = (not any(self._setpoint.values()) and self._sent_setpoint == (0, 0, 0, 0)) or self._suspended
+            if idle:
+                # Nothing to send: sleep until the setpoint changes (or the next keepalive is due)
+                timeout = self.keepalive if self.keepalive and getattr(self.drone, 'is_flying', False) else None
+            else:
+                # Sleep until the next tick, or less when the setpoint changes
+                timeout = max(0.0, next_due - time.monotonic())
+            self._changed.wait(timeout=timeout)
+            self._changed.clear()
+            now = time.monotonic()
+            next_due = max(next_due + interval, now) if now >= next_due else next_due
+            with self._lock:
+                if self._expires is not None and now >= self._expires:
+                    self._expires = None
+                    if any(self._setpoint.values()):
+                        self._setpoint = dict.fromkeys(AXES, 0)
+                        self.expired += 1
+                        print("Control updates stopped, RC setpoint zeroed.")
+                setpoint = tuple(self._setpoint[axis] for axis in AXES)
+                keepalive_due = (self.keepalive and getattr(self.drone, 'is_flying', False)
+                                 and now - self._last_send >= self.keepalive)
+                waiters, self._waiters = self._waiters, []
+                # A zero setpoint goes out once, then only as a keepalive
+                skip = self._suspended or (not any(setpoint) and setpoint == self._sent_setpoint and not keepalive_due)
+                if not skip:
+                    self._send_lock.acquire()
+            if skip:
+                # Nothing goes out for these waiters; they get the last send, which callers can tell is too old
+                for callback in waiters:
+                    callback(self._last_sent_time)
+                continue
+            try:
+                self.drone.send_rc_control(*setpoint)
+                self.sent += 1
+                self._sent_setpoint = setpoint
+                self._last_send = now
+                self._last_sent_time = time.time()
+            except Exception as e:
+                self.errors += 1
+                print(f"Error sending RC control: {e}")
+            finally:
+                self._send_lock.release()
+            for callback in waiters:
+                callback(self._last_sent_time)
+        # Leave the drone hovering
+        if self._sent_setpoint != (0, 0, 0, 0) and not self._suspended:
+            try:
+                self.drone.send_rc_control(0, 0, 0, 0)
+            except Exception:
+                pass
+    #####################################################################################################################################
@@ -0,0 +1,280 @@
+"""
+Background segmented video recorder.
+
+Two threads per recorder:
+    tap     - reads every frame from the frame bus, preprocesses it with the current camera profile and puts it
+              on the writer's queue. If the writer falls behind (more than `queue_size` frames waiting) the frame is
+              dropped (and counted) instead of stalling anything upstream; control messages are never dropped.
+              While the recorder is armed but not recording, the tap keeps the last `pre_roll` seconds as JPEGs
+              so a recording can start with what happened just before.
+    writer  - drains the queue into fixed-length segment files, rotating to a new segment when the current
+              one reaches `segment_seconds` or `segment_bytes`, or when the frame size changes (camera switch).
+"""
+
+import collections
+import os
+import queue
+import threading
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from recording_index import IndexBuilder
+from storage import media_dir
+
+# How often (in frames) the writer checks the segment size on disk
+SIZE_CHECK_INTERVAL = 30
+
+
+class SegmentedRecorder:
+    def __init__(self, controller, root=None, fps=30.0, fourcc='XVID', segment_seconds=300.0,
+                 segment_bytes=512 * 1024 * 1024, pre_roll=0.0, queue_size=60):
+        """
+        Args:
+            controller: DroneController providing the frame bus and preprocessing
+            root: storage root; segments go to <root>/Video (defaults to ARCADE_MEDIA_ROOT)
+            fps: frame rate written into the files
+            fourcc: codec for cv2.VideoWriter
+            segment_seconds: start a new segment after this much video
+            segment_bytes: start a new segment once the file grows past this size
+            pre_roll: seconds of video kept in memory before recording starts (0 disables it)
+            queue_size: frames buffered between the tap and the writer before frames are dropped
+        """
+        self.controller = controller
+        self.root = root
+        self.fps = fps
+        self.fourcc = fourcc
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.pre_roll = pre_roll
+        self.queue_size = queue_size
+
+        self.recording = False
+        self.armed = False
+        self.segments = []
+        self.frames_written = 0
+        self.dropped = 0
+
+        # Unbounded so 'stop' and 'exit' always get in; _put bounds the frames
+        self._queue = queue.Queue()
+        self._pre_roll = collections.deque(maxlen=max(1, int(pre_roll * fps)))
+        self._lock = threading.Lock()
+        self._tap_thread = None
+        self._writer_thread = None
+        self._session = None
+        # Pre-roll taken by start(), handed to the writer by the tap ahead of the first recorded frame
+        self._pending_pre_roll = None
+        self._rotate = False
+        self._exiting = False
+        self._active = threading.Event()
+
+    #####################################################################################################################################
+    def arm(self):
+        """Start buffering pre-roll without recording."""
+        with self._lock:
+            self.armed = True
+        self._ensure_threads()
+        self._wake()
+
+    def disarm(self):
+        with self._lock:
+            self.armed = False
+            self._pre_roll.clear()
+        self._wake()
+
+    def start(self):
+        """Start recording (with whatever pre-roll has been buffered). Returns the session name."""
+        with self._lock:
+            if self.recording:
+                return self._session
+            self._session = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+            self.segments = []
+            self._pending_pre_roll = list(self._pre_roll)
+            self._pre_roll.clear()
+            self._rotate = False
+            self.recording = True
+        self._ensure_threads()
+        self._wake()
+        print(f"Recording started, saving to {media_dir('Video', self.root)}.")
+        return self._session
+
+    def stop(self):
+        with self._lock:
+            if not self.recording:
+                return
+            self.recording = False
+            # Pre-roll the tap has not handed over yet (no frame arrived since start)
+            pending, self._pending_pre_roll = self._pending_pre_roll, None
+        # The tap only queues frames while recording, so nothing can follow the stop message
+        if pending:
+            self._put(('pre_roll', pending))
+        self._put(('stop', None))
+        print("Recording stopped.")
+
+    def restart_segment(self):
+        """Close the current segment and continue in a new file (e.g. after a camera switch)."""
+        with self._lock:
+            if self.recording:
+                self._rotate = True
+
+    def shutdown(self):
+        self.stop()
+        self.disarm()
+        self._exiting = True
+        self._wake()
+        self._put(('exit', None))
+        for thread in (self._tap_thread, self._writer_thread):
+            if thread is not None:
+                thread.join(timeout=2.0)
+
+    @property
+    def running(self):
+        return any(thread is not None and thread.is_alive() for thread in (self._tap_thread, self._writer_thread))
+
+    def status(self):
+        return {
+            'recording': self.recording,
+            'armed': self.armed,
+            'pre_roll_frames': len(self._pre_roll),
+            'queued': self._queue.qsize(),
+            'frames_written': self.frames_written,
+            'dropped': self.dropped,
+            'segments': list(self.segments),
+        }
+
+    def segment_path(self, name):
+        """Full path of a recorded segment in the Video folder (only the file name is used)."""
+        path = os.path.join(media_dir('Video', self.root), os.path.basename(name))
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No recording named {name}")
+        return path
+
+    def list_segments(self):
+        folder = media_dir('Video', self.root)
+        return sorted(name for name in os.listdir(folder) if name.endswith('.avi'))
+
+    def _wake(self):
+        # Pulse the event so an idle tap re-checks its state right away
+        self._active.set()
+        self._active.clear()
+
+    def _ensure_threads(self):
+        self._exiting = False
+        if self._tap_thread is None or not self._tap_thread.is_alive():
+            self._tap_thread = threading.Thread(target=self._tap_loop, name='recorder-tap', daemon=True)
+            self._tap_thread.start()
+        if self._writer_thread is None or not self._writer_thread.is_alive():
+            self._writer_thread = threading.Thread(target=self._writer_loop, name='recorder-writer', daemon=True)
+            self._writer_thread.start()
+
+    def _put(self, item):
+        # Frames are dropped once the writer is queue_size frames behind; callers queuing frames hold _lock
+        if item[0] == 'frame' and self._queue.qsize() >= self.queue_size:
+            self.dropped += 1
+            return False
+        self._queue.put(item)
+        return True
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    def _tap_loop(self):
+        reader = self.controller.start_frame_bus().subscribe('recorder')
+        while not self._exiting:
+            if not (self.recording or self.armed):
+                # Idle: wait to be armed or started, and skip whatever was published meanwhile
+                self._active.wait(timeout=0.5)
+                reader.last_seq = reader.bus.seq
+                continue
+            frame = reader.read_next(timeout=0.5)
+            if frame is None:
+                continue
+            image = self.controller.prepare_frame(frame.image)
+            if not reader.bus.is_valid(frame):
+                continue  # Slot reused while resizing, the image may be torn
+            telemetry = self.controller.get_telemetry_snapshot()
+            with self._lock:
+                if self.recording:
+                    if self._pending_pre_roll is not None:
+                        self._put(('pre_roll', self._pending_pre_roll))
+                        self._pending_pre_roll = None
+                    self._put(('frame', (frame.seq, frame.timestamp, image, telemetry)))
+                elif self.armed and self.pre_roll > 0:
+                    ok, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+                    if ok:
+                        self._pre_roll.append((frame.seq, frame.timestamp, jpeg, telemetry))
+            if reader.dropped:
+                with self._lock:
+                    self.dropped += reader.dropped
+                reader.dropped = 0
+
+    def _writer_loop(self):
+        segment = None
+        while True:
+            kind, payload = self._queue.get()
+            if kind == 'frame':
+                segment = self._write(segment, *payload)
+            elif kind == 'pre_roll':
+                for seq, timestamp, jpeg, telemetry in payload:
+                    segment = self._write(segment, seq, timestamp, cv2.imdecode(jpeg, cv2.IMREAD_COLOR), telemetry)
+            elif kind in ('stop', 'exit'):
+                if segment is not None:
+                    segment.close()
+                    segment = None
+                if kind == 'exit':
+                    return
+
+    def _write(self, segment, seq, timestamp, image, telemetry):
+        size = (image.shape[1], image.shape[0])
+        if segment is not None and (self._rotate or segment.size != size or segment.full()):
+            segment.close()
+            segment = None
+            self._rotate = False
+        if segment is None:
+            segment = self._open_segment(size, timestamp)
+        segment.write(seq, timestamp, image, telemetry)
+        self.frames_written += 1
+        return segment
+
+    def _open_segment(self, size, timestamp):
+        # A new segment already follows any camera switch requested before it
+        self._rotate = False
+        index = len(self.segments) + 1
+        path = os.path.join(media_dir('Video', self.root), f"{self._session}_part{index:03d}.avi")
+        segment = Segment(path, size, self.fps, self.fourcc, timestamp, self.segment_seconds, self.segment_bytes)
+        self.segments.append(path)
+        print(f"Recording segment {index}: {path}")
+        return segment
+    #####################################################################################################################################
+
+
+class Segment:
+    """One output file plus its frame index sidecar (see recording_index.py)."""
+
+    def __init__(self, path, size, fps, fourcc, start_time, max_seconds, max_bytes):
+        self.path = path
+        self.size = size
+        self.start_time = start_time
+        self.last_time = start_time
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.frames = 0
+        self.bytes = 0
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        self.index = IndexBuilder(path, fps)
+
+    def write(self, seq, timestamp, image, telemetry=None):
+        self.writer.write(np.ascontiguousarray(image))
+        self.index.add(timestamp, telemetry)
+        self.frames += 1
+        self.last_time = timestamp
+        if self.frames % SIZE_CHECK_INTERVAL == 0 and os.path.exists(self.path):
+            self.bytes = os.path.getsize(self.path)
+
+    def full(self):
+        return self.last_time - self.start_time >= self.max_seconds or self.bytes >= self.max_bytes
+
+    def close(self):
+        self.writer.release()
+        # Offsets and keyframe flags are read back from the finished file
+        self.index.finish()
@@ -0,0 +1,347 @@
+"""
+Frame index sidecar for recorded segments.
+
+For every segment the recorder writes a compact binary <segment>.idx next to the .avi. It has one fixed-size
+record per frame: frame number, capture timestamp, byte offset and size of the frame's chunk in the AVI,
+a keyframe flag and the telemetry snapshot at that instant (battery, ToF, height, mission pad, yaw).
+
+Offsets and keyframe flags come from the AVI's own idx1 chunk, which is read back once when the segment is
+closed (segments are kept below 1 GB so the plain RIFF index is always present). With the sidecar we can find
+the frame for a given time, read the keyframe before it straight from its byte offset and decode only the
+chunks from there to the frame, without the container demuxer scanning the file. Decoding the raw chunks uses
+PyAV (installed with djitellopy); without it, or for an index without offsets, OpenCV seeks by frame number.
+"""
+
+import bisect
+import os
+import struct
+
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+INDEX_MAGIC = b'AFIX'
+INDEX_VERSION = 1
+# magic, version, record size, fps, record count
+INDEX_HEADER = struct.Struct('<4sHHdI')
+
+INDEX_DTYPE = np.dtype([
+    ('frame', '<u4'),
+    ('timestamp', '<f8'),   # capture time, unix seconds
+    ('offset', '<u8'),      # file offset of the frame's AVI chunk header
+    ('size', '<u4'),        # size of the chunk data
+    ('flags', 'u1'),        # FLAG_* bits
+    ('battery', 'i1'),
+    ('tof', '<i2'),
+    ('height', '<i2'),
+    ('pad_id', 'i1'),
+    ('pad_x', '<i2'),
+    ('pad_y', '<i2'),
+    ('pad_z', '<i2'),
+    ('yaw', '<i2'),
+])
+
+FLAG_KEYFRAME = 0x01
+FLAG_OFFSET_VALID = 0x02
+
+# Tello state packet fields stored with each frame
+TELEMETRY_FIELDS = (('battery', 'bat'), ('tof', 'tof'), ('height', 'h'), ('pad_id', 'mid'),
+                    ('pad_x', 'x'), ('pad_y', 'y'), ('pad_z', 'z'), ('yaw', 'yaw'))
+
+AVIIF_KEYFRAME = 0x10
+
+
+def index_path(video_path):
+    return os.path.splitext(video_path)[0] + '.idx'
+
+
+#####################################################################################################################################
+# Writing
+class IndexBuilder:
+    """Collects per-frame records while a segment is written; finish() writes the sidecar."""
+
+    def __init__(self, video_path, fps):
+        self.video_path = video_path
+        self.fps = fps
+        self.records = []
+
+    def add(self, timestamp, telemetry=None):
+        telemetry = telemetry or {}
+        values = [telemetry.get(key, -1) for _, key in TELEMETRY_FIELDS]
+        self.records.append((len(self.records), timestamp, *values))
+
+    def finish(self):
+        """Fill in offsets/keyframes from the closed AVI file and write <segment>.idx."""
+        records = np.zeros(len(self.records), dtype=INDEX_DTYPE)
+        if self.records:
+            columns = list(zip(*self.records))
+            records['frame'] = columns[0]
+            records['timestamp'] = columns[1]
+            for (name, _), column in zip(TELEMETRY_FIELDS, columns[2:]):
+                records[name] = np.clip(column, np.iinfo(INDEX_DTYPE[name]).min, np.iinfo(INDEX_DTYPE[name]).max)
+
+        try:
+            chunks = read_avi_chunks(self.video_path)
+        except (OSError, ValueError) as e:
+            print(f"Could not read AVI index of {self.video_path}: {e}")
+            chunks = []
+        count = min(len(chunks), len(records))
+        if count:
+            chunks = np.array(chunks[:count], dtype=np.uint64)
+            records['offset'][:count] = chunks[:, 0]
+            records['size'][:count] = chunks[:, 1]
+            records['flags'][:count] = FLAG_OFFSET_VALID | np.where(chunks[:, 2] != 0, FLAG_KEYFRAME, 0)
+        if len(records) and not count:
+            records['flags'][0] = FLAG_KEYFRAME
+
+        path = index_path(self.video_path)
+        with open(path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, INDEX_DTYPE.itemsize, self.fps, len(records)))
+            f.write(records.tobytes())
+        return path
+
+
+def read_avi_chunks(path):
+    """
+    Video chunks listed in an AVI's idx1 chunk.
+
+    Returns:
+        list: (absolute offset of chunk header, data size, keyframe) per video frame, in frame order.
+    """
+    with open(path, 'rb') as f:
+        riff, _, form = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or form != b'AVI ':
+            raise ValueError("not an AVI file")
+        movi_pos = None
+        idx1 = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            fourcc, size = struct.unpack('<4sI', header)
+            if fourcc == b'LIST':
+                list_type = f.read(4)
+                if list_type == b'movi':
+                    movi_pos = f.tell() - 4
+                f.seek(size - 4 + (size & 1), os.SEEK_CUR)
+            elif fourcc == b'idx1':
+                idx1 = f.read(size)
+                break
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+    if movi_pos is None or idx1 is None:
+        raise ValueError("no idx1 index")
+
+    entries = np.frombuffer(idx1, dtype=[('id', 'S4'), ('flags', '<u4'), ('offset', '<u4'), ('size', '<u4')])
+    video = entries[np.char.endswith(entries['id'], b'dc') | np.char.endswith(entries['id'], b'db')]
+    if not len(video):
+        return []
+    # Offsets are normally relative to the 'movi' fourcc, but some writers store absolute file offsets
+    base = movi_pos if int(video['offset'][0]) < movi_pos else 0
+    return [(base + int(e['offset']), int(e['size']), bool(e['flags'] & AVIIF_KEYFRAME)) for e in video]
+#####################################################################################################################################
+
+
+#####################################################################################################################################
+# Reading
+class RecordingIndex:
+    def __init__(self, video_path):
+        self.video_path = video_path
+        with open(index_path(video_path), 'rb') as f:
+            magic, version, record_size, fps, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+            if magic != INDEX_MAGIC or version != INDEX_VERSION or record_size != INDEX_DTYPE.itemsize:
+                raise ValueError(f"{index_path(video_path)} is not a version {INDEX_VERSION} frame index")
+            self.fps = fps
+            self.records = np.fromfile(f, dtype=INDEX_DTYPE, count=count)
+        self.keyframes = np.flatnonzero(self.records['flags'] & FLAG_KEYFRAME)
+        if not len(self.keyframes):
+            self.keyframes = np.array([0])
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def start_time(self):
+        return float(self.records['timestamp'][0]) if len(self.records) else 0.0
+
+    @property
+    def duration(self):
+        return float(self.records['timestamp'][-1]) - self.start_time if len(self.records) else 0.0
+
+    def frame_at(self, seconds):
+        """Frame number shown `seconds` after the start of the segment."""
+        if not len(self.records):
+            raise ValueError("empty recording")
+        target = self.start_time + seconds
+        frame = int(np.searchsorted(self.records['timestamp'], target, side='right')) - 1
+        return min(max(frame, 0), len(self.records) - 1)
+
+    def keyframe_before(self, frame):
+        keyframes = self.keyframes.tolist()
+        return keyframes[max(0, bisect.bisect_right(keyframes, frame) - 1)]
+
+    def record(self, frame):
+        """Index record for one frame as a dict (timestamp, offset, telemetry, ...)."""
+        row = self.records[frame]
+        return {name: row[name].item() for name in INDEX_DTYPE.names}
+
+    #####################################################################################################################################
+    def decoder(self):
+        """Frame decoder positioned through the index: a ChunkDecoder when possible, otherwise a CaptureDecoder."""
+        if av is not None and len(self.records) and np.all(self.records['flags'] & FLAG_OFFSET_VALID):
+            try:
+                return ChunkDecoder(self)
+            except (av.error.FFmpegError, IndexError, ValueError) as e:
+                print(f"Decoding {self.video_path} through OpenCV: {e}")
+        return CaptureDecoder(self)
+
+    def frame_image(self, seconds):
+        """Decoded frame at the given time, or None."""
+        with self.decoder() as decoder:
+            return decoder.seek(self.frame_at(seconds))
+
+    def thumbnails(self, interval, width=160, out_dir=None):
+        """
+        One small thumbnail every `interval` seconds.
+
+        Returns:
+            list: (seconds, jpeg bytes) pairs; if out_dir is given the JPEGs are also written there.
+        """
+        results = []
+        with self.decoder() as decoder:
+            seconds = 0.0
+            while seconds <= self.duration:
+                frame = self.frame_at(seconds)
+                # Keep decoding forward when the next thumbnail is close, otherwise seek via the index
+                if decoder.position >= 0 and self.keyframe_before(frame) <= decoder.position < frame:
+                    image = decoder.advance(frame)
+                else:
+                    image = decoder.seek(frame)
+                if image is not None:
+                    height = max(1, round(image.shape[0] * width / image.shape[1]))
+                    ok, jpeg = cv2.imencode('.jpg', cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA))
+                    if ok:
+                        results.append((seconds, jpeg.tobytes()))
+                        if out_dir is not None:
+                            os.makedirs(out_dir, exist_ok=True)
+                            name = f"{os.path.splitext(os.path.basename(self.video_path))[0]}_{seconds:08.2f}.jpg"
+                            with open(os.path.join(out_dir, name), 'wb') as f:
+                                f.write(jpeg.tobytes())
+                seconds += interval
+        return results
+
+    def cut_clip(self, start, end, out_path, fourcc='XVID'):
+        """
+        Write the frames between `start` and `end` seconds to a new file, decoding only from the keyframe
+        before `start`. A sidecar index is written for the clip too.
+        """
+        first, last = self.frame_at(start), self.frame_at(end)
+        if last < first:
+            raise ValueError("end must be after start")
+        decoder = self.decoder()
+        writer = None
+        try:
+            image = decoder.seek(first)
+            if image is None:
+                raise ValueError("could not decode the start of the clip")
+            size = (image.shape[1], image.shape[0])
+            writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*fourcc), self.fps, size)
+            builder = IndexBuilder(out_path, self.fps)
+            for frame in range(first, last + 1):
+                if frame > first:
+                    image = decoder.advance(frame)
+                    if image is None:
+                        break
+                writer.write(image)
+                row = self.records[frame]
+                builder.add(float(row['timestamp']), {key: int(row[name]) for name, key in TELEMETRY_FIELDS})
+        finally:
+            decoder.close()
+            if writer is not None:
+                writer.release()
+        builder.finish()
+        return out_path
+    #####################################################################################################################################
+#####################################################################################################################################
+
+
+#####################################################################################################################################
+# Decoding
+class ChunkDecoder:
+    """Decodes frames from the raw AVI chunks at the offsets stored in the index."""
+
+    def __init__(self, index):
+        self.index = index
+        # Only the stream header is read here, to learn the codec and its extradata
+        with av.open(index.video_path) as container:
+            stream = container.streams.video[0].codec_context
+            self.codec, self.extradata = stream.name, stream.extradata
+        self.file = open(index.video_path, 'rb')
+        self.context = None
+        self.position = -1
+
+    def seek(self, frame):
+        """Decode `frame`, starting a fresh decoder at the keyframe before it."""
+        self.context = av.CodecContext.create(self.codec, 'r')
+        if self.extradata:
+            self.context.extradata = self.extradata
+        self.position = self.index.keyframe_before(frame) - 1
+        return self.advance(frame)
+
+    def advance(self, frame):
+        """Feed the chunks after the current position up to `frame` and return that frame's image."""
+        image = None
+        for number in range(self.position + 1, frame + 1):
+            row = self.index.records[number]
+            self.file.seek(int(row['offset']) + 8)  # Skip the chunk's fourcc and size
+            decoded = self.context.decode(av.Packet(self.file.read(int(row['size']))))
+            self.position = number
+            if decoded:
+                image = decoded[-1]
+        return image.to_ndarray(format='bgr24') if image is not None else None
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CaptureDecoder:
+    """OpenCV fallback: seeks by frame number to the keyframe before the target and decodes forward from there."""
+
+    def __init__(self, index):
+        self.index = index
+        self.capture = cv2.VideoCapture(index.video_path)
+        self.position = -1
+
+    def seek(self, frame):
+        keyframe = self.index.keyframe_before(frame)
+        self.capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+        self.position = keyframe - 1
+        return self.advance(frame)
+
+    def advance(self, frame):
+        for _ in range(frame - self.position - 1):
+            if not self.capture.grab():
+                return None
+        ok, image = self.capture.read()
+        self.position = frame
+        return image if ok else None
+
+    def close(self):
+        self.capture.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+#####################################################################################################################################
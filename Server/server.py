@@ -1,26 +1,56 @@
-from flask import Flask, jsonify, send_file
+from flask import Flask, jsonify, request, Response
 from flask_socketio import SocketIO, emit
-import threading
-import time
-from datetime import datetime
 from flask_cors import CORS  # Import CORS
 from drone_control import DroneController
-from husky_controller import HuskyController
+from video_transport import BASE64_MODE, STREAM_MODES
+from mjpeg import MIMETYPE as MJPEG_MIMETYPE
+from encoder_pool import EncoderPool
+from recording_index import RecordingIndex
+from latency import CommandTiming
+from mission_executor import MissionBusy
+from task_runtime import TaskRejected
+from stand_in_drone import FakeTello
+from telemetry_log import TelemetryLogReader, list_logs, log_path
 import atexit
+import base64
+import cv2
+import os
 
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS on the app
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Spawned encoder workers (encoder_worker.py) import this script again as '__mp_main__'. They only run the
+# worker function, so the drone, its sockets and the encoder pool are only created in the server process.
+IN_WORKER = __name__ == '__mp_main__'
+
+# Optional multi-process JPEG encoding, e.g. ARCADE_ENCODER_WORKERS=4
+encoder_workers = int(os.environ.get('ARCADE_ENCODER_WORKERS', '0'))
+encoder_pool = EncoderPool(workers=encoder_workers) if encoder_workers > 0 and not IN_WORKER else None
+
+# ARCADE_STAND_IN_DRONE=1 runs the server without any drone (frontend work, benchmarks), see stand_in_drone.py
+stand_in_drone = FakeTello() if os.environ.get('ARCADE_STAND_IN_DRONE') and not IN_WORKER else None
+
 # Initialize the DroneController
-drone_controller = DroneController(socketio=socketio)
+drone_controller = None
+if not IN_WORKER:
+    drone_controller = DroneController(socketio=socketio, encoder_pool=encoder_pool, drone=stand_in_drone,
+                                       media_root=os.environ.get('ARCADE_MEDIA_ROOT'),
+                                       pre_roll=float(os.environ.get('ARCADE_RECORDING_PREROLL', '0')),
+                                       telemetry_rate=float(os.environ.get('ARCADE_TELEMETRY_RATE', '5')),
+                                       # e.g. ARCADE_TELLO_HOST=127.0.0.1 ARCADE_TELLO_PORT=9889 for tello_sim.py
+                                       tello_host=os.environ.get('ARCADE_TELLO_HOST'),
+                                       tello_port=int(os.environ.get('ARCADE_TELLO_PORT', '0')) or None)
 
 # # Initialize HuskyController
 # husky_controller = HuskyController()
 
 # Ensure HuskyController and DroneController cleanup is called on app exit
-atexit.register(drone_controller.cleanup)
+if drone_controller is not None:
+    atexit.register(drone_controller.shutdown)
+if encoder_pool is not None:
+    atexit.register(encoder_pool.close)
 # atexit.register(husky_controller.cleanup)
 
 
@@ -32,8 +62,8 @@ def home():
 @app.route('/connect_drone', methods=['POST'])
 def connect():
     try:
+        # Battery level and the rest of the telemetry are published by the controller's telemetry hub
         drone_controller.connect_drone()
-        threading.Thread(target=battery_level_emitter, daemon=True).start()
         return jsonify({"success": True, "message": "Drone connected successfully"}), 200
     except Exception as e:
         print("NOOO")
@@ -42,15 +72,28 @@ def connect():
 
 @app.route('/take_snapshot', methods=['GET'])
 def take_snapshot():
+    # Optional query parameters: count & interval (burst), pre (pre-trigger frames), seq (frame the client was showing)
     try:
-        filepath = drone_controller.take_snapshot()
-        if filepath:
-            return jsonify({"success": True, "message": f"Snapshot saved to {filepath}"})
-        else:
-            return jsonify({"success": False, "message": "Failed to take snapshot."}), 500
+        args = request.args
+        snapshot_id = drone_controller.take_snapshot(
+            count=args.get('count', 1, type=int),
+            interval=args.get('interval', 0.0, type=float),
+            pre_trigger=args.get('pre', 0, type=int),
+            seq=args.get('seq', None, type=int),
+        )
+        return jsonify({"success": True, "id": snapshot_id, "message": f"Snapshot {snapshot_id} queued."}), 202
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route('/snapshots/<snapshot_id>', methods=['GET'])
+def snapshot_status(snapshot_id):
+    status = drone_controller.get_snapshot_status(snapshot_id)
+    if status is None:
+        return jsonify({"success": False, "message": "Unknown snapshot id."}), 404
+    return jsonify({"success": True, "data": status}), 200
+
 @app.route('/start_collecting', methods=['POST'])
 def start_collecting():
     try:
@@ -73,6 +116,35 @@ def stop_collecting():
     except Exception as e:
         return jsonify({"message": str(e)}), 400
     
+@app.route('/surface_data', methods=['GET'])
+def surface_data():
+    # Tail the collection: ?since=<cursor>&limit=<n>; without since, starts at the current session
+    try:
+        args = request.args
+        samples, next_cursor = drone_controller.get_surface_samples_since(
+            cursor=args.get('since', None, type=int),
+            limit=args.get('limit', 1000, type=int),
+        )
+        return jsonify({"success": True, "data": samples, "cursor": next_cursor,
+                        "collecting": drone_controller.collecting_data}), 200
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+@app.route('/surface_data/query', methods=['GET'])
+def query_surface_data():
+    # ?start=&end= (epoch seconds, default: current session), points= (default 800), method=minmax|lttb|none
+    try:
+        args = request.args
+        data = drone_controller.get_collected_surface_data(
+            start=args.get('start', None, type=float),
+            end=args.get('end', None, type=float),
+            points=args.get('points', 800, type=int),
+            method=args.get('method', 'minmax'),
+        )
+        return jsonify({"success": True, "data": data}), 200
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
 @app.route('/start_recording', methods=['POST'])
 def start_recording():
     try:
@@ -97,8 +169,71 @@ def stop_recording():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/recording_status', methods=['GET'])
+def recording_status():
+    return jsonify({"success": True, "data": drone_controller.get_recording_status()}), 200
+
+@app.route('/recordings', methods=['GET'])
+def list_recordings():
+    recordings = []
+    for name in drone_controller.recorder.list_segments():
+        entry = {"name": name}
+        try:
+            index = RecordingIndex(drone_controller.recorder.segment_path(name))
+            entry.update({"frames": len(index), "duration": index.duration, "start_time": index.start_time})
+        except (OSError, ValueError):
+            entry["indexed"] = False
+        recordings.append(entry)
+    return jsonify({"success": True, "data": recordings}), 200
+
+@app.route('/recordings/<name>/frame', methods=['GET'])
+def recording_frame(name):
+    # JPEG of the frame at ?t=<seconds from the start of the segment>, found through the sidecar index
+    try:
+        index = RecordingIndex(drone_controller.recorder.segment_path(name))
+        image = index.frame_image(request.args.get('t', 0.0, type=float))
+        if image is None:
+            return jsonify({"success": False, "message": "Could not decode frame."}), 500
+        _, jpeg = cv2.imencode('.jpg', image)
+        return Response(jpeg.tobytes(), mimetype='image/jpeg')
+    except FileNotFoundError as e:
+        return jsonify({"success": False, "message": str(e)}), 404
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/recordings/<name>/thumbnails', methods=['GET'])
+def recording_thumbnails(name):
+    try:
+        index = RecordingIndex(drone_controller.recorder.segment_path(name))
+        thumbs = index.thumbnails(request.args.get('interval', 10.0, type=float),
+                                  width=request.args.get('width', 160, type=int))
+        data = [{"t": t, "image": base64.b64encode(jpeg).decode('utf-8')} for t, jpeg in thumbs]
+        return jsonify({"success": True, "data": data}), 200
+    except FileNotFoundError as e:
+        return jsonify({"success": False, "message": str(e)}), 404
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/recordings/<name>/clip', methods=['POST'])
+def recording_clip(name):
+    # Body: {"start": seconds, "end": seconds}
+    try:
+        body = request.get_json(silent=True) or {}
+        source = drone_controller.recorder.segment_path(name)
+        start, end = float(body['start']), float(body['end'])
+        out_path = f"{os.path.splitext(source)[0]}_clip_{start:.1f}-{end:.1f}.avi"
+        RecordingIndex(source).cut_clip(start, end, out_path)
+        return jsonify({"success": True, "message": f"Clip saved to {out_path}", "name": os.path.basename(out_path)}), 200
+    except FileNotFoundError as e:
+        return jsonify({"success": False, "message": str(e)}), 404
+    except (KeyError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Invalid clip request: {e}"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
 @app.route('/change_camera_direction', methods=['POST'])
 def change_camera_direction():
+    drone_controller.flight_recorder.record('http', action='change_camera_direction')
     try:
         drone_controller.set_camera_direction()
         return jsonify({"message": "Camera direction changed successfully."}), 200
@@ -107,54 +242,90 @@ def change_camera_direction():
     
 @app.route('/takeoff_land', methods=['POST'])
 def takeoff_land():
+    drone_controller.flight_recorder.record('http', action='takeoff_land')
     try:
         drone_controller.takeoff_land()
         return jsonify({"message": "Successfully executed takeoff/land command."}), 200
+    except TaskRejected as e:
+        return jsonify({"message": str(e)}), 503
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
+@app.route('/debug/tasks', methods=['GET'])
+def debug_tasks():
+    # Services, components and actions on the controller's task runtime, with how long each has been running
+    return jsonify({"success": True, "data": drone_controller.tasks.snapshot()}), 200
 
-##############################################################################################################################################
-def battery_level_emitter():
-    while True:
-        if drone_controller.is_connected:  # Check if drone is connected
-            battery_level = drone_controller.get_battery_level()
-            socketio.emit('battery_update', {'battery_level': battery_level})
-        else:
-            print("Drone not connected, waiting to emit battery level...")
-        time.sleep(5)
 
+##############################################################################################################################################
 @socketio.on('connect')
 def handle_connect():
     print('Client connected')
-    # Start the battery level emitter in a background thread upon client connection
-    # threading.Thread(target=battery_level_emitter).start()
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print('Client disconnected')
+    drone_controller.remove_video_client(request.sid)
+    if not drone_controller.video_clients:
+        drone_controller.stop_streaming()
+    drone_controller.remove_control_client(request.sid)
 ##############################################################################################################################################
 
+# Longest a command_response waits for the RC send when the client asked for timing
+TIMING_ECHO_WAIT = 0.1
+
 @socketio.on('drone_command')
 def handle_drone_command(message):
+    # Optional: 't' (client send time, Date.now()) and 'timing': true to get the stage timings back
     command = message['command']
+    timing = CommandTiming(command, message.get('t'))
+    drone_controller.flight_recorder.record('command', command=command)
     try:
         # Process the command through the DroneController
-        drone_controller.handle_command(command)
-        emit('command_response', {'status': 'success', 'command': command})
+        if not drone_controller.handle_command(command, timing=timing):
+            emit('command_response', {'status': 'error', 'message': f'Unknown command: {command}'})
+            return
+        response = {'status': 'success', 'command': command}
+        if message.get('timing'):
+            timing.done.wait(TIMING_ECHO_WAIT)
+            response['timing'] = timing.as_dict()
+        emit('command_response', response)
     except Exception as e:
         emit('command_response', {'status': 'error', 'message': str(e)})
 
+@socketio.on('control_state')
+def handle_control_state(message):
+    # Full key/axis state with a sequence number, see control_state.py; stale updates are dropped silently
+    drone_controller.flight_recorder.record('control', sid=request.sid, seq=message.get('seq'),
+                                            keys=message.get('keys'), axes=message.get('axes'))
+    try:
+        drone_controller.apply_control_state(request.sid, message['seq'], keys=message.get('keys'),
+                                             axes=message.get('axes'),
+                                             timing=CommandTiming('control_state', message.get('t')))
+    except (KeyError, TypeError, ValueError) as e:
+        emit('command_response', {'status': 'error', 'message': f'Invalid control state: {e}'})
+
 @socketio.on('start_stream')
-def start_stream():
-    # Start video streaming in a background thread to avoid blocking
-    threading.Thread(target=drone_controller.start_video_stream).start()
-    emit('stream_response', {'status': 'streaming started'})
+def start_stream(data=None):
+    # Clients can ask for {'mode': 'binary', 'ack': True}; older clients send nothing and get base64 frames.
+    # Clients that ack each frame get backpressure: frames are dropped for them instead of queued.
+    data = data or {}
+    mode = data.get('mode', BASE64_MODE)
+    if mode not in STREAM_MODES:
+        emit('stream_response', {'status': 'error', 'message': f'Unknown stream mode: {mode}'})
+        return
+    drone_controller.add_video_client(request.sid, mode, acks=bool(data.get('ack', False)))
+
+    # The streaming loop is a singleton service; later clients join the loop that is already running
+    drone_controller.start_streaming()
+    emit('stream_response', {'status': 'streaming started', 'mode': mode})
 
 @socketio.on('stop_stream')
 def stop_stream():
-    # Signal to stop the streaming loop
-    drone_controller.stream_on = False
+    # Only this client unsubscribes; the shared streaming loop stops once nobody is watching
+    drone_controller.remove_video_client(request.sid)
+    if not drone_controller.video_clients:
+        drone_controller.stop_streaming()
     emit('stream_response', {'status': 'streaming stopped'})
 
 @app.route('/toggle_recording', methods=['POST'])
@@ -181,6 +352,78 @@ def toggle_recording():
         # Handle any exceptions that occur during the toggle operation
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route('/video.mjpeg', methods=['GET'])
+def video_mjpeg():
+    # Plain HTTP video for <img> tags, VLC and recording boxes; frames are encoded once for all viewers
+    if not drone_controller.is_connected:
+        return jsonify({"success": False, "message": "Drone not connected."}), 503
+    subscriber = drone_controller.mjpeg.subscribe()
+
+    def generate():
+        try:
+            yield from subscriber.frames()
+        finally:
+            drone_controller.mjpeg.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype=MJPEG_MIMETYPE, headers={'Cache-Control': 'no-cache'})
+
+@app.route('/stream_stats', methods=['GET'])
+def stream_stats():
+    # Current adaptive stream settings plus per-client latency, queue depth and drop counts
+    return jsonify({"success": True, "data": drone_controller.get_stream_stats()}), 200
+
+@app.route('/change_detection', methods=['POST'])
+def change_detection():
+    try:
+        # Body: {"enabled": true, "threshold": 3.0}; threshold is optional
+        body = request.get_json(silent=True) or {}
+        drone_controller.set_change_detection(bool(body.get('enabled', True)), body.get('threshold'))
+        return jsonify({"success": True, "message": f"Change detection {'enabled' if drone_controller.change_detection else 'disabled'}."}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/control_stats', methods=['GET'])
+def control_stats():
+    # Accepted/stale control_state updates, dead-man expiries and the current RC setpoint
+    return jsonify({"success": True, "data": drone_controller.control_state.stats()}), 200
+
+@app.route('/command_latency', methods=['GET'])
+def command_latency():
+    # Rolling per-stage latency histograms (network, queue, dispatch, rc_send, server), see latency.py
+    return jsonify({"success": True, "data": drone_controller.command_latency.summary()}), 200
+
+@app.route('/telemetry', methods=['GET'])
+def telemetry():
+    # Latest full state packet from the telemetry hub
+    snapshot = drone_controller.telemetry.snapshot
+    return jsonify({"success": True, "seq": snapshot.seq, "timestamp": snapshot.timestamp,
+                    "data": dict(snapshot.state)}), 200
+
+@app.route('/telemetry_logs', methods=['GET'])
+def telemetry_logs():
+    logs = []
+    for name in list_logs(drone_controller.telemetry_log.root):
+        with TelemetryLogReader(log_path(name, drone_controller.telemetry_log.root)) as log:
+            logs.append({"name": name, "records": len(log), "start_time": log.start_time, "end_time": log.end_time})
+    return jsonify({"success": True, "data": logs}), 200
+
+@app.route('/telemetry_logs/<name>', methods=['GET'])
+def telemetry_log_range(name):
+    # Records between ?start=&end= (unix seconds) as columns; ?fields=tof,bat limits the columns returned
+    try:
+        args = request.args
+        path = log_path(name, drone_controller.telemetry_log.root)
+        if not os.path.isfile(path):
+            return jsonify({"success": False, "message": f"No telemetry log named {name}"}), 404
+        with TelemetryLogReader(path) as log:
+            records = log.range(args.get('start', None, type=float), args.get('end', None, type=float))
+        fields = args.get('fields')
+        names = ['timestamp'] + (fields.split(',') if fields else list(records.dtype.names[1:]))
+        data = {field: records[field].tolist() for field in names}
+        return jsonify({"success": True, "count": len(records), "data": data}), 200
+    except (ValueError, KeyError) as e:
+        return jsonify({"success": False, "message": f"Invalid request: {e}"}), 400
+
 @app.route('/enable_mission_pads', methods=['POST'])
 def enable_mission_pads():
     try:
@@ -191,12 +434,111 @@ def enable_mission_pads():
 
 @app.route('/navigate_to_mission_pad', methods=['POST'])
 def navigate_to_mission_pad():
+    # Runs as a mission; follow it with GET /missions/<id> or the mission_progress/mission_complete events
+    drone_controller.flight_recorder.record('http', action='navigate_to_mission_pad')
     try:
-        drone_controller.navigate_to_mission_pad()
-        return jsonify({"success": True, "message": "Navigating to mission pad."}), 200
+        mission_id = drone_controller.start_mission_pad_navigation()
+        return jsonify({"success": True, "id": mission_id, "message": "Navigating to mission pad."}), 202
+    except MissionBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 409
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+# Options passed through from the /track_mission_pad body to PadTracker
+PAD_TRACKING_OPTIONS = {'gains': dict, 'z_gains': dict, 'tolerance': float, 'settle_time': float, 'timeout': float,
+                        'lost_timeout': float, 'max_speed': int, 'height': float, 'pad_id': int}
+
+@app.route('/track_mission_pad', methods=['POST'])
+def track_mission_pad():
+    # Closed-loop pad alignment; the mission result holds the outcome, metrics and error trace
+    body = request.get_json(silent=True) or {}
+    try:
+        options = {key: convert(body[key]) for key, convert in PAD_TRACKING_OPTIONS.items()
+                   if body.get(key) is not None}
+        options['land'] = bool(body.get('land', False))
+        drone_controller.flight_recorder.record('http', action='track_mission_pad', args=options)
+        mission_id = drone_controller.start_pad_tracking(**options)
+        return jsonify({"success": True, "id": mission_id, "message": "Tracking mission pad."}), 202
+    except MissionBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/pad_map', methods=['GET'])
+def get_pad_map():
+    return jsonify({"success": True, "data": drone_controller.pad_map.as_dict()}), 200
+
+@app.route('/pad_map/reset', methods=['POST'])
+def reset_pad_map():
+    drone_controller.pad_map.reset()
+    return jsonify({"success": True, "message": "Pad map cleared."}), 200
+
+@app.route('/pad_route', methods=['GET'])
+def get_pad_route():
+    # Preview a route: /pad_route?to=3 from the pad in sight, or ?from=1&to=3
+    try:
+        source = request.args.get('from', type=int)
+        route = drone_controller.plan_pad_route(to=request.args.get('to', type=int), source=source)
+        return jsonify({"success": True, "data": route}), 200
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+@app.route('/fly_pad_route', methods=['POST'])
+def fly_pad_route():
+    # {"to": 3} or {"through": [2, 3, 4]}, optional "height" and "speed"; runs as a mission
+    body = request.get_json(silent=True) or {}
+    args = {key: body.get(key) for key in ('to', 'through', 'height', 'speed')}
+    drone_controller.flight_recorder.record('http', action='fly_pad_route', args=args)
+    try:
+        mission_id = drone_controller.start_pad_route(**args)
+        return jsonify({"success": True, "id": mission_id, "message": "Flying pad route."}), 202
+    except MissionBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/missions', methods=['GET'])
+def list_missions():
+    return jsonify({"success": True, "data": drone_controller.missions.list()}), 200
+
+@app.route('/missions', methods=['POST'])
+def start_mission_program():
+    # {"steps": [...]}, see mission_program.py; the whole program is validated before the mission is queued
+    body = request.get_json(silent=True) or {}
+    drone_controller.flight_recorder.record('http', action='mission_program', args={'steps': body.get('steps')})
+    try:
+        mission_id = drone_controller.start_mission_program(body.get('steps'))
+        return jsonify({"success": True, "id": mission_id, "message": "Mission started."}), 202
+    except MissionBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/missions/<mission_id>/<action>', methods=['POST'])
+def control_mission(mission_id, action):
+    # action is pause, resume or abort
+    try:
+        if not drone_controller.missions.control(mission_id, action):
+            return jsonify({"success": False, "message": "Mission has already finished."}), 409
+        return jsonify({"success": True, "message": f"Mission {action} requested."}), 200
+    except KeyError:
+        return jsonify({"success": False, "message": "Unknown mission id."}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+@app.route('/missions/<mission_id>', methods=['GET'])
+def mission_status(mission_id):
+    status = drone_controller.missions.status(mission_id)
+    if status is None:
+        return jsonify({"success": False, "message": "Unknown mission id."}), 404
+    return jsonify({"success": True, "data": status}), 200
+
 @app.route('/get_mission_pad_data', methods=['GET'])
 def get_mission_pad_data():
     try:
@@ -0,0 +1,188 @@
+"""
+Non-blocking snapshot service.
+
+A snapshot request returns an id straight away. Frames are copied out of the frame bus at request time and
+handed to a background writer thread that does the (slow) preprocessing and cv2.imwrite calls.
+
+Besides single shots the service supports:
+    burst        - N frames, one every `interval` seconds, captured by a background capture thread
+    pre-trigger  - the K frames just before the request, pulled from the frame bus ring, so the operator's
+                   click saves what they were looking at rather than the frame after the request finished
+    seq          - the exact frame the client was displaying (binary stream frames carry their seq number)
+"""
+
+import itertools
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+from storage import media_dir
+
+
+class SnapshotJob:
+    def __init__(self, job_id, count, profile):
+        self.id = job_id
+        self.count = count
+        self.profile = profile  # Preprocessing profile at request time, so a camera switch does not affect it
+        self.files = []
+        self.errors = []
+        self.created = time.time()
+        self.lock = threading.Lock()
+
+    def _state(self):
+        # Caller holds self.lock
+        if len(self.files) + len(self.errors) < self.count:
+            return 'pending'
+        return 'failed' if self.errors and not self.files else 'done'
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'id': self.id,
+                'state': self._state(),
+                'requested': self.count,
+                'files': list(self.files),
+                'errors': list(self.errors),
+            }
+
+
+class SnapshotService:
+    def __init__(self, controller, root=None, queue_size=64, keep_jobs=100):
+        """
+        Args:
+            controller: DroneController providing the frame bus and current preprocessing profile
+            root: storage root; images go to <root>/Image (defaults to ARCADE_MEDIA_ROOT)
+            queue_size: frames waiting to be written before new ones are rejected
+            keep_jobs: how many finished jobs to remember for status lookups
+        """
+        self.controller = controller
+        self.root = root
+        self.keep_jobs = keep_jobs
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._write_queue = queue.Queue(maxsize=queue_size)
+        self._burst_queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for target, name in ((self._write_loop, 'snapshot-writer'), (self._burst_loop, 'snapshot-burst')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        # Frames already queued are still written before the threads exit
+        if not self._threads:
+            return
+        self._burst_queue.put(None)
+        self._write_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    #####################################################################################################################################
+    def request(self, count=1, interval=0.0, pre_trigger=0, seq=None):
+        """
+        Queue a snapshot and return its id immediately.
+
+        Args:
+            count: number of live frames to capture (burst when > 1)
+            interval: seconds between burst frames
+            pre_trigger: number of frames from just before the request to save as well
+            seq: frame sequence number the client was showing; saved instead of the newest frame if still buffered
+        """
+        if count < 1 or pre_trigger < 0 or interval < 0:
+            raise ValueError("count must be >= 1, pre_trigger and interval must be >= 0")
+        self.start()
+        bus = self.controller.start_frame_bus()
+
+        shown = bus.get(seq, copy=True) if seq is not None else None
+        first = shown or bus.latest(copy=True)
+        if first is None:
+            raise RuntimeError("No video frame available yet.")
+        # Frames leading up to the trigger frame that are still in the ring
+        frames = [bus.get(s, copy=True) for s in range(max(1, first.seq - pre_trigger), first.seq)]
+        frames = [f for f in frames if f is not None]
+        frames.append(first)
+
+        job = self._new_job(len(frames) + count - 1)
+        for index, frame in enumerate(frames):
+            self._enqueue(job, index, frame)
+        if count > 1:
+            self._burst_queue.put((job, len(frames), count - 1, interval, first.seq))
+        return job.id
+
+    def status(self, job_id):
+        job = self.jobs.get(job_id)
+        return job.as_dict() if job else None
+
+    def _new_job(self, count):
+        job_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{next(self._ids)}"
+        job = SnapshotJob(job_id, count, self.controller.frame_profile)
+        with self._lock:
+            self.jobs[job_id] = job
+            while len(self.jobs) > self.keep_jobs:
+                self.jobs.pop(next(iter(self.jobs)))
+        return job
+
+    def _enqueue(self, job, index, frame):
+        try:
+            self._write_queue.put_nowait((job, index, frame))
+        except queue.Full:
+            with job.lock:
+                job.errors.append(f"frame {index}: writer queue full")
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    def _burst_loop(self):
+        while True:
+            item = self._burst_queue.get()
+            if item is None:
+                return
+            job, start_index, remaining, interval, last_seq = item
+            bus = self.controller.start_frame_bus()
+            next_due = time.monotonic()
+            for index in range(start_index, start_index + remaining):
+                next_due += interval
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                # Always take a frame newer than the previous one in the burst
+                bus.wait_for(last_seq, timeout=1.0)
+                frame = bus.latest(copy=True)
+                if frame is None or frame.seq <= last_seq:
+                    with job.lock:
+                        job.errors.append(f"frame {index}: no new frame")
+                    continue
+                last_seq = frame.seq
+                self._enqueue(job, index, frame)
+
+    def _write_loop(self):
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
+            job, index, frame = item
+            try:
+                stamp = datetime.fromtimestamp(frame.timestamp).strftime("%Y-%m-%d_%H-%M-%S-%f")[:-3]
+                filename = f"{stamp}_{job.id}_{index:02d}.jpg"
+                filepath = os.path.join(media_dir('Image', self.root), filename)
+                if not cv2.imwrite(filepath, job.profile.apply(frame.image)):
+                    raise IOError(f"could not write {filepath}")
+                with job.lock:
+                    job.files.append(filepath)
+            except Exception as e:
+                with job.lock:
+                    job.errors.append(f"frame {index}: {e}")
+    #####################################################################################################################################
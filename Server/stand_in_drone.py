@@ -0,0 +1,193 @@
+"""
+Stand-in for djitellopy's Tello, for replaying flight logs and benchmarking without a drone.
+
+FakeTello has the parts of the Tello API that DroneController uses. Nothing is sent anywhere: commands update
+a small simulated state (height, mission pad offsets, battery) and are recorded in `calls` with the time they
+returned, so a replay can measure how long each command took to reach the drone. Like the real drone it
+produces a new state packet `state_rate` times a second: get_current_state() advances the state by the time
+since the last packet (RC velocities, flight time, battery drain).
+"""
+
+import collections
+import threading
+import time
+
+import numpy as np
+
+
+class FakeFrameRead:
+    """Like djitellopy's BackgroundFrameRead: `frame` is replaced by a new array for every video frame."""
+
+    def __init__(self, width=960, height=720, fps=30.0):
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        base = (x + y) % 256
+        self._base = np.dstack([base, base[::-1], 255 - base]).astype(np.uint8)
+        self.fps = fps
+        self.frame = self._base.copy()
+        self.stopped = False
+        self._thread = threading.Thread(target=self._update, name='fake-frame-read', daemon=True)
+        self._thread.start()
+
+    def _update(self):
+        count = 0
+        while not self.stopped:
+            time.sleep(1.0 / self.fps)
+            count += 1
+            self.frame = np.roll(self._base, count * 8, axis=1)
+
+    def stop(self):
+        self.stopped = True
+
+
+# Battery percent used per minute while flying and while on the ground
+DRAIN_FLYING = 8.0
+DRAIN_IDLE = 0.5
+
+
+class FakeTello:
+    CAMERA_FORWARD = 0
+    CAMERA_DOWNWARD = 1
+
+    def __init__(self, command_delay=0.0, battery=100, keep_calls=10000, state_rate=10.0):
+        """
+        Args:
+            command_delay: seconds each command blocks, to mimic the round trip to a real drone
+            battery: starting battery level
+            keep_calls: how many (time, command, args) entries to keep in `calls`
+            state_rate: state packets per second seen by get_current_state
+        """
+        self.command_delay = command_delay
+        self.state_rate = state_rate
+        self.calls = collections.deque(maxlen=keep_calls)
+        self.is_flying = False
+        self.stream_on = False
+        self.frame_read = None
+        self.video_direction = self.CAMERA_FORWARD
+        self.rc = (0, 0, 0, 0)
+        self.state = {'mid': -1, 'x': 0, 'y': 0, 'z': 0, 'pitch': 0, 'roll': 0, 'yaw': 0,
+                      'vgx': 0, 'vgy': 0, 'vgz': 0, 'templ': 60, 'temph': 62, 'tof': 10, 'h': 0,
+                      'bat': battery, 'baro': 0.0, 'time': 0, 'agx': 0.0, 'agy': 0.0, 'agz': -1000.0}
+        self._battery = float(battery)
+        self._flight_time = 0.0
+        self._last_packet = time.monotonic()
+        self._lock = threading.Lock()
+
+    #####################################################################################################################################
+    def _call(self, name, *args, **state):
+        if self.command_delay:
+            time.sleep(self.command_delay)
+        with self._lock:
+            if state:
+                # New dict per update, like djitellopy does for every state packet
+                self.state = {**self.state, **state}
+            self.calls.append((time.monotonic(), name, args))
+
+    def connect(self, wait_for_state=True):
+        self._call('connect')
+
+    def end(self):
+        self._call('end')
+        if self.frame_read is not None:
+            self.frame_read.stop()
+
+    def get_battery(self):
+        return self.state['bat']
+
+    def get_current_state(self):
+        # A new packet once per 1/state_rate seconds, the same dict in between
+        now = time.monotonic()
+        with self._lock:
+            dt = now - self._last_packet
+            if dt >= 1.0 / self.state_rate:
+                self._last_packet = now
+                self.state = self._advance(self.state, dt)
+            return self.state
+
+    def _advance(self, state, dt):
+        # rc 100 is roughly 1 m/s; pad offsets move the same way as in _move
+        lr, fb, ud, yv = self.rc if self.is_flying else (0, 0, 0, 0)
+        self._battery = max(0.0, self._battery - (DRAIN_FLYING if self.is_flying else DRAIN_IDLE) * dt / 60)
+        if self.is_flying:
+            self._flight_time += dt
+        h = max(20, state['h'] + ud * dt) if self.is_flying else state['h']
+        return {**state, 'x': round(np.clip(state['x'] - lr * dt, -200, 200)),
+                'y': round(np.clip(state['y'] - fb * dt, -200, 200)), 'h': round(h), 'tof': round(h) + 10,
+                'yaw': round((state['yaw'] + yv * dt + 180) % 360 - 180),
+                'vgx': round(lr / 10), 'vgy': round(fb / 10), 'vgz': round(ud / 10),
+                'bat': int(np.ceil(self._battery)), 'time': int(self._flight_time)}
+
+    def streamon(self):
+        self.stream_on = True
+        self._call('streamon')
+
+    def streamoff(self):
+        self.stream_on = False
+        self._call('streamoff')
+
+    def get_frame_read(self):
+        if self.frame_read is None:
+            self.frame_read = FakeFrameRead()
+        return self.frame_read
+
+    def set_video_direction(self, direction):
+        self.video_direction = direction
+        self._call('set_video_direction', direction)
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    def takeoff(self):
+        self._call('takeoff', h=80, tof=90)
+        self.is_flying = True
+
+    def land(self):
+        self._call('land', h=0, tof=10)
+        self.is_flying = False
+
+    def send_rc_control(self, left_right_velocity, forward_backward_velocity, up_down_velocity, yaw_velocity):
+        self.rc = (left_right_velocity, forward_backward_velocity, up_down_velocity, yaw_velocity)
+        self._call('send_rc_control', *self.rc)
+
+    def _move(self, name, dx=0, dy=0, dz=0):
+        def cm(value):
+            return int(np.clip(value, -200, 200))
+        state = self.state
+        self._call(name, abs(dx or dy or dz), x=cm(state['x'] - dx), y=cm(state['y'] - dy),
+                   h=max(0, state['h'] + dz), tof=max(10, state['tof'] + dz))
+
+    def move_left(self, x):
+        self._move('move_left', dx=-x)
+
+    def move_right(self, x):
+        self._move('move_right', dx=x)
+
+    def move_forward(self, x):
+        self._move('move_forward', dy=x)
+
+    def move_back(self, x):
+        self._move('move_back', dy=-x)
+
+    def move_up(self, x):
+        self._move('move_up', dz=x)
+
+    def move_down(self, x):
+        self._move('move_down', dz=-x)
+
+    def rotate_clockwise(self, x):
+        self._call('rotate_clockwise', x, yaw=(self.state['yaw'] + x + 180) % 360 - 180)
+
+    def rotate_counter_clockwise(self, x):
+        self._call('rotate_counter_clockwise', x, yaw=(self.state['yaw'] - x + 180) % 360 - 180)
+
+    def go_xyz_speed_mid(self, x, y, z, speed, mid):
+        self._call('go_xyz_speed_mid', x, y, z, speed, mid, x=0, y=0, z=z, mid=mid)
+
+    def enable_mission_pads(self):
+        self._call('enable_mission_pads')
+
+    def disable_mission_pads(self):
+        self._call('disable_mission_pads')
+
+    def set_mission_pad_detection_direction(self, x):
+        self._call('set_mission_pad_detection_direction', x)
+    #####################################################################################################################################
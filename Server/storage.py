@@ -0,0 +1,17 @@
+"""
+Where the server keeps its media (snapshots, recordings, logs).
+
+Set ARCADE_MEDIA_ROOT to move everything somewhere else; by default it goes to "ARCADE Lab" on the desktop.
+"""
+
+import os
+
+MEDIA_ROOT = os.environ.get('ARCADE_MEDIA_ROOT',
+                            os.path.join(os.path.expanduser('~'), 'Desktop', 'ARCADE Lab'))
+
+
+def media_dir(kind, root=None):
+    """Return (and create) the sub folder for one kind of media, e.g. 'Image' or 'Video'."""
+    path = os.path.join(root or MEDIA_ROOT, kind)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,136 @@
+"""
+Columnar ring buffer for surface (ToF distance) samples.
+
+Samples are stored in two preallocated numpy columns (float64 epoch timestamps, int16 distances in cm),
+so memory stays flat no matter how long a session runs; the oldest samples are overwritten once the
+buffer is full. Every sample also gets an ever-increasing sample number, which callers can use as a cursor.
+
+Queries return a time window downsampled to about a screen's width of points, either with min/max
+bucketing (keeps every spike) or LTTB (Largest-Triangle-Three-Buckets, keeps the visual shape).
+"""
+
+import threading
+
+import numpy as np
+
+DOWNSAMPLE_METHODS = ('minmax', 'lttb', 'none')
+
+
+class SurfaceStore:
+    def __init__(self, capacity=10 * 60 * 60 * 4):
+        """
+        Args:
+            capacity: samples kept before the oldest are overwritten (default: 4 hours at 10 Hz, ~1.4 MB)
+        """
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.distances = np.zeros(capacity, dtype=np.int16)
+        self.total = 0  # Number of samples ever appended; sample n lives at index n % capacity
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp, distance):
+        with self._lock:
+            index = self.total % self.capacity
+            self.timestamps[index] = timestamp
+            self.distances[index] = np.clip(distance, -32768, 32767)
+            self.total += 1
+
+    @property
+    def oldest(self):
+        """Sample number of the oldest sample still stored."""
+        return max(0, self.total - self.capacity)
+
+    #####################################################################################################################################
+    def range(self, first, last):
+        """Copies of the columns for sample numbers [first, last), clamped to what is still stored."""
+        with self._lock:
+            first = max(first, self.oldest)
+            last = min(last, self.total)
+            if last <= first:
+                return np.empty(0, np.float64), np.empty(0, np.int16)
+            start, end = first % self.capacity, last % self.capacity
+            if start < end or end == 0:
+                stop = end or self.capacity
+                return self.timestamps[start:stop].copy(), self.distances[start:stop].copy()
+            return (np.concatenate((self.timestamps[start:], self.timestamps[:end])),
+                    np.concatenate((self.distances[start:], self.distances[:end])))
+
+    def since(self, cursor, limit=None):
+        """
+        Samples from sample number `cursor` on, for tailing a running collection.
+
+        Returns:
+            tuple: (timestamps, distances, first, next_cursor). `first` is larger than `cursor` when older
+            samples were already overwritten; pass `next_cursor` back in to continue.
+        """
+        first = max(cursor, self.oldest)
+        last = self.total if limit is None else min(self.total, first + limit)
+        timestamps, distances = self.range(first, last)
+        return timestamps, distances, first, first + len(timestamps)
+
+    def window(self, start=None, end=None):
+        """All stored samples with start <= timestamp <= end (epoch seconds), in time order."""
+        timestamps, distances = self.range(self.oldest, self.total)
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+        return timestamps[lo:hi], distances[lo:hi]
+
+    def query(self, start=None, end=None, points=800, method='minmax'):
+        """
+        Downsampled series for a time window.
+
+        Returns:
+            tuple: (timestamps, distances) numpy arrays with at most about `points` entries.
+        """
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"Unknown downsampling method: {method}")
+        timestamps, distances = self.window(start, end)
+        if method == 'none' or len(timestamps) <= points:
+            return timestamps, distances
+        if method == 'lttb':
+            return lttb(timestamps, distances, points)
+        return minmax(timestamps, distances, points)
+    #####################################################################################################################################
+
+
+def minmax(timestamps, values, points):
+    """Keep the minimum and maximum of each bucket, in time order (2 points per bucket)."""
+    buckets = max(1, points // 2)
+    edges = np.linspace(0, len(values), buckets + 1).astype(np.int64)
+    keep = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        segment = values[lo:hi]
+        a, b = lo + int(np.argmin(segment)), lo + int(np.argmax(segment))
+        keep.extend((a, b) if a <= b else (b, a))
+    keep = np.unique(np.array(keep, dtype=np.int64))
+    return timestamps[keep], values[keep]
+
+
+def lttb(timestamps, values, points):
+    """Largest-Triangle-Three-Buckets downsampling to `points` points (first and last are always kept)."""
+    n = len(values)
+    if points >= n or points < 3:
+        return timestamps, values
+    x = timestamps - timestamps[0]
+    y = values.astype(np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    keep = np.empty(points, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Average of the next bucket is the third corner of the triangle
+        next_lo, next_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        if next_hi <= next_lo:
+            next_lo, next_hi = n - 1, n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        areas = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(areas))
+        keep[i + 1] = a
+    return timestamps[keep], values[keep]
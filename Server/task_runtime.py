@@ -0,0 +1,241 @@
+"""
+Task runtime owned by the DroneController.
+
+Every background activity goes through one of three kinds of task, so nothing starts an unbounded number of
+threads and shutdown knows what to wait for:
+
+    services    named singleton loops (e.g. 'stream', 'collector'); starting one that is already running is a
+                no-op, so a second click can not start a second loop racing the first
+    components  objects that manage their own threads (start(), a stop method, running), e.g. the telemetry
+                hub, the RC loop and the frame bus; registered so they are listed and stopped in one place
+    actions     one-shot calls (takeoff, land, ...) on a small bounded worker pool; when too many are waiting
+                new ones are rejected with TaskRejected instead of piling up
+
+snapshot() lists what is running and for how long, for the /debug/tasks view.
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskRejected(RuntimeError):
+    """The action pool already has max_pending actions waiting."""
+
+
+class TaskRuntime:
+    def __init__(self, max_workers=2, max_pending=8, keep_actions=50):
+        """
+        Args:
+            max_workers: threads in the action pool
+            max_pending: actions allowed to be queued or running before submit() raises TaskRejected
+            keep_actions: finished actions kept for the debug view
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.keep_actions = keep_actions
+        self.services = {}
+        self.components = {}
+        self.actions = []
+        self._ids = itertools.count(1)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='task-action')
+        self._lock = threading.Lock()
+        # Notified whenever an action finishes, for wait_idle()
+        self._idle = threading.Condition(self._lock)
+        self._closed = False
+
+    #####################################################################################################################################
+    # Services
+    def spawn(self, name, target, stop=None, stop_timeout=2.0):
+        """
+        Run `target()` in the thread for service `name` unless it is already running.
+
+        Args:
+            stop: callable that makes `target` return; used by stop() and shutdown()
+            stop_timeout: how long to wait for a previous run that is still winding down
+
+        Returns:
+            bool: True if a new thread was started
+        """
+        with self._lock:
+            if self._closed:
+                raise TaskRejected("The task runtime has been shut down.")
+            previous = self.services.get(name)
+            if previous is not None and self._alive(previous) and not previous['stopping']:
+                return False
+            # Claim the name before letting go of the lock, so a concurrent call sees this run as starting
+            service = {'thread': None, 'stop': stop, 'started': time.time(), 'stopping': False, 'error': None}
+            self.services[name] = service
+        if previous is not None and previous['thread'] is not None:
+            previous['thread'].join(timeout=stop_timeout)
+            if previous['thread'].is_alive():
+                print(f"Service {name} is still stopping, not started again.")
+                with self._lock:
+                    if self.services.get(name) is service:
+                        self.services[name] = previous
+                return False
+        with self._lock:
+            if service['stopping']:
+                return False  # Stopped while waiting for the previous run
+            service['thread'] = threading.Thread(target=self._run_service, args=(service, name, target),
+                                                 name=f"service-{name}", daemon=True)
+            service['thread'].start()
+        return True
+
+    @staticmethod
+    def _alive(service):
+        # A service without a thread yet is still starting, unless it was stopped before it got one
+        if service['thread'] is None:
+            return not service['stopping']
+        return service['thread'].is_alive()
+
+    @staticmethod
+    def _run_service(service, name, target):
+        # `service` is this run's own record, so a failure is never written onto a later run of the same name
+        try:
+            target()
+        except Exception as e:
+            service['error'] = str(e)
+            print(f"Service {name} failed: {e}")
+
+    def stop(self, name, wait=False, timeout=2.0):
+        """Ask service or component `name` to stop; with wait, join the service thread."""
+        if name in self.components:
+            self.components[name]['stop']()
+            return
+        with self._lock:
+            service = self.services.get(name)
+            if service is None or not self._alive(service):
+                return
+            service['stopping'] = True
+            thread = service['thread']
+        if thread is None:
+            return  # Still starting; spawn() sees the flag and does not start it
+        if service['stop'] is not None:
+            service['stop']()
+        if wait:
+            thread.join(timeout=timeout)
+
+    def is_running(self, name):
+        if name in self.components:
+            return self.components[name]['component'].running
+        service = self.services.get(name)
+        return service is not None and self._alive(service) and not service['stopping']
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    # Components
+    def register(self, name, component, stop='stop'):
+        """
+        Track an object with start() and a running property; stopped in reverse order on shutdown.
+
+        Args:
+            stop: name of the component's method that stops it (e.g. 'close' for the logs)
+        """
+        self.components[name] = {'component': component, 'stop': getattr(component, stop), 'started': None}
+        return component
+
+    def start(self, name):
+        entry = self.components[name]
+        if not entry['component'].running:
+            entry['component'].start()
+            entry['started'] = time.time()
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    # Actions
+    def submit(self, name, fn, *args, **kwargs):
+        """
+        Run a one-shot action on the pool. Returns a Future.
+
+        Raises:
+            TaskRejected: when max_pending actions are already queued or running
+        """
+        with self._lock:
+            if self._closed:
+                raise TaskRejected("The task runtime has been shut down.")
+            pending = sum(1 for action in self.actions if action['finished'] is None)
+            if pending >= self.max_pending:
+                raise TaskRejected(f"{pending} actions are already waiting, try again later.")
+            action = {'id': next(self._ids), 'name': name, 'queued': time.time(), 'started': None, 'finished': None,
+                      'error': None}
+            self.actions.append(action)
+            finished = [old for old in self.actions if old['finished'] is not None]
+            for old in finished[:max(0, len(self.actions) - self.keep_actions)]:
+                self.actions.remove(old)
+        return self._pool.submit(self._run_action, action, fn, args, kwargs)
+
+    def _run_action(self, action, fn, args, kwargs):
+        action['started'] = time.time()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            action['error'] = str(e)
+            print(f"Action {action['name']} failed: {e}")
+            raise
+        finally:
+            with self._idle:
+                action['finished'] = time.time()
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Block until no action is queued or running; False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: all(action['finished'] is not None for action in self.actions),
+                                       timeout=timeout)
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    def shutdown(self, timeout=5.0):
+        """Stop every service and component and wait for them and the running actions."""
+        with self._lock:
+            self._closed = True
+        for name in list(self.services):
+            self.stop(name)
+        for name in reversed(list(self.components)):
+            try:
+                self.components[name]['stop']()
+            except Exception as e:
+                print(f"Error stopping {name}: {e}")
+        deadline = time.monotonic() + timeout
+        for name, service in list(self.services.items()):
+            if service['thread'] is None:
+                continue
+            service['thread'].join(timeout=max(0.0, deadline - time.monotonic()))
+            if service['thread'].is_alive():
+                print(f"Service {name} did not stop within {timeout} seconds.")
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            for action in self.actions:
+                if action['started'] is None:
+                    action['finished'] = time.time()
+                    action['error'] = 'cancelled'
+            self._idle.notify_all()
+
+    def snapshot(self):
+        now = time.time()
+
+        def age(start, end=None):
+            return round((end or now) - start, 3) if start else None
+
+        services = {}
+        for name, service in list(self.services.items()):
+            alive = self._alive(service)
+            state = 'starting' if service['thread'] is None else 'running'
+            services[name] = {'state': ('stopping' if service['stopping'] else state) if alive else 'stopped',
+                              'started': service['started'], 'running_seconds': age(service['started']) if alive else None,
+                              'error': service['error']}
+        components = {name: {'state': 'running' if entry['component'].running else 'stopped',
+                             'started': entry['started'],
+                             'running_seconds': age(entry['started']) if entry['component'].running else None}
+                      for name, entry in list(self.components.items())}
+        with self._lock:
+            actions = [dict(action, state='running' if action['started'] and not action['finished'] else
+                            'queued' if not action['started'] else 'failed' if action['error'] else 'done',
+                            running_seconds=age(action['started'], action['finished']))
+                       for action in self.actions]
+        return {'services': services, 'components': components, 'actions': actions,
+                'pool': {'max_workers': self.max_workers, 'max_pending': self.max_pending},
+                'threads': sorted(thread.name for thread in threading.enumerate())}
+    #####################################################################################################################################
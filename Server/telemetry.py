@@ -0,0 +1,134 @@
+"""
+Telemetry hub driven by the Tello state stream.
+
+The Tello pushes a full state packet (battery, ToF, height, attitude, mission pad, ...) roughly every 100 ms,
+and djitellopy replaces its parsed state dict on every packet. The hub picks up each new packet once and
+swaps it into an immutable snapshot, so every reader gets a consistent set of fields from one packet
+(e.g. pad id and x/y/z never come from different updates) without talking to the drone.
+
+A separate publisher sends only the fields that changed since the last publish ('telemetry_delta') at a
+configurable rate, plus the 'battery_update' event the frontend already listens for.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+# seq: increasing packet number, timestamp: receive time (unix seconds), state: read-only dict of fields
+TelemetrySnapshot = namedtuple('TelemetrySnapshot', ['seq', 'timestamp', 'state'])
+
+EMPTY_SNAPSHOT = TelemetrySnapshot(0, 0.0, MappingProxyType({}))
+
+
+class TelemetryHub:
+    def __init__(self, state_source, socketio=None, publish_rate=5.0, battery_interval=5.0, poll_interval=0.005):
+        """
+        Args:
+            state_source: callable returning the latest parsed state dict, e.g. drone.get_current_state
+            socketio: SocketIO used to publish deltas (None disables publishing)
+            publish_rate: coalesced 'telemetry_delta' events per second
+            battery_interval: seconds between 'battery_update' events
+            poll_interval: how often the ingest thread checks for a new packet
+        """
+        self.state_source = state_source
+        self.socketio = socketio
+        self.publish_rate = publish_rate
+        self.battery_interval = battery_interval
+        self.poll_interval = poll_interval
+
+        self.snapshot = EMPTY_SNAPSHOT
+        self.packets = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads = []
+        self._listeners = []
+
+    #####################################################################################################################################
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._threads = [threading.Thread(target=self._ingest_loop, name='telemetry-ingest', daemon=True)]
+        if self.socketio is not None and self.publish_rate > 0:
+            self._threads.append(threading.Thread(target=self._publish_loop, name='telemetry-publish', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+
+    @property
+    def running(self):
+        return self._running
+
+    def get(self, field, default=None):
+        return self.snapshot.state.get(field, default)
+
+    def wait_for(self, after_seq, timeout=None):
+        """Block until a packet newer than `after_seq` arrives. Returns the current snapshot."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.snapshot.seq > after_seq, timeout=timeout)
+            return self.snapshot
+
+    def add_listener(self, callback):
+        """Call `callback(snapshot)` on the ingest thread for every packet; it must not block."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def ingest(self, state, timestamp=None):
+        """Publish one parsed state packet as the new snapshot."""
+        snapshot = TelemetrySnapshot(self.snapshot.seq + 1, timestamp or time.time(), MappingProxyType(dict(state)))
+        with self._cond:
+            self.snapshot = snapshot  # Single reference swap, readers never see a half-updated state
+            self.packets += 1
+            self._cond.notify_all()
+        for callback in self._listeners:
+            callback(snapshot)
+        return snapshot
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    def _ingest_loop(self):
+        last = None
+        while self._running:
+            state = self.state_source()
+            # djitellopy builds a new dict per packet, so identity tells us whether a packet arrived
+            if not state or state is last:
+                time.sleep(self.poll_interval)
+                continue
+            last = state
+            self.ingest(state)
+
+    def publish(self, snapshot, published):
+        """Emit the fields of `snapshot` that differ from `published` (updated in place). Returns the delta."""
+        delta = {key: value for key, value in snapshot.state.items() if published.get(key) != value}
+        if delta:
+            published.update(delta)
+            self.socketio.emit('telemetry_delta', {'seq': snapshot.seq, 'timestamp': snapshot.timestamp, 'delta': delta})
+        return delta
+
+    def _publish_loop(self):
+        published = {}
+        last_battery = 0.0
+        interval = 1.0 / self.publish_rate
+        while self._running:
+            time.sleep(interval)
+            snapshot = self.snapshot
+            if not snapshot.seq:
+                continue
+            self.publish(snapshot, published)
+
+            now = time.monotonic()
+            if 'bat' in snapshot.state and now - last_battery >= self.battery_interval:
+                last_battery = now
+                self.socketio.emit('battery_update', {'battery_level': snapshot.state['bat']})
+    #####################################################################################################################################
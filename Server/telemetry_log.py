@@ -0,0 +1,265 @@
+"""
+Persistent append-only telemetry log.
+
+Every state packet the telemetry hub ingests is appended to <root>/Telemetry/<session>.tlog as one fixed-size
+binary record (see LOG_DTYPE), so a flight's battery, ToF, height, attitude and mission pad readings survive a
+server restart and can be analysed offline with plain numpy.
+
+Next to each log a small sparse time index (<session>.tix) stores the timestamp of every `stride`-th record.
+A time-range read looks up the first and last block in that index and then maps only those records with mmap,
+so reading a minute out of a multi-hour log does not load the file.
+
+Appends only put the packet on an in-memory list; a background flusher converts and writes the batch every
+`flush_interval` seconds, so the ingest thread never waits on the disk.
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from storage import media_dir
+
+LOG_MAGIC = b'ATLG'
+LOG_VERSION = 1
+# magic, version, record size, index stride
+LOG_HEADER = struct.Struct('<4sHHI')
+LOG_EXTENSION = '.tlog'
+INDEX_EXTENSION = '.tix'
+
+LOG_DTYPE = np.dtype([
+    ('timestamp', '<f8'),   # receive time, unix seconds
+    ('seq', '<u4'),         # telemetry hub packet number
+    ('bat', 'i1'),
+    ('tof', '<i2'),
+    ('h', '<i2'),
+    ('mid', 'i1'),
+    ('x', '<i2'),
+    ('y', '<i2'),
+    ('z', '<i2'),
+    ('pitch', '<i2'),
+    ('roll', '<i2'),
+    ('yaw', '<i2'),
+    ('vgx', '<i2'),
+    ('vgy', '<i2'),
+    ('vgz', '<i2'),
+    ('templ', '<i2'),
+    ('temph', '<i2'),
+    ('time', '<i4'),        # motor on time, seconds
+    ('baro', '<f4'),
+    ('agx', '<f4'),
+    ('agy', '<f4'),
+    ('agz', '<f4'),
+])
+
+# Tello state fields stored per record, everything after timestamp and seq
+STATE_FIELDS = LOG_DTYPE.names[2:]
+# Stored when a field is missing from the packet
+MISSING = -1
+
+
+def log_path(name, root=None):
+    """Full path of a log in the Telemetry folder (only the file name is used)."""
+    name = os.path.basename(name)
+    if not name.endswith(LOG_EXTENSION):
+        name += LOG_EXTENSION
+    return os.path.join(media_dir('Telemetry', root), name)
+
+
+def list_logs(root=None):
+    folder = media_dir('Telemetry', root)
+    return sorted(name for name in os.listdir(folder) if name.endswith(LOG_EXTENSION))
+
+
+def _to_records(packets):
+    # packets: (seq, timestamp, state) tuples -> structured array
+    records = np.zeros(len(packets), dtype=LOG_DTYPE)
+    records['seq'] = [seq for seq, _, _ in packets]
+    records['timestamp'] = [timestamp for _, timestamp, _ in packets]
+    for name in STATE_FIELDS:
+        column = [state.get(name, MISSING) for _, _, state in packets]
+        kind = LOG_DTYPE[name]
+        if kind.kind == 'i':
+            info = np.iinfo(kind)
+            records[name] = np.clip(np.asarray(column, dtype=np.float64), info.min, info.max)
+        else:
+            records[name] = column
+    return records
+
+
+#####################################################################################################################################
+# Writing
+class TelemetryLog:
+    def __init__(self, root=None, stride=256, flush_interval=1.0, max_pending=100000):
+        """
+        Args:
+            root: storage root; logs go to <root>/Telemetry (defaults to ARCADE_MEDIA_ROOT)
+            stride: records per sparse index entry
+            flush_interval: seconds between background writes
+            max_pending: packets kept in memory while the disk is slow before the oldest are dropped
+        """
+        self.root = root
+        self.stride = stride
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.path = None
+        self.records = 0
+        self.dropped = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._file = None
+        self._index_file = None
+        self._thread = None
+        self._running = False
+
+    #####################################################################################################################################
+    def start(self, session=None):
+        """Open a new log file (named after the session, default: current time) and start the flusher."""
+        if self._running:
+            return self.path
+        session = session or datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+        self.path = log_path(session, self.root)
+        self._file = open(self.path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, LOG_DTYPE.itemsize, self.stride))
+            self.records = 0
+        else:
+            self.records = (self._file.tell() - LOG_HEADER.size) // LOG_DTYPE.itemsize
+        self._index_file = open(os.path.splitext(self.path)[0] + INDEX_EXTENSION, 'ab')
+        self._running = True
+        self._thread = threading.Thread(target=self._flush_loop, name='telemetry-log', daemon=True)
+        self._thread.start()
+        print(f"Logging telemetry to {self.path}")
+        return self.path
+
+    def close(self):
+        if not self._running:
+            return
+        self._running = False
+        self._thread.join(timeout=2.0)
+        self.flush()
+        self._file.close()
+        self._index_file.close()
+        self._file = self._index_file = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def append(self, snapshot):
+        """Queue one TelemetrySnapshot; cheap enough to call from the telemetry ingest thread."""
+        if not self._running:
+            return
+        with self._lock:
+            self._pending.append((snapshot.seq, snapshot.timestamp, snapshot.state))
+            if len(self._pending) > self.max_pending:
+                del self._pending[0]
+                self.dropped += 1
+
+    def flush(self):
+        """Write everything queued so far."""
+        with self._lock:
+            packets, self._pending = self._pending, []
+        if not packets or self._file is None:
+            return
+        records = _to_records(packets)
+        self._file.write(records.tobytes())
+        self._file.flush()
+        # Sparse index: timestamp of every record whose number is a multiple of the stride
+        first = self.records
+        positions = np.arange(-first % self.stride, len(records), self.stride)
+        if len(positions):
+            self._index_file.write(records['timestamp'][positions].astype('<f8').tobytes())
+            self._index_file.flush()
+        self.records += len(records)
+
+    def _flush_loop(self):
+        while self._running:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Could not write telemetry log: {e}")
+    #####################################################################################################################################
+#####################################################################################################################################
+
+
+#####################################################################################################################################
+# Reading
+class TelemetryLogReader:
+    """Memory-mapped view of a .tlog file; records appended after opening are not visible."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        magic, version, record_size, self.stride = LOG_HEADER.unpack(self._file.read(LOG_HEADER.size))
+        if magic != LOG_MAGIC or version != LOG_VERSION or record_size != LOG_DTYPE.itemsize:
+            self._file.close()
+            raise ValueError(f"{path} is not a version {LOG_VERSION} telemetry log")
+        size = os.fstat(self._file.fileno()).st_size
+        # A crash can leave a partial record at the end, which is ignored
+        self.count = (size - LOG_HEADER.size) // LOG_DTYPE.itemsize
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+        self.records = (np.frombuffer(self._map, dtype=LOG_DTYPE, count=self.count, offset=LOG_HEADER.size)
+                        if self.count else np.zeros(0, dtype=LOG_DTYPE))
+        self.index = self._load_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.records = np.zeros(0, dtype=LOG_DTYPE)
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _load_index(self):
+        blocks = (self.count + self.stride - 1) // self.stride
+        index = []
+        path = os.path.splitext(self.path)[0] + INDEX_EXTENSION
+        if os.path.exists(path):
+            index = np.fromfile(path, dtype='<f8', count=blocks).tolist()
+        # The index is written after the records, so after a crash it can be a few entries short
+        for block in range(len(index), blocks):
+            index.append(float(self.records['timestamp'][block * self.stride]))
+        return index
+
+    @property
+    def start_time(self):
+        return float(self.records['timestamp'][0]) if self.count else 0.0
+
+    @property
+    def end_time(self):
+        return float(self.records['timestamp'][-1]) if self.count else 0.0
+
+    def range(self, start=None, end=None):
+        """
+        Records with start <= timestamp <= end (unix seconds), copied out of the map.
+
+        Only the index blocks overlapping the range are touched.
+        """
+        if not self.count:
+            return np.zeros(0, dtype=LOG_DTYPE)
+        first_block = 0 if start is None else max(0, bisect.bisect_right(self.index, start) - 1)
+        last_block = len(self.index) if end is None else bisect.bisect_right(self.index, end)
+        lo, hi = first_block * self.stride, min(self.count, last_block * self.stride)
+        timestamps = self.records['timestamp'][lo:hi]
+        if start is not None:
+            lo += int(np.searchsorted(timestamps, start, side='left'))
+        if end is not None:
+            hi = lo + int(np.searchsorted(self.records['timestamp'][lo:hi], end, side='right'))
+        return self.records[lo:hi].copy()
+#####################################################################################################################################
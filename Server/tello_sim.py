@@ -0,0 +1,445 @@
+"""
+Local Tello simulator speaking the Tello SDK UDP protocol, for running the server without a drone.
+
+    commands   - text commands on `port` (a real Tello listens on 8889), answered with 'ok', 'error' or a value
+    state      - a Tello state line sent to <client>:8890 `state_rate` times per second
+    video      - a synthetic H.264 stream sent to <client>:11111 after 'streamon' (needs PyAV, see below)
+
+The model is deliberately small: position and yaw follow the rc setpoints and move/go commands, the battery
+drains faster while flying, ToF is the height above the floor, and mission pads placed on the floor are
+reported (mid, x, y, z relative to the pad) while the drone is above one with pad detection on.
+
+djitellopy binds the Tello control port (8889) on all interfaces, so the simulator can not use that port on the
+same machine. It listens on another port instead and DroneController is pointed at it by configuration:
+
+    python tello_sim.py --port 9889
+    ARCADE_TELLO_HOST=127.0.0.1 ARCADE_TELLO_PORT=9889 python server.py
+
+For several simulated drones use one loopback address per drone (127.0.0.2, 127.0.0.3, ...), since djitellopy
+tells drones apart by IP address, and give each a different --video-port.
+
+The video stream needs PyAV (pip install av), which djitellopy itself uses to decode the stream; without it
+the simulator still answers commands and sends state.
+"""
+
+import argparse
+import math
+import socket
+import threading
+import time
+
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+CONTROL_PORT = 9889
+STATE_PORT = 8890
+VIDEO_PORT = 11111
+# Largest UDP payload used for video, like the drone's own 1460 byte packets
+VIDEO_CHUNK = 1460
+
+# Default mission pad layout: pad id -> (x, y) on the floor in cm
+DEFAULT_PADS = {1: (0, 0), 2: (100, 0), 3: (100, 100), 4: (0, 100)}
+# Pads are seen when the drone is within this horizontal distance (cm) and height range (cm)
+PAD_RANGE = 60
+PAD_HEIGHT = (30, 250)
+
+TAKEOFF_HEIGHT = 80
+# Battery drain in percent per minute
+DRAIN_FLYING = 7.0
+DRAIN_IDLE = 0.5
+
+
+class TelloSimulator:
+    def __init__(self, host='127.0.0.1', port=CONTROL_PORT, client_host='127.0.0.1', state_port=STATE_PORT,
+                 video_port=VIDEO_PORT, state_rate=10.0, fps=30.0, video_size=(960, 720), pads=None,
+                 speedup=1.0, battery=100.0, command_latency=0.0):
+        """
+        Args:
+            host, port: address the simulator listens on for commands
+            client_host: where state and video are sent (the machine running djitellopy)
+            state_port, video_port: client ports for state lines and the video stream
+            state_rate: state packets per second
+            fps, video_size: synthetic video stream
+            pads: {pad id: (x, y)} mission pad positions in cm, defaults to DEFAULT_PADS
+            speedup: simulated time runs this much faster (moves finish sooner, the battery drains faster)
+            battery: starting battery level
+            command_latency: extra seconds before every reply, to mimic a WiFi round trip
+        """
+        self.address = (host, port)
+        self.client_host = client_host
+        self.state_port = state_port
+        self.video_port = video_port
+        self.state_rate = state_rate
+        self.fps = fps
+        self.video_size = video_size
+        self.pads = dict(DEFAULT_PADS if pads is None else pads)
+        self.speedup = speedup
+        self.command_latency = command_latency
+
+        # Drone model, all distances in cm, yaw in degrees
+        self.position = [0.0, 0.0]
+        self.height = 0.0
+        self.yaw = 0.0
+        self.velocity = (0.0, 0.0, 0.0)
+        self.rc = (0, 0, 0, 0)
+        self.speed = 50
+        self.battery = float(battery)
+        self.flying = False
+        self.flight_time = 0.0
+        self.mission_pads = False
+        self.camera_down = False
+        self.stream_on = False
+        self.commands = 0
+
+        self._lock = threading.Lock()
+        self._socket = None
+        self._threads = []
+        self._running = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    #####################################################################################################################################
+    def start(self):
+        if self._running:
+            return
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(self.address)
+        self._socket.settimeout(0.5)
+        self._running = True
+        targets = [(self._command_loop, 'sim-commands'), (self._state_loop, 'sim-state')]
+        if av is not None:
+            targets.append((self._video_loop, 'sim-video'))
+        else:
+            print("PyAV is not installed, the simulator will not send video.")
+        self._threads = [threading.Thread(target=target, name=name, daemon=True) for target, name in targets]
+        for thread in self._threads:
+            thread.start()
+        print(f"Tello simulator listening on {self.address[0]}:{self.address[1]}")
+
+    def stop(self):
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    @property
+    def running(self):
+        return self._running
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    # Commands
+    def _command_loop(self):
+        while self._running:
+            try:
+                data, client = self._socket.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            command = data.decode('utf-8', errors='replace').strip()
+            self.commands += 1
+            reply = self.handle(command)
+            if reply is None:  # rc commands are not answered
+                continue
+            if self.command_latency:
+                time.sleep(self.command_latency)
+            try:
+                self._socket.sendto(reply.encode('utf-8'), client)
+            except OSError:
+                break
+
+    def handle(self, command):
+        """Apply one SDK command and return the reply text (None for commands without a reply)."""
+        parts = command.split()
+        if not parts:
+            return 'error'
+        name, args = parts[0], parts[1:]
+        try:
+            if name == 'rc':
+                with self._lock:
+                    self.rc = tuple(max(-100, min(100, int(value))) for value in args[:4])
+                return None
+            if name.endswith('?'):
+                return self._read(name[:-1])
+            handler = getattr(self, f"_cmd_{name}", None)
+            if handler is None:
+                return 'unknown command: ' + name
+            return handler(*args) or 'ok'
+        except (ValueError, TypeError, IndexError) as e:
+            return f'error {e}'
+
+    def _read(self, name):
+        values = {'battery': round(self.battery), 'speed': self.speed, 'time': f"{int(self.flight_time)}s",
+                  'height': f"{int(self.height) // 10}dm", 'tof': f"{int(self._tof()) * 10}mm",
+                  'temp': '60~62C', 'attitude': f"pitch:0;roll:0;yaw:{int(self.yaw)};",
+                  'baro': f"{self.height / 100:.2f}", 'wifi': '90', 'sdk': '30', 'sn': 'SIMULATOR0000'}
+        return str(values[name]) if name in values else 'error'
+
+    def _wait(self, distance=0.0, speed=None):
+        # Real moves block until the drone arrives
+        seconds = distance / (speed or self.speed) if distance else 0.0
+        if seconds:
+            time.sleep(seconds / self.speedup)
+
+    def _cmd_command(self):
+        pass
+
+    def _cmd_keepalive(self):
+        pass
+
+    def _cmd_streamon(self):
+        self.stream_on = True
+
+    def _cmd_streamoff(self):
+        self.stream_on = False
+
+    def _cmd_takeoff(self):
+        if self.battery < 10:
+            return 'error No valid imu'
+        self._wait(TAKEOFF_HEIGHT, 40)
+        with self._lock:
+            self.flying = True
+            self.height = TAKEOFF_HEIGHT
+            self.rc = (0, 0, 0, 0)
+
+    def _cmd_land(self):
+        self._wait(self.height, 40)
+        with self._lock:
+            self.flying = False
+            self.height = 0.0
+            self.rc = (0, 0, 0, 0)
+
+    def _cmd_emergency(self):
+        with self._lock:
+            self.flying = False
+            self.height = 0.0
+            self.rc = (0, 0, 0, 0)
+
+    def _cmd_stop(self):
+        with self._lock:
+            self.rc = (0, 0, 0, 0)
+
+    def _cmd_speed(self, value):
+        self.speed = max(10, min(100, int(value)))
+
+    def _cmd_mon(self):
+        self.mission_pads = True
+
+    def _cmd_moff(self):
+        self.mission_pads = False
+
+    def _cmd_mdirection(self, direction):
+        int(direction)
+
+    def _cmd_downvision(self, direction):
+        self.camera_down = int(direction) == 1
+
+    def _cmd_port(self, state_port, video_port):
+        self.state_port, self.video_port = int(state_port), int(video_port)
+
+    def _cmd_setfps(self, value):
+        self.fps = {'low': 5.0, 'middle': 15.0, 'high': 30.0}.get(value, self.fps)
+
+    def _cmd_setbitrate(self, value):
+        int(value)
+
+    def _cmd_setresolution(self, value):
+        self.video_size = (1280, 720) if value == 'high' else (960, 720)
+
+    def _move(self, right, forward, up, speed=None):
+        if not self.flying:
+            return 'error Not flying'
+        self._wait(math.sqrt(right * right + forward * forward + up * up), speed)
+        with self._lock:
+            # Body frame to floor frame
+            theta = math.radians(self.yaw)
+            self.position[0] += right * math.cos(theta) + forward * math.sin(theta)
+            self.position[1] += forward * math.cos(theta) - right * math.sin(theta)
+            self.height = max(0.0, self.height + up)
+
+    def _cmd_up(self, x):
+        return self._move(0, 0, int(x))
+
+    def _cmd_down(self, x):
+        return self._move(0, 0, -int(x))
+
+    def _cmd_left(self, x):
+        return self._move(-int(x), 0, 0)
+
+    def _cmd_right(self, x):
+        return self._move(int(x), 0, 0)
+
+    def _cmd_forward(self, x):
+        return self._move(0, int(x), 0)
+
+    def _cmd_back(self, x):
+        return self._move(0, -int(x), 0)
+
+    def _rotate(self, degrees):
+        if not self.flying:
+            return 'error Not flying'
+        time.sleep(abs(degrees) / 90.0 / self.speedup)
+        with self._lock:
+            self.yaw = (self.yaw + degrees + 180) % 360 - 180
+
+    def _cmd_cw(self, x):
+        return self._rotate(int(x))
+
+    def _cmd_ccw(self, x):
+        return self._rotate(-int(x))
+
+    def _cmd_go(self, x, y, z, speed, mid=None):
+        x, y, z, speed = int(x), int(y), int(z), int(speed)
+        if mid is None:
+            return self._move(-y, x, z, speed)  # SDK go: x forward, y left, z up
+        pad = self.pads.get(int(mid.lstrip('m')))
+        if pad is None or self._pad()[0] != int(mid.lstrip('m')):
+            return 'error Mission pad not found'
+        if not self.flying:
+            return 'error Not flying'
+        target = (pad[0] + x, pad[1] + y)
+        self._wait(math.dist(self.position, target) + abs(z - self.height), speed)
+        with self._lock:
+            self.position = list(target)
+            self.height = float(z)
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    # State
+    def _tof(self):
+        return self.height + 10 if self.flying else 10.0
+
+    def _pad(self):
+        """(mid, x, y, z) of the pad under the drone, as the state line reports it."""
+        if not self.mission_pads:
+            return -2, -200, -200, -200
+        if PAD_HEIGHT[0] <= self.height <= PAD_HEIGHT[1]:
+            for pad_id, (px, py) in self.pads.items():
+                dx, dy = self.position[0] - px, self.position[1] - py
+                if dx * dx + dy * dy <= PAD_RANGE * PAD_RANGE:
+                    return pad_id, round(dx), round(dy), round(self.height)
+        return -1, -100, -100, -100
+
+    def step(self, dt):
+        """Advance the model by dt (real) seconds."""
+        dt *= self.speedup
+        with self._lock:
+            lr, fb, ud, yv = self.rc if self.flying else (0, 0, 0, 0)
+            # rc 100 is roughly 1 m/s, or 100 degrees/s for yaw
+            theta = math.radians(self.yaw)
+            vx = lr * math.cos(theta) + fb * math.sin(theta)
+            vy = fb * math.cos(theta) - lr * math.sin(theta)
+            self.position[0] += vx * dt
+            self.position[1] += vy * dt
+            if self.flying:
+                self.height = max(20.0, self.height + ud * dt)
+                self.flight_time += dt
+            self.yaw = (self.yaw + yv * dt + 180) % 360 - 180
+            self.velocity = (vx, vy, ud if self.flying else 0)
+            self.battery = max(0.0, self.battery - (DRAIN_FLYING if self.flying else DRAIN_IDLE) * dt / 60)
+            if self.battery <= 0 and self.flying:
+                self.flying = False
+                self.height = 0.0
+
+    def state_line(self):
+        mid, x, y, z = self._pad()
+        # dm/s like the drone, per real second: the client integrates them over packet timestamps in real time
+        vgx, vgy, vgz = (round(v * self.speedup / 10) for v in self.velocity)
+        yaw = round(self.yaw)
+        return (f"mid:{mid};x:{x};y:{y};z:{z};mpry:0,0,{yaw};pitch:0;roll:0;yaw:{yaw};"
+                f"vgx:{vgx};vgy:{vgy};vgz:{vgz};templ:60;temph:62;tof:{round(self._tof())};h:{round(self.height)};"
+                f"bat:{math.ceil(self.battery)};baro:{self.height / 100:.2f};time:{int(self.flight_time)};"
+                f"agx:0.00;agy:0.00;agz:-1000.00;\r\n")
+
+    def _state_loop(self):
+        interval = 1.0 / self.state_rate
+        last = time.monotonic()
+        while self._running:
+            time.sleep(interval)
+            now = time.monotonic()
+            self.step(now - last)
+            last = now
+            try:
+                # Sent from the command socket, so the packets come from the drone's address
+                self._socket.sendto(self.state_line().encode('ascii'), (self.client_host, self.state_port))
+            except OSError:
+                break
+    #####################################################################################################################################
+
+    #####################################################################################################################################
+    # Video
+    def _frame(self, count):
+        width, height = self.video_size
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        base = (x + y + count * 4) % 256
+        if self.camera_down:
+            gray = base.astype(np.uint8)
+            return np.dstack([gray, gray, gray])
+        return np.dstack([base, np.roll(base, count, axis=1), 255 - base]).astype(np.uint8)
+
+    def _video_loop(self):
+        codec = None
+        count = 0
+        next_due = time.monotonic()
+        video = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            while self._running:
+                next_due += 1.0 / self.fps
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                if not self.stream_on:
+                    codec = None
+                    continue
+                if codec is None or (codec.width, codec.height) != self.video_size:
+                    codec = av.CodecContext.create('libx264', 'w')
+                    codec.width, codec.height = self.video_size
+                    codec.pix_fmt = 'yuv420p'
+                    codec.options = {'tune': 'zerolatency', 'preset': 'ultrafast', 'g': str(int(self.fps))}
+                frame = av.VideoFrame.from_ndarray(self._frame(count), format='bgr24')
+                count += 1
+                for packet in codec.encode(frame):
+                    data = bytes(packet)
+                    for offset in range(0, len(data), VIDEO_CHUNK):
+                        video.sendto(data[offset:offset + VIDEO_CHUNK], (self.client_host, self.video_port))
+        finally:
+            video.close()
+    #####################################################################################################################################
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=CONTROL_PORT)
+    parser.add_argument('--client', default='127.0.0.1', help="Address state and video are sent to")
+    parser.add_argument('--video-port', type=int, default=VIDEO_PORT)
+    parser.add_argument('--speedup', type=float, default=1.0)
+    parser.add_argument('--latency', type=float, default=0.0, help="Extra seconds before each reply")
+    args = parser.parse_args()
+
+    simulator = TelloSimulator(host=args.host, port=args.port, client_host=args.client,
+                               video_port=args.video_port, speedup=args.speedup, command_latency=args.latency)
+    simulator.start()
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    main()
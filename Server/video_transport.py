@@ -0,0 +1,66 @@
+"""
+Wire formats for sending encoded video frames over socket.io.
+
+Two transport modes are supported:
+
+    binary  - 'video_frame_bin' event. The payload is a small fixed-size header followed by the
+              raw JPEG bytes, which socket.io ships as a binary attachment (no base64 on either side).
+    base64  - the original 'video_frame' event carrying {'image': <base64 string>}. Kept as a
+              fallback for clients that have not been updated yet.
+"""
+
+import base64
+import struct
+
+BINARY_MODE = 'binary'
+BASE64_MODE = 'base64'
+STREAM_MODES = (BINARY_MODE, BASE64_MODE)
+
+# Socket.io event names for each mode
+BINARY_EVENT = 'video_frame_bin'
+BASE64_EVENT = 'video_frame'
+# Sent instead of a frame when change detection decides the picture has not changed
+HEARTBEAT_EVENT = 'video_heartbeat'
+
+# Header layout (little endian, 16 bytes):
+#   2s  magic 'AF' (ARCADE frame)
+#   B   header version
+#   B   camera direction (0 = forward, 1 = downward)
+#   I   frame sequence number
+#   d   capture timestamp (unix seconds)
+FRAME_HEADER = struct.Struct('<2sBBId')
+FRAME_MAGIC = b'AF'
+FRAME_VERSION = 1
+
+CAMERA_FORWARD = 0
+CAMERA_DOWNWARD = 1
+
+
+def pack_binary_frame(jpeg, seq, timestamp, camera_down):
+    """Build a binary frame payload: header + JPEG bytes."""
+    camera = CAMERA_DOWNWARD if camera_down else CAMERA_FORWARD
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, camera, seq & 0xFFFFFFFF, timestamp)
+    return header + memoryview(jpeg).cast('B')
+
+
+def unpack_binary_frame(payload):
+    """
+    Split a binary frame payload back into its parts.
+
+    Returns:
+        tuple: (seq, timestamp, camera_down, jpeg) where jpeg is a memoryview into the payload.
+    """
+    magic, version, camera, seq, timestamp = FRAME_HEADER.unpack_from(payload)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError("Not an ARCADE video frame")
+    return seq, timestamp, camera == CAMERA_DOWNWARD, memoryview(payload)[FRAME_HEADER.size:]
+
+
+def make_base64_frame(jpeg, seq, timestamp, camera_down):
+    """Build the legacy JSON payload. Old clients only read 'image' and ignore the rest."""
+    return {
+        'image': base64.b64encode(jpeg).decode('utf-8'),
+        'seq': seq,
+        'timestamp': timestamp,
+        'camera': 'down' if camera_down else 'forward',
+    }